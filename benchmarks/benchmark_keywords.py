@@ -0,0 +1,44 @@
+import os
+import json
+import time
+from robot.api import logger
+from robot.libraries.BuiltIn import BuiltIn
+import timing
+
+# Results of this robot run by benchmark name
+_results = {}
+
+
+def benchmark_keyword(name, iterations, keyword, *args):
+    """
+    Runs `keyword` with `args` `iterations` times (after one warm-up run) and records the timings.
+
+    Args:
+        name: Benchmark name used in the results and the baseline
+        iterations: Number of timed runs
+        keyword: Keyword to run
+
+    Returns:
+        The summary of the timings
+    """
+    builtin = BuiltIn()
+    builtin.run_keyword(keyword, *args)
+    samples = []
+    for _ in range(int(iterations)):
+        start = time.perf_counter()
+        builtin.run_keyword(keyword, *args)
+        samples.append(time.perf_counter() - start)
+    _results[name] = timing.summarize(samples)
+    logger.info(f"{name}: median {_results[name]['median_ms']:.2f} ms over {len(samples)} runs")
+    return _results[name]
+
+
+def save_benchmark_results(path):
+    """
+    Writes the results of all benchmarks run so far to a JSON file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(_results, f, indent=2)
+    logger.info(f"Benchmark results written to {path}")
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Benchmark the speech and keyword hot paths and compare them with a baseline.
+
+Python benchmarks call the libraries directly. Keyword benchmarks run
+keyword_benchmarks.robot against the fixture page in benchmarks/fixtures,
+served locally, so no network access is needed.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import itertools
+import threading
+import functools
+import subprocess
+import http.server
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+ROOT_DIR = BENCHMARK_DIR.parent
+sys.path.insert(0, str(ROOT_DIR / "libraries"))
+sys.path.insert(0, str(BENCHMARK_DIR))
+import timing
+
+ELEMENT_INFO = json.dumps({"role": "link", "name": "BBC Shows and Tours", "states": ["visited"]})
+
+# Fixed pure-Python workload timed in the same process. Benchmarks are compared
+# as multiples of it, so the baseline holds on hosts of different speed.
+REFERENCE = "reference"
+REFERENCE_DATA = [{"role": "link", "name": f"Link {i}", "states": ["visited"] * (i % 3)} for i in range(200)]
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Run the speech and keyword benchmarks")
+    parser.add_argument("--iterations", type=int, default=200,
+                        help="Samples per Python benchmark")
+    parser.add_argument("--keyword-iterations", type=int, default=10,
+                        help="Runs per keyword benchmark")
+    parser.add_argument("--skip-keywords", action="store_true",
+                        help="Only run the Python benchmarks (no browser needed)")
+    parser.add_argument("--browser", default="chromium",
+                        choices=["chromium", "firefox", "webkit"],
+                        help="Browser for the keyword benchmarks")
+    parser.add_argument("--output", default="results/benchmarks.json",
+                        help="JSON file for the results")
+    parser.add_argument("--baseline", default=str(BENCHMARK_DIR / "baseline.json"),
+                        help="Baseline to compare against")
+    parser.add_argument("--threshold", type=float,
+                        help="Allowed slowdown relative to the reference workload as a fraction, "
+                             "e.g. 0.5 for 50%% (default: from the baseline)")
+    parser.add_argument("--min-delta", type=float,
+                        help="Ignore slowdowns smaller than this fraction of the reference workload's median, "
+                             "e.g. 0.005 (default: from the baseline)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Write the results as the new baseline instead of comparing")
+    parser.add_argument("--smoke", action="store_true",
+                        help="Run every benchmark a few times without comparing, to check that they still work")
+    return parser.parse_args()
+
+def reference_workload():
+    """Serialize, parse and sort a fixed list of descriptors."""
+    parsed = json.loads(json.dumps(REFERENCE_DATA))
+    return sorted(parsed, key=lambda item: (len(item["states"]), item["name"]))
+
+def python_benchmarks(iterations):
+    """Time the speech functions directly, each relative to the reference workload."""
+    import screen_reader_integration
+    import speech_rules
+
+    def measure(func, batch):
+        return timing.measure_relative(func, reference_workload, iterations, batch=batch)
+
+    results = {REFERENCE: timing.measure(reference_workload, iterations, batch=10)}
+    session = f"benchmark-{os.getpid()}"
+
+    results["simulate_speech"] = measure(
+        lambda: screen_reader_integration.simulate_speech(ELEMENT_INFO, session=session), 10)
+
+    # Speech recorded long enough ago counts as settled, so this times the lookup itself
+    screen_reader_integration.start_speech_capture(session=session)
+    screen_reader_integration.record_speech("BBC Shows and Tours, link", session=session)
+    time.sleep(screen_reader_integration.speech_wait.DEFAULT_QUIET_PERIOD)
+    results["get_last_speech"] = measure(
+        lambda: screen_reader_integration.get_last_speech(session=session), 10)
+
+    # Every call gets a new name, so this times rendering rather than a cache hit
+    engine = speech_rules.get_engine()
+    descriptor = json.loads(ELEMENT_INFO)
+    counter = itertools.count()
+    results["speech_rules_speak"] = measure(
+        lambda: engine.speak(dict(descriptor, name=f"Link {next(counter)}")), 100)
+
+    try:
+        import nvda_integration
+        nvda = nvda_integration.NVDAIntegration(session_id=session)
+    except ImportError as e:
+        print(f"Skipping simulate_nvda_speech: {e}")
+    else:
+        results["simulate_nvda_speech"] = measure(lambda: nvda.simulate_nvda_speech(descriptor), 10)
+        os.remove(nvda.session.log_path)
+
+    log_path = screen_reader_integration._sessions.close(session).log_path
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    return results
+
+def serve_fixtures():
+    """Serve benchmarks/fixtures on a free port and return the base URL."""
+    handler = functools.partial(QuietHandler, directory=str(BENCHMARK_DIR / "fixtures"))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    """Request handler that does not log every request."""
+
+    def log_message(self, format, *args):
+        pass
+
+def keyword_benchmarks(args, output_dir):
+    """Run the keyword benchmark suite and return its results, or None if it failed."""
+    results_file = output_dir / "keyword_benchmarks.json"
+    base_url = serve_fixtures()
+    robot_cmd = [
+        sys.executable, "-m", "robot",
+        "--outputdir", str(output_dir),
+        "--variable", f"BENCHMARK_URL:{base_url}speech.html",
+        "--variable", f"BENCHMARK_OUTPUT:{results_file}",
+        "--variable", f"ITERATIONS:{args.keyword_iterations}",
+        "--variable", f"BROWSER:{args.browser}",
+        str(BENCHMARK_DIR / "keyword_benchmarks.robot"),
+    ]
+    print(f"Running keyword benchmarks: {' '.join(robot_cmd)}")
+    result = subprocess.run(robot_cmd)
+    if result.returncode != 0 or not results_file.exists():
+        print(f"Keyword benchmarks failed. See {output_dir / 'log.html'}")
+        return None
+    with open(results_file) as f:
+        return json.load(f)
+
+def add_relative_times(results):
+    """
+    Add each benchmark's median as a multiple of the reference workload's median.
+
+    Python benchmarks already have a steadier relative time from
+    `timing.measure_relative` and keep it.
+    """
+    reference_ms = results[REFERENCE]["median_ms"]
+    for summary in results.values():
+        summary.setdefault("relative", round(summary["median_ms"] / reference_ms, 6))
+
+def compare(results, baseline, threshold, min_delta):
+    """
+    Compare timings relative to the reference workload with the baseline.
+
+    A benchmark regresses when its relative time is more than `threshold`
+    above the baseline's and the difference is at least `min_delta` (both in
+    multiples of the reference workload), so timer noise does not fail the
+    run. The floor scales with the host like the relative times do, and is
+    small enough for microsecond benchmarks. The expected milliseconds shown
+    are the baseline's relative time times this run's reference median.
+    Benchmarks missing from the baseline fail too, so none go unchecked.
+
+    Returns:
+        List of regression messages
+    """
+    regressions = []
+    reference = baseline.get("benchmarks", {})
+    reference_ms = results[REFERENCE]["median_ms"]
+    min_delta_ms = min_delta * reference_ms
+    print(f"Reference workload: {reference_ms:.4f} ms, ignoring slowdowns under {min_delta_ms:.4f} ms")
+    print(f"{'benchmark':36} {'median ms':>12} {'expected ms':>12} {'change':>9}")
+    for name, summary in sorted(results.items()):
+        if name == REFERENCE:
+            continue
+        median = summary["median_ms"]
+        relative = reference.get(name, {}).get("relative")
+        if relative is None:
+            print(f"{name:36} {median:12.4f} {'-':>12} {'missing':>9}")
+            regressions.append(f"{name}: not in the baseline, run with --update-baseline to add it")
+            continue
+        expected = relative * reference_ms
+        change = summary["relative"] / relative - 1 if relative else 0.0
+        flag = ""
+        if change > threshold and summary["relative"] - relative >= min_delta:
+            flag = "  REGRESSION"
+            regressions.append(f"{name}: {median:.4f} ms vs expected {expected:.4f} ms (+{change * 100:.0f}%)")
+        print(f"{name:36} {median:12.4f} {expected:12.4f} {change * 100:+8.0f}%{flag}")
+    return regressions
+
+def main():
+    """Main entry point."""
+    args = parse_arguments()
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    if args.smoke:
+        args.iterations = min(args.iterations, 3)
+        args.keyword_iterations = min(args.keyword_iterations, 1)
+
+    results = python_benchmarks(args.iterations)
+    if not args.skip_keywords:
+        keyword_results = keyword_benchmarks(args, output.parent / "benchmarks")
+        if keyword_results is None:
+            return 1
+        results.update(keyword_results)
+    add_relative_times(results)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": results,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+    if args.smoke:
+        print(f"Smoke run passed: {len(results)} benchmarks ran.")
+        return 0
+
+    baseline_path = Path(args.baseline)
+    baseline = {}
+    if baseline_path.exists():
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        # Keep entries that were not measured this time, e.g. keyword benchmarks with --skip-keywords
+        benchmarks = dict(baseline.get("benchmarks", {}))
+        benchmarks.update({name: {"relative": summary["relative"], "median_ms": summary["median_ms"]}
+                           for name, summary in results.items()})
+        baseline = {
+            "threshold": args.threshold or baseline.get("threshold", 0.5),
+            "min_delta": args.min_delta or baseline.get("min_delta", 0.005),
+            "benchmarks": benchmarks,
+        }
+        with open(baseline_path, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline updated: {baseline_path}")
+        return 0
+
+    threshold = args.threshold if args.threshold is not None else baseline.get("threshold", 0.5)
+    min_delta = args.min_delta if args.min_delta is not None else baseline.get("min_delta", 0.005)
+    regressions = compare(results, baseline, threshold, min_delta)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {threshold * 100:.0f}% or are not baselined:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("No regressions.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import time
+import statistics
+
+
+def summarize(samples):
+    """
+    Summarizes per-operation durations (seconds) as milliseconds.
+
+    Returns:
+        Dictionary with iterations, median_ms, mean_ms, min_ms, p95_ms and max_ms
+    """
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "iterations": len(ordered),
+        "median_ms": round(statistics.median(ordered) * 1000, 6),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 6),
+        "min_ms": round(ordered[0] * 1000, 6),
+        "p95_ms": round(p95 * 1000, 6),
+        "max_ms": round(ordered[-1] * 1000, 6),
+    }
+
+
+def measure(func, iterations, warmup=1, batch=1):
+    """
+    Times `func` and returns its summary.
+
+    Args:
+        func: Callable without arguments
+        iterations: Number of samples to take
+        warmup: Calls made before timing starts
+        batch: Calls per sample; use more than one for operations that take microseconds
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(int(iterations)):
+        start = time.perf_counter()
+        for _ in range(batch):
+            func()
+        samples.append((time.perf_counter() - start) / batch)
+    return summarize(samples)
+
+
+def measure_relative(func, reference, iterations, warmup=1, batch=1):
+    """
+    Times `func` like `measure`, and also relative to a reference workload.
+
+    Every sample times one `reference` call right before the batch of `func`
+    calls, so both see the same machine speed. The median of these per-sample
+    ratios is added as `relative`; it stays steady when the host speeds up or
+    slows down during the run, unlike the ratio of two separately taken medians.
+    """
+    for _ in range(warmup):
+        reference()
+        func()
+    samples = []
+    ratios = []
+    for _ in range(int(iterations)):
+        start = time.perf_counter()
+        reference()
+        middle = time.perf_counter()
+        for _ in range(batch):
+            func()
+        sample = (time.perf_counter() - middle) / batch
+        samples.append(sample)
+        ratios.append(sample / (middle - start))
+    summary = summarize(samples)
+    summary["relative"] = round(statistics.median(ratios), 6)
+    return summary
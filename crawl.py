@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Crawl a site and record role, accessible name and simulated screen reader
+speech for every focusable and landmark element on every page.
+
+Pages are visited concurrently, one worker per browser context, and one
+JSON line per page is written as soon as the page is done.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+import functools
+import http.server
+import urllib.parse
+import urllib.request
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "libraries"))
+import element_speech
+import speech_rules
+import audit_cache
+
+# Collects focusable and landmark elements plus the links to follow
+CRAWL_SCRIPT = "() => {" + element_speech.DESCRIBE_ELEMENT_JS + r"""
+    const LANDMARKS = new Set([
+        'banner', 'complementary', 'contentinfo', 'form', 'main', 'navigation', 'region', 'search',
+    ]);
+    const CANDIDATES = FOCUSABLE_SELECTOR + ', header, footer, nav, main, aside, section, form, [role]';
+
+    const isHidden = el => el.getClientRects().length === 0
+        || getComputedStyle(el).visibility === 'hidden'
+        || el.closest('[aria-hidden="true"]') !== null;
+
+    const elements = [];
+    for (const el of document.querySelectorAll(CANDIDATES)) {
+        const role = roleOf(el);
+        const focusable = el.matches(FOCUSABLE_SELECTOR) && el.tabIndex >= 0 && !el.disabled;
+        const landmark = LANDMARKS.has(role);
+        if ((!focusable && !landmark) || isHidden(el)) continue;
+        elements.push(Object.assign({selector: selectorOf(el), focusable: focusable, landmark: landmark},
+                                    describeElement(el)));
+    }
+    const links = Array.from(document.querySelectorAll('a[href], area[href]'), a => a.href);
+    return {title: document.title, elements: elements, links: links};
+}"""
+
+# Cache state under which crawl results are stored
+CACHE_STATE = "crawl"
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Crawl a site and record accessibility information per page")
+    parser.add_argument("urls", nargs="*", help="Seed URLs")
+    parser.add_argument("--urls-file", help="File with one seed URL per line")
+    parser.add_argument("--sitemap", help="Sitemap URL or file to take seed URLs from")
+    parser.add_argument("--serve", metavar="DIR",
+                        help="Serve DIR with http.server on a free port and crawl it "
+                             "(e.g. tests/fixtures/site)")
+    parser.add_argument("--max-depth", type=int, default=0,
+                        help="Follow same-origin links this many levels deep from the seeds")
+    parser.add_argument("--max-pages", type=int, default=0,
+                        help="Stop after this many pages (0 means no limit)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Number of browser contexts visiting pages at the same time")
+    parser.add_argument("--browser", default="chromium",
+                        choices=["chromium", "firefox", "webkit"],
+                        help="Browser to use for crawling")
+    parser.add_argument("--headed", action="store_true",
+                        help="Show the browser window")
+    parser.add_argument("--timeout", type=float, default=30,
+                        help="Page load timeout in seconds")
+    parser.add_argument("--profile",
+                        help="Speech profile name or JSON file (default: based on the platform)")
+    parser.add_argument("--output", default="results/crawl.jsonl",
+                        help="JSON lines file to write, or - for standard output")
+    parser.add_argument("--cache", default=audit_cache.DEFAULT_PATH,
+                        help="SQLite audit cache; unchanged pages are replayed from it")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Audit every page even if it has not changed")
+    parser.add_argument("--no-conditional-get", action="store_true",
+                        help="Do not trust 304 responses; render every cached page and compare its hashes")
+    return parser.parse_args()
+
+def read_sitemap(location, limit=10000):
+    """
+    Return the page URLs listed in a sitemap or sitemap index.
+
+    Relative locations are resolved against the sitemap URL.
+    """
+    if os.path.exists(location):
+        location = Path(location).resolve().as_uri()
+    with urllib.request.urlopen(location) as response:
+        root = ET.fromstring(response.read())
+
+    urls = []
+    is_index = root.tag.endswith("sitemapindex")
+    for element in root.iter():
+        if element.tag.endswith("loc") and element.text:
+            url = urllib.parse.urljoin(location, element.text.strip())
+            if is_index:
+                urls.extend(read_sitemap(url, limit - len(urls)))
+            else:
+                urls.append(url)
+            if len(urls) >= limit:
+                break
+    return urls[:limit]
+
+def serve_directory(directory):
+    """Serve a directory over HTTP in a background thread and return its base URL."""
+    handler = functools.partial(QuietHandler, directory=str(directory))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    """Request handler that does not log every request."""
+
+    def log_message(self, format, *args):
+        pass
+
+def normalize_url(url):
+    """Drop the fragment so the same page is only visited once."""
+    return urllib.parse.urldefrag(url)[0]
+
+class Crawler:
+    """
+    Visits pages with a fixed number of workers, each owning one browser context.
+
+    Seeds and discovered links share one queue; every page is visited once.
+    """
+
+    def __init__(self, args, output, cache=None):
+        self.args = args
+        self.output = output
+        self.cache = cache
+        # Cached results are only reused if the extraction and speech rules are the same
+        self.version = audit_cache.get_speech_audit_version(CRAWL_SCRIPT)
+        self.queue = asyncio.Queue()
+        self.seen = set()
+        self.origins = set()
+        self.pages = 0
+        self.elements = 0
+        self.errors = 0
+
+    def enqueue(self, url, depth):
+        url = normalize_url(url)
+        if url in self.seen or not url.startswith(("http://", "https://", "file://")):
+            return
+        if self.args.max_pages and len(self.seen) >= self.args.max_pages:
+            return
+        self.seen.add(url)
+        self.queue.put_nowait((url, depth))
+
+    def write(self, record):
+        self.output.write(json.dumps(record) + "\n")
+        self.output.flush()
+
+    async def visit(self, context, url, depth):
+        start = time.monotonic()
+        not_modified, entry = await self.is_not_modified(url, context)
+        if not_modified:
+            self.cache.hit()
+            record, links = dict(entry["result"]["page"], cached="not-modified"), entry["result"]["links"]
+        else:
+            record, links = await self.audit(context, url, not_modified)
+        record.update(url=url, depth=depth, seconds=round(time.monotonic() - start, 3))
+
+        if depth < self.args.max_depth:
+            for link in links:
+                if urllib.parse.urlsplit(link).netloc in self.origins:
+                    self.enqueue(link, depth + 1)
+        self.elements += len(record["elements"])
+        return record
+
+    async def is_not_modified(self, url, context):
+        """
+        Ask the server with a conditional GET whether a cached page changed.
+
+        A 304 is trusted and the page is replayed without rendering it, which
+        is what makes the request worth it. The trade-off: a page whose content
+        scripts build from other requests can change while its HTML does not,
+        and such a change is missed. Use --no-conditional-get for those sites;
+        every cached page is then rendered and replayed only if its hashes match.
+
+        Returns:
+            (not_modified, entry): not_modified is None when there was nothing
+            to ask, e.g. no cache entry or no validators
+        """
+        if self.cache is None or self.args.no_conditional_get:
+            return None, None
+        entry = self.cache.lookup(url, CACHE_STATE, self.version)
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        if not headers:
+            return None, entry
+        response = await context.request.get(url, headers=headers, timeout=self.args.timeout * 1000)
+        await response.dispose()
+        return response.status == 304, entry
+
+    async def audit(self, context, url, not_modified=None):
+        """
+        Render the page and audit it, or replay the result if its hashes are unchanged.
+
+        Args:
+            not_modified: Result of the conditional GET; False skips the cache lookup
+        """
+        page = await context.new_page()
+        try:
+            response = await page.goto(url, wait_until="load", timeout=self.args.timeout * 1000)
+            hashes, cached = None, None
+            if self.cache is not None:
+                hashes = await page.evaluate(audit_cache.PAGE_HASH_SCRIPT)
+                if not_modified is False:
+                    self.cache.miss()
+                else:
+                    cached = self.cache.check(url, hashes, CACHE_STATE, self.version)
+            if cached is None:
+                result = await page.evaluate(CRAWL_SCRIPT)
+        finally:
+            await page.close()
+
+        if cached is not None:
+            return dict(cached["page"], cached="unchanged"), cached["links"]
+
+        for element in result["elements"]:
+            element["speech"] = element_speech.speech_for_descriptor(element)
+        record = {
+            "final_url": page.url,
+            "status": response.status if response else None,
+            "title": result["title"],
+            "elements": result["elements"],
+        }
+        if self.cache is not None and response is not None and response.ok:
+            headers = await response.all_headers()
+            self.cache.store(url, {"page": record, "links": result["links"]}, hashes, CACHE_STATE,
+                             self.version, headers.get("etag"), headers.get("last-modified"))
+        return dict(record, cached=False), result["links"]
+
+    async def worker(self, browser):
+        context = await browser.new_context()
+        try:
+            while True:
+                url, depth = await self.queue.get()
+                try:
+                    record = await self.visit(context, url, depth)
+                except Exception as e:
+                    self.errors += 1
+                    record = {"url": url, "depth": depth, "error": str(e)}
+                self.pages += 1
+                self.write(record)
+                self.queue.task_done()
+        finally:
+            await context.close()
+
+    async def run(self, seeds):
+        from playwright.async_api import async_playwright
+
+        self.origins = {urllib.parse.urlsplit(url).netloc for url in seeds}
+        for url in seeds:
+            self.enqueue(url, 0)
+
+        async with async_playwright() as playwright:
+            browser = await getattr(playwright, self.args.browser).launch(headless=not self.args.headed)
+            workers = [asyncio.create_task(self.worker(browser))
+                       for _ in range(max(1, self.args.concurrency))]
+            # A worker only finishes early when it fails, e.g. cannot create its context
+            joined = asyncio.create_task(self.queue.join())
+            await asyncio.wait([joined, *workers], return_when=asyncio.FIRST_COMPLETED)
+            joined.cancel()
+            for worker in workers:
+                worker.cancel()
+            results = await asyncio.gather(*workers, return_exceptions=True)
+            await browser.close()
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            raise failures[0]
+
+def collect_seeds(args):
+    """Collect seed URLs from the arguments, a URL file and a sitemap."""
+    seeds = list(args.urls)
+    if args.urls_file:
+        with open(args.urls_file) as f:
+            seeds.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if args.sitemap:
+        seeds.extend(read_sitemap(args.sitemap))
+    return seeds
+
+def main():
+    """Main entry point."""
+    args = parse_arguments()
+    if args.profile:
+        speech_rules.select_profile(args.profile)
+
+    if args.serve:
+        base_url = serve_directory(args.serve)
+        print(f"Serving {args.serve} at {base_url}", file=sys.stderr)
+        if args.sitemap and not urllib.parse.urlsplit(args.sitemap).scheme:
+            args.sitemap = urllib.parse.urljoin(base_url, args.sitemap)
+        if not args.urls and not args.urls_file and not args.sitemap:
+            args.urls = [base_url]
+
+    seeds = collect_seeds(args)
+    if not seeds:
+        print("No seed URLs given. Pass URLs, --urls-file, --sitemap or --serve.", file=sys.stderr)
+        return 1
+
+    if args.output == "-":
+        output = sys.stdout
+    else:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        output = open(args.output, "w")
+
+    cache = None if args.no_cache else audit_cache.AuditCache(args.cache)
+    crawler = Crawler(args, output, cache)
+    start = time.monotonic()
+    try:
+        asyncio.run(crawler.run(seeds))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if cache is not None:
+            cache.close()
+    elapsed = time.monotonic() - start
+
+    rate = crawler.pages / elapsed if elapsed else 0.0
+    print(f"Crawled {crawler.pages} page(s), {crawler.elements} element(s), {crawler.errors} error(s) "
+          f"in {elapsed:.2f}s ({rate:.2f} pages/s, concurrency {args.concurrency})", file=sys.stderr)
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Audit cache: {stats['hits']} hit(s), {stats['misses']} miss(es) "
+              f"({stats['hit_rate'] * 100:.0f}% hit rate) in {cache.path}", file=sys.stderr)
+    return 0 if crawler.errors == 0 else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+from robot.api import logger
+from robot.libraries.BuiltIn import BuiltIn
+import element_speech
+
+# Builds (or reuses) an accessibility tree snapshot of the current page and
+# resolves the requested selectors against it. The page keeps a
+# MutationObserver that bumps a version number on every DOM change, and a
+# random token that changes with every new document, so the snapshot is only
+# rebuilt after a mutation or navigation.
+SNAPSHOT_SCRIPT = "(request) => {" + element_speech.DESCRIBE_ELEMENT_JS + r"""
+    const SKIPPED_TAGS = new Set(['SCRIPT', 'STYLE', 'TEMPLATE', 'NOSCRIPT', 'HEAD', 'META', 'LINK']);
+    let state = window.__a11ySnapshotState;
+    if (!state) {
+        state = window.__a11ySnapshotState = {
+            token: Math.random().toString(36).slice(2) + Date.now().toString(36),
+            version: 0,
+            ids: new WeakMap(),
+        };
+        new MutationObserver(() => { state.version += 1; }).observe(document, {
+            subtree: true, childList: true, attributes: true, characterData: true,
+        });
+    }
+
+    const build = () => {
+        const nodes = [];
+        state.ids = new WeakMap();
+        const visit = (el, parent) => {
+            if (SKIPPED_TAGS.has(el.tagName) || el.hidden || el.getAttribute('aria-hidden') === 'true') {
+                return;
+            }
+            let id = parent;
+            const role = roleOf(el);
+            const ownText = Array.from(el.childNodes).some(
+                node => node.nodeType === Node.TEXT_NODE && node.textContent.trim());
+            if (role !== 'none' && (role !== 'generic' || ownText)) {
+                id = nodes.length;
+                state.ids.set(el, id);
+                nodes.push(Object.assign({id: id, parent: parent}, describeElement(el)));
+            }
+            for (const child of el.children) {
+                visit(child, id);
+            }
+        };
+        if (document.body) {
+            visit(document.body, null);
+        }
+        return nodes;
+    };
+
+    const result = {token: state.token, version: state.version, url: location.href, selectors: {}};
+    if (request.token !== state.token || request.version !== state.version) {
+        result.nodes = build();
+    }
+    for (const selector of request.selectors) {
+        const el = resolveSelector(selector);
+        const id = el ? state.ids.get(el) : undefined;
+        if (id !== undefined) {
+            result.selectors[selector] = id;
+        } else {
+            // Elements outside the snapshot (e.g. plain containers) are described directly
+            result.selectors[selector] = el ? Object.assign({id: null, parent: null}, describeElement(el)) : null;
+        }
+    }
+    return result;
+}"""
+
+
+# Looks up an element the Browser library resolved for a selector that
+# SNAPSHOT_SCRIPT left unresolved: its snapshot node ID, or a description
+SNAPSHOT_MATCH_SCRIPT = "(elements) => {" + element_speech.DESCRIBE_ELEMENT_JS + r"""
+    if (!elements.length) return null;
+    const state = window.__a11ySnapshotState;
+    const id = state ? state.ids.get(elements[0]) : undefined;
+    return id !== undefined ? id : Object.assign({id: null, parent: null}, describeElement(elements[0]));
+}"""
+
+
+class SnapshotCache:
+    """
+    Caches one accessibility tree snapshot per page state.
+
+    The snapshot is indexed by node and by selector. Lookups only rebuild it
+    when the page reports a DOM mutation or a navigation since the last
+    build, so repeated lookups on an unchanged page cost no tree walk, and
+    lookups with `refresh=False` cost no page round trip at all.
+    """
+
+    def __init__(self):
+        self.token = None
+        self.version = None
+        self.url = None
+        self.nodes = []
+        self.selectors = {}
+        self.builds = 0
+
+    def invalidate(self):
+        self.token = None
+        self.version = None
+        self.nodes = []
+        self.selectors = {}
+
+    def lookup(self, selectors, refresh=True):
+        """
+        Returns snapshot nodes for the selectors with at most one page round trip.
+        """
+        if refresh or self.token is None or any(s not in self.selectors for s in selectors):
+            self.sync(selectors)
+        return [self.selectors.get(selector) for selector in selectors]
+
+    def sync(self, selectors):
+        """
+        Checks the page for changes, rebuilds the snapshot if needed and resolves the selectors.
+        """
+        browser = BuiltIn().get_library_instance("Browser")
+        request = {"token": self.token, "version": self.version, "selectors": selectors}
+        result = browser.evaluate_javascript(None, SNAPSHOT_SCRIPT, arg=request)
+
+        if "nodes" in result:
+            self.nodes = result["nodes"]
+            self.selectors = {}
+            self.builds += 1
+            logger.info(f"Built accessibility snapshot of {result['url']} "
+                        f"with {len(self.nodes)} nodes (version {result['version']})")
+        self.token = result["token"]
+        self.version = result["version"]
+        self.url = result["url"]
+
+        for selector, value in result["selectors"].items():
+            if value is None:
+                value = element_speech.describe_with_browser(selector, SNAPSHOT_MATCH_SCRIPT)
+            if isinstance(value, int):
+                self.selectors[selector] = self.nodes[value]
+            else:
+                self.selectors[selector] = value
+
+
+# Snapshot of the active page shared by all keywords
+_cache = SnapshotCache()
+
+def take_accessibility_snapshot():
+    """
+    Rebuilds the accessibility tree snapshot of the current page.
+    
+    Returns:
+        The number of nodes in the snapshot
+    """
+    _cache.invalidate()
+    _cache.sync([])
+    return len(_cache.nodes)
+
+def refresh_accessibility_snapshot():
+    """
+    Rebuilds the snapshot only if the page changed since it was taken.
+    
+    Returns:
+        True if the snapshot was rebuilt
+    """
+    builds = _cache.builds
+    _cache.sync([])
+    return _cache.builds != builds
+
+def invalidate_accessibility_snapshot():
+    """
+    Drops the cached snapshot so the next lookup rebuilds it.
+    """
+    _cache.invalidate()
+
+def get_accessibility_snapshot():
+    """
+    Returns the snapshot nodes of the current page, refreshing them if the page changed.
+    
+    Each node has id, parent, tag, role, name, states, level and text.
+    """
+    _cache.sync([])
+    return list(_cache.nodes)
+
+def get_snapshot_node(selector, refresh=True):
+    """
+    Returns the snapshot node for a selector, or None if the element does not exist.
+    
+    Args:
+        selector: Browser library selector of the element
+        refresh: Check the page for changes first. With False a selector
+            that was looked up before is answered from the cache without
+            a page round trip.
+    """
+    return _cache.lookup([selector], refresh=refresh)[0]
+
+def get_snapshot_speech(selector, refresh=True):
+    """
+    Returns simulated screen reader speech for an element from the cached snapshot.
+    """
+    return get_snapshot_speech_for_elements(selector, refresh=refresh)[0]
+
+def get_snapshot_speech_for_elements(*selectors, refresh=True):
+    """
+    Returns simulated speech for many elements from the cached snapshot, in selector order.
+    
+    Args:
+        selectors: Selectors as separate arguments or as one list
+        refresh: Check the page for changes first (one round trip for all selectors)
+    """
+    selectors = element_speech.flatten_selectors(selectors)
+    speech = []
+    for selector, node in zip(selectors, _cache.lookup(selectors, refresh=refresh)):
+        if node is None:
+            logger.warn(f"Element not found: {selector}")
+        speech.append(element_speech.speech_for_descriptor(node))
+    return speech
@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from robot.api import logger
+from robot.libraries.BuiltIn import BuiltIn
+import element_speech
+import speech_rules
+import cache_paths
+
+DEFAULT_PATH = os.path.join(cache_paths.CACHE_DIR, "audit_cache.sqlite")
+
+# Hashes the DOM and the accessibility tree in the page, so only two short
+# strings cross the wire. cyrb53 is used because crypto.subtle is missing
+# on plain http pages.
+PAGE_HASH_SCRIPT = "() => {" + element_speech.DESCRIBE_ELEMENT_JS + r"""
+    const cyrb53 = (text, seed = 0) => {
+        let h1 = 0xdeadbeef ^ seed, h2 = 0x41c6ce57 ^ seed;
+        for (let i = 0; i < text.length; i++) {
+            const ch = text.charCodeAt(i);
+            h1 = Math.imul(h1 ^ ch, 2654435761);
+            h2 = Math.imul(h2 ^ ch, 1597334677);
+        }
+        h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+        h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+        return (4294967296 * (2097151 & h2) + (h1 >>> 0)).toString(16).padStart(14, '0');
+    };
+    const SKIPPED_ROLES = new Set(['generic', 'none', 'presentation']);
+    const tree = [];
+    for (const el of document.body ? document.body.querySelectorAll('*') : []) {
+        const role = roleOf(el);
+        if (SKIPPED_ROLES.has(role) || el.getClientRects().length === 0) continue;
+        tree.push(role + '\u0001' + nameOf(el, role) + '\u0001' + statesOf(el, role).join(',')
+                  + '\u0001' + (levelOf(el, role) || ''));
+    }
+    return {
+        url: location.href,
+        dom: cyrb53(document.documentElement.outerHTML),
+        tree: cyrb53(tree.join('\u0002')),
+    };
+}"""
+
+
+class AuditCache:
+    """
+    Persistent SQLite cache of audit results keyed by page URL and state.
+
+    Each entry stores the DOM and accessibility tree hashes of the page it
+    was computed for, the HTTP validators of the page response and the
+    audit version, so a result is only replayed for an unchanged page
+    audited the same way. Several processes can share the file.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS audits ("
+            " url TEXT NOT NULL, state TEXT NOT NULL, version TEXT NOT NULL,"
+            " dom_hash TEXT, tree_hash TEXT, etag TEXT, last_modified TEXT,"
+            " result TEXT NOT NULL, updated REAL NOT NULL,"
+            " PRIMARY KEY (url, state))")
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, url, state="default", version=""):
+        """
+        Returns the cached entry for a page as a dictionary, or None.
+
+        Entries written by a different audit version are ignored.
+        """
+        row = self._db.execute(
+            "SELECT dom_hash, tree_hash, etag, last_modified, result, updated FROM audits"
+            " WHERE url = ? AND state = ? AND version = ?", (url, state, version)).fetchone()
+        if row is None:
+            return None
+        return {
+            "dom_hash": row[0],
+            "tree_hash": row[1],
+            "etag": row[2],
+            "last_modified": row[3],
+            "result": json.loads(row[4]),
+            "updated": row[5],
+        }
+
+    def check(self, url, hashes, state="default", version=""):
+        """
+        Returns the cached result if the page hashes match, counting a hit or a miss.
+
+        Args:
+            hashes: Dictionary with the `dom` and `tree` hashes of the page now
+        """
+        entry = self.lookup(url, state, version)
+        if entry and entry["dom_hash"] == hashes.get("dom") and entry["tree_hash"] == hashes.get("tree"):
+            self.hits += 1
+            return entry["result"]
+        self.misses += 1
+        return None
+
+    def hit(self):
+        """
+        Counts a hit decided by the caller, e.g. a page the server reports as not modified.
+        """
+        self.hits += 1
+
+    def miss(self):
+        """
+        Counts a miss decided by the caller, e.g. a page the server reports as changed.
+        """
+        self.misses += 1
+
+    def store(self, url, result, hashes=None, state="default", version="", etag=None, last_modified=None):
+        """
+        Stores the audit result for a page, replacing the previous one.
+        """
+        hashes = hashes or {}
+        self._db.execute(
+            "INSERT OR REPLACE INTO audits"
+            " (url, state, version, dom_hash, tree_hash, etag, last_modified, result, updated)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, state, version, hashes.get("dom"), hashes.get("tree"), etag, last_modified,
+             json.dumps(result), time.time()))
+        self._db.commit()
+
+    def clear(self):
+        self._db.execute("DELETE FROM audits")
+        self._db.commit()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+    def close(self):
+        self._db.close()
+
+
+# Cache opened by this robot process, and the hashes of the page last looked up
+_cache = None
+_last_hashes = {}
+
+
+def _require_cache():
+    global _cache
+    if _cache is None:
+        _cache = AuditCache()
+    return _cache
+
+
+def open_audit_cache(path=None):
+    """
+    Opens the audit cache at `path` (default: audit_cache.sqlite in A11Y_CACHE_DIR).
+
+    Other audit cache keywords open the default cache on first use, so this
+    is only needed for a different file.
+    """
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = AuditCache(path or DEFAULT_PATH)
+    return _cache.path
+
+
+def get_page_hashes():
+    """
+    Returns the URL and the DOM and accessibility tree hashes of the current page.
+    """
+    return BuiltIn().get_library_instance("Browser").evaluate_javascript(None, PAGE_HASH_SCRIPT)
+
+
+def get_speech_audit_version(script=None, profile=None):
+    """
+    Returns the audit version of simulated speech.
+
+    It is a hash of the extraction JavaScript, the page hash script and the
+    rules of the speech profile, so cached speech stops being replayed as
+    soon as any of them is edited.
+
+    Args:
+        script: JavaScript that extracts the element descriptors
+            (default: the one of `Get Speech For Elements`)
+        profile: Speech profile name or file (default: the selected profile)
+    """
+    parts = (script or element_speech.ELEMENT_DESCRIPTORS_SCRIPT, PAGE_HASH_SCRIPT, speech_rules.get_engine(profile).fingerprint)
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def get_cached_audit(state="default", version=""):
+    """
+    Returns the cached audit result for the current page, or None.
+
+    The result is only returned when the page's DOM and accessibility tree
+    hashes match the ones stored with it. Otherwise the audit has to be run
+    again and saved with `Store Audit Result`.
+
+    Args:
+        state: Name of the audit or page state the result belongs to
+        version: Audit version; results stored with another version are ignored
+    """
+    cache = _require_cache()
+    hashes = get_page_hashes()
+    _last_hashes[(hashes["url"], state)] = hashes
+    result = cache.check(hashes["url"], hashes, state, version)
+    stats = cache.stats()
+    logger.info(f"Audit cache {'hit' if result is not None else 'miss'} for {hashes['url']} [{state}] "
+                f"({stats['hits']} hits, {stats['misses']} misses)")
+    return result
+
+
+def store_audit_result(result, state="default", version=""):
+    """
+    Stores an audit result for the current page together with its hashes.
+    """
+    cache = _require_cache()
+    url = BuiltIn().get_library_instance("Browser").evaluate_javascript(None, "() => location.href")
+    hashes = _last_hashes.pop((url, state), None) or get_page_hashes()
+    cache.store(url, result, hashes, state, version)
+
+
+def get_audit_cache_stats():
+    """
+    Returns the audit cache hit and miss counts of this process.
+
+    Does not open the cache, so it can be called from a suite teardown
+    whether or not the suite used the cache.
+    """
+    stats = _cache.stats() if _cache is not None else {"hits": 0, "misses": 0, "hit_rate": 0.0}
+    logger.info(f"Audit cache: {stats['hits']} hits, {stats['misses']} misses")
+    return stats
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+from robot.api import logger
+from robot.libraries.BuiltIn import BuiltIn
+import har_cache
+
+# Clears all storage of the origin of the page being released and returns the origin
+_CLEAR_STORAGE_SCRIPT = """async () => {
+    try { localStorage.clear(); } catch (e) {}
+    try { sessionStorage.clear(); } catch (e) {}
+    try {
+        const databases = await indexedDB.databases();
+        await Promise.all(databases.map(db => new Promise(resolve => {
+            const request = indexedDB.deleteDatabase(db.name);
+            request.onsuccess = request.onerror = request.onblocked = resolve;
+        })));
+    } catch (e) {}
+    try {
+        for (const key of await caches.keys()) await caches.delete(key);
+    } catch (e) {}
+    try {
+        for (const registration of await navigator.serviceWorker.getRegistrations()) await registration.unregister();
+    } catch (e) {}
+    return location.origin;
+}"""
+
+
+class BrowserPool:
+    """
+    Keeps one browser per worker alive and hands out pre-warmed contexts.
+
+    Contexts are reset on release (pages closed, cookies, permissions and
+    the storage of the page's origin cleared: web storage, IndexedDB, Cache
+    Storage and service workers) and returned to the idle list instead of
+    being closed, so tests skip both browser launch and context creation.
+    Closing all pages also resets the viewport, because new pages get the
+    context's default viewport.
+
+    A page can only clear its own origin's storage. Contexts whose page ended
+    on another origin than it was opened on, or that still hold web storage
+    or IndexedDB of another origin, are closed and replaced instead. So are
+    all contexts while the HAR cache records, because a HAR file is only
+    written when its context closes.
+    """
+
+    def __init__(self):
+        self.browser_id = None
+        self.browser_options = None
+        self.viewport = None
+        self.idle = []
+        self.active = None
+        self.origin = None
+        self.launches = 0
+        self.recycled = 0
+        self.reuses = 0
+
+    def _run(self, name, *args):
+        return BuiltIn().run_keyword(name, *args)
+
+    def _new_context(self):
+        context = self._run("New Context", f"viewport={self.viewport}")
+        # Route before the first page opens; reused contexts keep their routes
+        har_cache.use_har_cache()
+        return context
+
+    def start(self, browser, headless, viewport, size):
+        """
+        Makes sure the pooled browser is running and `size` contexts are idle.
+        """
+        options = (str(browser), str(headless))
+        if self.browser_id is not None and options != self.browser_options:
+            self.shutdown()
+        self.viewport = viewport
+
+        if self.browser_id is None or self.browser_id not in self._run("Get Browser Ids"):
+            start = time.monotonic()
+            self.browser_id = self._run("New Browser", f"browser={browser}", f"headless={headless}")
+            self.browser_options = options
+            self.idle = []
+            self.launches += 1
+            logger.info(f"Launched pooled browser {self.browser_id} in {time.monotonic() - start:.3f}s")
+        else:
+            self._run("Switch Browser", self.browser_id)
+            # Contexts may have been closed behind our back, e.g. by auto closing
+            existing = set(self._run("Get Context Ids", "ALL", self.browser_id))
+            self.idle = [context for context in self.idle if context in existing]
+
+        while len(self.idle) < int(size):
+            self.idle.append(self._new_context())
+
+    def acquire(self, url):
+        """
+        Activates an idle context and opens `url` in a new page in it.
+        """
+        if self.active is not None:
+            # The previous test never released its context
+            self.release()
+        if self.idle:
+            context = self.idle.pop()
+            self.reuses += 1
+            self._run("Switch Context", context, self.browser_id)
+        else:
+            context = self._new_context()
+        self.active = context
+        self._run("New Page", url)
+        self.origin = self._run("Evaluate JavaScript", None, "() => location.origin")
+        return context
+
+    def release(self):
+        """
+        Resets the active context and returns it to the idle list, or closes it if it cannot be reset.
+        """
+        if self.active is None:
+            return
+        context, self.active = self.active, None
+        self._run("Switch Context", context, self.browser_id)
+        if har_cache.get_har_cache_mode() == "record":
+            self._close(context, "to write its HAR file")
+            return
+        status, origin = BuiltIn().run_keyword_and_ignore_error("Evaluate JavaScript", None, _CLEAR_STORAGE_SCRIPT)
+        if status != "PASS" or origin != self.origin:
+            self._close(context, f"because it left {self.origin}")
+            return
+        if self._has_foreign_storage():
+            self._close(context, "because it holds storage of other origins")
+            return
+        self._run("Close Page", "ALL", context, self.browser_id)
+        self._run("Delete All Cookies")
+        self._run("Clear Permissions")
+        self.idle.append(context)
+
+    def _has_foreign_storage(self):
+        # Runs after the page's own origin was cleared, so any storage left belongs to another origin
+        path = os.path.join(BuiltIn().get_variable_value("${OUTPUT DIR}"), "browser", "state", "browser_pool.json")
+        self._run("Save Storage State", path, "indexedDB=True")
+        with open(path, encoding="utf-8") as f:
+            origins = json.load(f).get("origins", [])
+        return any(entry.get("localStorage") or entry.get("indexedDB") for entry in origins)
+
+    def _close(self, context, reason):
+        self._run("Close Context", context, self.browser_id)
+        self.recycled += 1
+        logger.info(f"Closed pooled context {context} {reason}")
+
+    def shutdown(self):
+        """
+        Closes the pooled browser and forgets all contexts.
+        """
+        if self.browser_id is not None:
+            BuiltIn().run_keyword_and_ignore_error("Close Browser", self.browser_id)
+        self.browser_id = None
+        self.browser_options = None
+        self.idle = []
+        self.active = None
+
+
+# One pool per robot process, i.e. per worker
+_pool = BrowserPool()
+
+def start_browser_pool(browser="chromium", headless=True, viewport="{'width': 1280, 'height': 720}", size=1):
+    """
+    Launches the pooled browser (if needed) and pre-warms `size` idle contexts.
+
+    Use together with the Browser library import argument
+    `auto_closing_level=MANUAL`, otherwise Browser closes the pooled
+    contexts at the end of every test and the pool has to recreate them.
+
+    Args:
+        browser: chromium, firefox or webkit
+        headless: Run the browser headless
+        viewport: Default viewport of the pooled contexts
+        size: Number of idle contexts to keep ready
+    """
+    _pool.start(browser, headless, viewport, size)
+    return _pool.browser_id
+
+def acquire_pooled_page(url, browser="chromium", headless=True, viewport="{'width': 1280, 'height': 720}"):
+    """
+    Opens `url` in a fresh context taken from the pool.
+
+    Launches the browser on first use; later calls reuse it and a
+    pre-warmed context.
+
+    Returns:
+        The ID of the context the page was opened in
+    """
+    _pool.start(browser, headless, viewport, 0)
+    context = _pool.acquire(url)
+    logger.info(f"Acquired pooled context {context} ({len(_pool.idle)} idle)")
+    return context
+
+def release_pooled_page():
+    """
+    Resets the active pooled context (pages, cookies, permissions, storage) and returns it to the pool.
+
+    Contexts that cannot be reset completely are closed instead; the pool
+    creates a new one on the next acquire.
+    """
+    _pool.release()
+    logger.info(f"Released pooled context ({len(_pool.idle)} idle)")
+
+def shut_down_browser_pool():
+    """
+    Closes the pooled browser and its contexts.
+    """
+    _pool.shutdown()
+
+def get_browser_pool_stats():
+    """
+    Returns how often the pool launched a browser, reused a context and closed one instead of resetting it.
+    """
+    return {"launches": _pool.launches, "reuses": _pool.reuses, "recycled": _pool.recycled,
+            "idle": len(_pool.idle)}
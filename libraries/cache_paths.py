@@ -0,0 +1,5 @@
+import os
+
+# Directory for caches that survive between runs (rfbrowser init fingerprint,
+# audit results, environment probe); A11Y_CACHE_DIR overrides it
+CACHE_DIR = os.environ.get("A11Y_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "accessibility-testing")
@@ -0,0 +1,232 @@
+import functools
+from robot.api import logger
+import element_speech
+
+# Minimum contrast ratios (normal text, large text) per WCAG 2.x level
+THRESHOLDS = {
+    "AA": (4.5, 3.0),
+    "AAA": (7.0, 4.5),
+}
+
+# Large text is at least 18pt, or 14pt and bold (in CSS pixels)
+LARGE_TEXT_PX = 24.0
+LARGE_BOLD_TEXT_PX = 18.66
+BOLD_WEIGHT = 700
+
+# Collects the colours and font of every visible element with text in one
+# evaluation and returns them as columns. Backgrounds are composited from the
+# element up through its ancestors (memoized per element), so each element's
+# style is read once. Elements are kept in the page so selectors are only
+# built for the failing ones.
+CONTRAST_SCRIPT = "() => {" + element_speech.DESCRIBE_ELEMENT_JS + r"""
+    const SKIPPED_TAGS = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE', 'TITLE']);
+    const RGBA = /^rgba?\(\s*([\d.]+)[,\s]+([\d.]+)[,\s]+([\d.]+)(?:\s*[,/]\s*([\d.]+)(%?))?\s*\)$/;
+    const canvas = document.createElement('canvas');
+    canvas.width = canvas.height = 1;
+    const context = canvas.getContext('2d', {willReadFrequently: true});
+
+    const colors = new Map();
+    const parseColor = value => {
+        let rgba = colors.get(value);
+        if (rgba) return rgba;
+        const match = RGBA.exec(value);
+        if (match) {
+            const alpha = match[4] === undefined ? 1 : parseFloat(match[4]) / (match[5] ? 100 : 1);
+            rgba = [+match[1], +match[2], +match[3], alpha];
+        } else {
+            // Other colour syntaxes (color(), oklch(), ...) are converted by painting a pixel
+            context.clearRect(0, 0, 1, 1);
+            context.fillStyle = value;
+            context.fillRect(0, 0, 1, 1);
+            const pixel = context.getImageData(0, 0, 1, 1).data;
+            rgba = [pixel[0], pixel[1], pixel[2], pixel[3] / 255];
+        }
+        colors.set(value, rgba);
+        return rgba;
+    };
+
+    // Element -> [r, g, b, uncertain]; the page behind everything is white
+    const backgrounds = new Map();
+    const backgroundOf = el => {
+        if (!el) return [255, 255, 255, 0];
+        let background = backgrounds.get(el);
+        if (background) return background;
+        const parent = backgroundOf(el.parentElement);
+        const style = getComputedStyle(el);
+        const [r, g, b, a] = parseColor(style.backgroundColor);
+        // An opaque background hides whatever uncertain background is behind it
+        const image = style.backgroundImage !== 'none';
+        const uncertain = image || (parent[3] && a < 1) ? 1 : 0;
+        background = [r * a + parent[0] * (1 - a), g * a + parent[1] * (1 - a), b * a + parent[2] * (1 - a), uncertain];
+        backgrounds.set(el, background);
+        return background;
+    };
+
+    const visible = el => el.checkVisibility
+        ? el.checkVisibility({checkOpacity: true, checkVisibilityCSS: true})
+        : el.getClientRects().length > 0;
+
+    const targets = [];
+    const seen = new Set();
+    const columns = {fg: [], bg: [], size: [], weight: [], uncertain: [], text: []};
+    const walker = document.createTreeWalker(document.body || document.documentElement, NodeFilter.SHOW_TEXT);
+    for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+        const el = node.parentElement;
+        if (!el || seen.has(el) || !/\S/.test(node.data)) continue;
+        seen.add(el);
+        // Disabled controls are exempt from the contrast requirement
+        if (SKIPPED_TAGS.has(el.tagName) || !visible(el) || el.closest(':disabled')) continue;
+        const style = getComputedStyle(el);
+        const background = backgroundOf(el);
+        columns.fg.push(...parseColor(style.color));
+        columns.bg.push(background[0], background[1], background[2]);
+        columns.size.push(parseFloat(style.fontSize) || 16);
+        columns.weight.push(parseInt(style.fontWeight, 10) || 400);
+        columns.uncertain.push(background[3]);
+        columns.text.push(collapse(node.data).slice(0, 80));
+        targets.push(el);
+    }
+    window.__a11yContrastTargets = targets;
+    columns.count = targets.length;
+    return columns;
+}"""
+
+CONTRAST_SELECTORS_SCRIPT = "(indexes) => {" + element_speech.DESCRIBE_ELEMENT_JS + r"""
+    const targets = window.__a11yContrastTargets || [];
+    delete window.__a11yContrastTargets;
+    return indexes.map(index => targets[index] ? selectorOf(targets[index]) : null);
+}"""
+
+
+@functools.lru_cache(maxsize=1)
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        logger.debug("NumPy is not installed, computing contrast ratios in pure Python")
+        return None
+    return numpy
+
+
+def _contrast_ratios_numpy(np, fg, bg):
+    fg = np.asarray(fg, dtype=np.float64).reshape(-1, 4)
+    bg = np.asarray(bg, dtype=np.float64).reshape(-1, 3)
+    alpha = fg[:, 3:4]
+    # Semi-transparent text is blended with its background
+    channels = np.concatenate([fg[:, :3] * alpha + bg * (1 - alpha), bg]) / 255.0
+    linear = np.where(channels <= 0.04045, channels / 12.92, ((channels + 0.055) / 1.055) ** 2.4)
+    luminance = linear @ np.array([0.2126, 0.7152, 0.0722])
+    text, background = luminance[:len(fg)], luminance[len(fg):]
+    return (np.maximum(text, background) + 0.05) / (np.minimum(text, background) + 0.05)
+
+
+@functools.lru_cache(maxsize=4096)
+def _luminance(r, g, b):
+    def linear(channel):
+        channel /= 255.0
+        return channel / 12.92 if channel <= 0.04045 else ((channel + 0.055) / 1.055) ** 2.4
+    return 0.2126 * linear(r) + 0.7152 * linear(g) + 0.0722 * linear(b)
+
+
+def _contrast_ratios_python(fg, bg):
+    ratios = []
+    for i in range(len(fg) // 4):
+        r, g, b, a = fg[4 * i:4 * i + 4]
+        br, bgreen, bb = bg[3 * i:3 * i + 3]
+        text = _luminance(r * a + br * (1 - a), g * a + bgreen * (1 - a), b * a + bb * (1 - a))
+        background = _luminance(br, bgreen, bb)
+        ratios.append((max(text, background) + 0.05) / (min(text, background) + 0.05))
+    return ratios
+
+
+def _is_large_text(size, weight):
+    return size >= LARGE_TEXT_PX or (size >= LARGE_BOLD_TEXT_PX and weight >= BOLD_WEIGHT)
+
+
+def _evaluate(columns, level):
+    """
+    Computes contrast ratios and thresholds for all collected text at once.
+
+    Returns:
+        Lists of ratios, large text flags and required ratios per element,
+        and the indexes of the failing elements, lowest ratio first.
+        Elements over background images never fail.
+    """
+    normal, large_text = THRESHOLDS[level]
+    np = _numpy()
+    if np is not None:
+        ratios = _contrast_ratios_numpy(np, columns["fg"], columns["bg"])
+        size = np.asarray(columns["size"], dtype=np.float64)
+        weight = np.asarray(columns["weight"], dtype=np.float64)
+        large = (size >= LARGE_TEXT_PX) | ((size >= LARGE_BOLD_TEXT_PX) & (weight >= BOLD_WEIGHT))
+        required = np.where(large, large_text, normal)
+        failing = np.flatnonzero((ratios < required) & (np.asarray(columns["uncertain"]) == 0))
+        failing = failing[np.argsort(ratios[failing], kind="stable")]
+        return ratios.tolist(), large.tolist(), required.tolist(), failing.tolist()
+
+    ratios = _contrast_ratios_python(columns["fg"], columns["bg"])
+    large = [_is_large_text(size, weight) for size, weight in zip(columns["size"], columns["weight"])]
+    required = [large_text if is_large else normal for is_large in large]
+    failing = [i for i in range(len(ratios)) if ratios[i] < required[i] and not columns["uncertain"][i]]
+    failing.sort(key=lambda i: ratios[i])
+    return ratios, large, required, failing
+
+
+def _rgb(values):
+    return "rgb(" + ", ".join(str(round(value)) for value in values[:3]) + ")"
+
+
+def audit_color_contrast(level="AA", fail_on_issues=False):
+    """
+    Checks the colour contrast of all text on the current page against WCAG.
+
+    The colour, composited background colour, font size and weight of every
+    visible element with text are collected in one in-page evaluation, and
+    all contrast ratios are computed at once (vectorized with NumPy when it
+    is installed). Large text (24px, or 18.66px and bold) needs 3:1 at AA,
+    other text 4.5:1; AAA requires 4.5:1 and 7:1.
+
+    Backgrounds are taken from the element and its ancestors. Text over a
+    background image cannot be judged that way; it is counted as needing
+    review instead of being reported.
+
+    Args:
+        level: `AA` or `AAA`
+        fail_on_issues: Fail the keyword if any text does not have enough contrast
+
+    Returns:
+        The failing elements, lowest contrast first, each with selector, text,
+        ratio, required, foreground, background, font_size, font_weight and large
+    """
+    level = level.upper()
+    if level not in THRESHOLDS:
+        raise ValueError(f"Unknown WCAG level '{level}'. Choose from: {', '.join(THRESHOLDS)}")
+    browser = element_speech._browser()
+    columns = browser.evaluate_javascript(None, CONTRAST_SCRIPT)
+    count = columns["count"]
+    ratios, large, required, failing = _evaluate(columns, level)
+    uncertain = sum(columns["uncertain"])
+    selectors = browser.evaluate_javascript(None, CONTRAST_SELECTORS_SCRIPT, arg=failing) if failing else []
+
+    failures = []
+    for index, selector in zip(failing, selectors):
+        failures.append({
+            "selector": selector,
+            "text": columns["text"][index],
+            "ratio": round(ratios[index], 2),
+            "required": required[index],
+            "foreground": _rgb(columns["fg"][4 * index:4 * index + 4]),
+            "background": _rgb(columns["bg"][3 * index:3 * index + 3]),
+            "font_size": columns["size"][index],
+            "font_weight": columns["weight"][index],
+            "large": large[index],
+        })
+        logger.info(f"Contrast {failures[-1]['ratio']}:1 < {required[index]}:1 at {selector} "
+                    f"('{columns['text'][index]}', {failures[-1]['foreground']} on {failures[-1]['background']})")
+
+    logger.info(f"Checked contrast of {count} text elements at WCAG {level}: {len(failures)} failures, "
+                f"{uncertain} over background images need review")
+    if failures and fail_on_issues:
+        raise AssertionError(f"{len(failures)} text element(s) do not meet WCAG {level} contrast, lowest "
+                             f"{failures[0]['ratio']}:1 at {failures[0]['selector']}")
+    return failures
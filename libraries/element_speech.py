@@ -0,0 +1,427 @@
+from robot.api import logger
+from robot.libraries.BuiltIn import BuiltIn
+import speech_rules
+
+# JavaScript helpers that resolve Browser library selectors and describe
+# elements the way a screen reader sees them. Shared by every keyword that
+# reads accessibility information in a single page round trip.
+DESCRIBE_ELEMENT_JS = r"""
+const IMPLICIT_ROLES = {
+    A: el => el.hasAttribute('href') ? 'link' : 'generic',
+    AREA: el => el.hasAttribute('href') ? 'link' : 'generic',
+    ARTICLE: () => 'article',
+    ASIDE: () => 'complementary',
+    BUTTON: () => 'button',
+    DETAILS: () => 'group',
+    DIALOG: () => 'dialog',
+    FIELDSET: () => 'group',
+    FIGURE: () => 'figure',
+    FOOTER: el => el.closest('article, aside, main, nav, section') ? 'generic' : 'contentinfo',
+    FORM: () => 'form',
+    H1: () => 'heading', H2: () => 'heading', H3: () => 'heading',
+    H4: () => 'heading', H5: () => 'heading', H6: () => 'heading',
+    HEADER: el => el.closest('article, aside, main, nav, section') ? 'generic' : 'banner',
+    HR: () => 'separator',
+    IMG: el => el.getAttribute('alt') === '' ? 'presentation' : 'img',
+    INPUT: el => {
+        const type = (el.getAttribute('type') || 'text').toLowerCase();
+        if (['button', 'submit', 'reset', 'image'].includes(type)) return 'button';
+        if (type === 'checkbox') return 'checkbox';
+        if (type === 'radio') return 'radio';
+        if (type === 'range') return 'slider';
+        if (type === 'number') return 'spinbutton';
+        if (type === 'search') return 'searchbox';
+        if (type === 'hidden') return 'none';
+        return 'textbox';
+    },
+    LI: () => 'listitem',
+    MAIN: () => 'main',
+    NAV: () => 'navigation',
+    OL: () => 'list',
+    OPTION: () => 'option',
+    P: () => 'paragraph',
+    PROGRESS: () => 'progressbar',
+    SECTION: el => el.hasAttribute('aria-label') || el.hasAttribute('aria-labelledby') ? 'region' : 'generic',
+    SELECT: el => el.multiple || el.size > 1 ? 'listbox' : 'combobox',
+    SUMMARY: () => 'button',
+    TABLE: () => 'table',
+    TD: () => 'cell',
+    TEXTAREA: () => 'textbox',
+    TH: () => 'columnheader',
+    TR: () => 'row',
+    UL: () => 'list',
+};
+
+const NAME_FROM_CONTENT = new Set([
+    'button', 'cell', 'checkbox', 'columnheader', 'heading', 'link', 'listitem',
+    'menuitem', 'option', 'radio', 'row', 'switch', 'tab', 'tooltip', 'treeitem',
+]);
+
+const collapse = text => (text || '').replace(/\s+/g, ' ').trim();
+
+// Resolves the plain css, xpath and id selectors in the page. Anything else
+// (text=, >> chains, other engines, Playwright CSS extensions) and selectors
+// that match nothing give null and are left to the Browser library.
+const resolveSelector = (selector, root = document) => {
+    let engine = 'css';
+    let body = selector;
+    const match = /^(css|xpath|id)\s*=\s*(.*)$/s.exec(selector);
+    if (match) {
+        engine = match[1];
+        body = match[2];
+    } else if (selector.startsWith('//') || selector.startsWith('..') || selector.startsWith('(')) {
+        engine = 'xpath';
+    }
+    if (body.includes('>>')) return null;
+    try {
+        if (engine === 'xpath') {
+            return document.evaluate(body, root, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+        }
+        if (engine === 'id') {
+            return document.getElementById(body);
+        }
+        return root.querySelector(body);
+    } catch (e) {
+        return null;
+    }
+};
+
+const roleOf = el => {
+    const explicit = collapse(el.getAttribute('role')).split(' ')[0];
+    if (explicit) return explicit;
+    const implicit = IMPLICIT_ROLES[el.tagName];
+    return implicit ? implicit(el) : 'generic';
+};
+
+const textOf = el => collapse(el.innerText !== undefined ? el.innerText : el.textContent);
+
+const nameOf = (el, role) => {
+    const labelledBy = el.getAttribute('aria-labelledby');
+    if (labelledBy) {
+        const text = labelledBy.split(/\s+/)
+            .map(id => document.getElementById(id))
+            .filter(Boolean)
+            .map(textOf)
+            .join(' ');
+        if (collapse(text)) return collapse(text);
+    }
+    const label = collapse(el.getAttribute('aria-label'));
+    if (label) return label;
+    if (el.labels && el.labels.length) {
+        return collapse(Array.from(el.labels).map(textOf).join(' '));
+    }
+    if (el.tagName === 'IMG' || el.tagName === 'AREA' || (el.tagName === 'INPUT' && el.type === 'image')) {
+        const alt = collapse(el.getAttribute('alt'));
+        if (alt) return alt;
+    }
+    if (el.tagName === 'INPUT' && ['button', 'submit', 'reset'].includes(el.type)) {
+        return collapse(el.value) || (el.type === 'submit' ? 'Submit' : el.type === 'reset' ? 'Reset' : '');
+    }
+    if (NAME_FROM_CONTENT.has(role)) {
+        const text = textOf(el);
+        if (text) return text;
+    }
+    return collapse(el.getAttribute('title')) || collapse(el.getAttribute('placeholder'));
+};
+
+const statesOf = (el, role) => {
+    const states = [];
+    const aria = name => el.getAttribute('aria-' + name);
+    if (el.disabled || aria('disabled') === 'true') states.push('disabled');
+    if (role === 'checkbox' || role === 'radio' || role === 'switch') {
+        const checked = aria('checked') !== null ? aria('checked') === 'true' : !!el.checked;
+        states.push(checked ? 'checked' : 'not checked');
+    }
+    if (aria('expanded') !== null) states.push(aria('expanded') === 'true' ? 'expanded' : 'collapsed');
+    if (aria('pressed') !== null) states.push(aria('pressed') === 'true' ? 'pressed' : 'not pressed');
+    if (aria('selected') === 'true' || (el.tagName === 'OPTION' && el.selected)) states.push('selected');
+    if (el.required || aria('required') === 'true') states.push('required');
+    if (aria('invalid') === 'true') states.push('invalid entry');
+    if (el.readOnly || aria('readonly') === 'true') states.push('read only');
+    if (aria('current') && aria('current') !== 'false') states.push('current');
+    return states;
+};
+
+const levelOf = (el, role) => {
+    if (role !== 'heading') return null;
+    const explicit = parseInt(el.getAttribute('aria-level'), 10);
+    if (explicit) return explicit;
+    const match = /^H([1-6])$/.exec(el.tagName);
+    return match ? parseInt(match[1], 10) : 2;
+};
+
+const FOCUSABLE_SELECTOR = 'a[href], area[href], button, input, select, textarea, summary, iframe, '
+    + '[tabindex], [contenteditable=""], [contenteditable="true"]';
+
+// Unique CSS selector for an element, usable as a Browser library selector
+const selectorOf = el => {
+    const parts = [];
+    for (let node = el; node && node.nodeType === 1; node = node.parentElement) {
+        if (node.id && document.querySelectorAll('#' + CSS.escape(node.id)).length === 1) {
+            parts.unshift('#' + CSS.escape(node.id));
+            break;
+        }
+        let part = node.tagName.toLowerCase();
+        const parent = node.parentElement;
+        if (parent) {
+            const siblings = Array.from(parent.children).filter(child => child.tagName === node.tagName);
+            if (siblings.length > 1) part += ':nth-of-type(' + (siblings.indexOf(node) + 1) + ')';
+        }
+        parts.unshift(part);
+    }
+    return 'css=' + parts.join(' > ');
+};
+
+const describeElement = el => {
+    const role = roleOf(el);
+    return {
+        tag: el.tagName.toLowerCase(),
+        role: role,
+        name: nameOf(el, role),
+        states: statesOf(el, role),
+        level: levelOf(el, role),
+        text: textOf(el).slice(0, 500),
+    };
+};
+"""
+
+# Resolves a list of selectors and describes each element in one evaluation
+ELEMENT_DESCRIPTORS_SCRIPT = "(selectors) => {" + DESCRIBE_ELEMENT_JS + """
+    return selectors.map(selector => {
+        const el = resolveSelector(selector);
+        return el ? Object.assign({selector: selector, found: true}, describeElement(el))
+                  : {selector: selector, found: false};
+    });
+}"""
+
+# Describes the first element a selector matches in the Browser library.
+# Used for the selectors resolveSelector leaves to it; null if none matches.
+DESCRIBE_MATCH_SCRIPT = "(elements) => {" + DESCRIBE_ELEMENT_JS + """
+    return elements.length ? describeElement(elements[0]) : null;
+}"""
+
+# Interactive roles that keyboard users must be able to reach
+_INTERACTIVE_ROLES_JS = """
+const INTERACTIVE_ROLES = new Set([
+    'button', 'checkbox', 'combobox', 'link', 'listbox', 'menuitem', 'menuitemcheckbox',
+    'menuitemradio', 'option', 'radio', 'searchbox', 'slider', 'spinbutton', 'switch', 'tab',
+    'textbox', 'treeitem',
+]);
+"""
+
+# Computes the sequential focus navigation order in the page, focuses every
+# stop once to check it is reachable, and sends it a cancelable Tab keydown
+# to detect scripts that keep focus from moving on
+FOCUS_ORDER_SCRIPT = "() => {" + DESCRIBE_ELEMENT_JS + _INTERACTIVE_ROLES_JS + """
+    const isRendered = el => el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden';
+    const isDisabled = el => el.disabled || el.closest('[inert]') !== null;
+
+    // Only the checked radio button of a group (or the first one) is a tab stop
+    const radioGroups = new Map();
+    const isSkippedRadio = el => {
+        if (el.tagName !== 'INPUT' || el.type !== 'radio' || !el.name) return false;
+        const key = (el.form ? 'form' + Array.from(document.forms).indexOf(el.form) : '') + '/' + el.name;
+        if (!radioGroups.has(key)) {
+            const group = Array.from(document.querySelectorAll('input[type=radio]'))
+                .filter(radio => radio.name === el.name && radio.form === el.form && isRendered(radio) && !radio.disabled);
+            radioGroups.set(key, group.find(radio => radio.checked) || group[0]);
+        }
+        return radioGroups.get(key) !== el;
+    };
+
+    const candidates = Array.from(document.querySelectorAll(FOCUSABLE_SELECTOR));
+    const tabbable = candidates.filter(el => el.tabIndex >= 0 && !isDisabled(el) && isRendered(el) && !isSkippedRadio(el));
+    // Positive tabindex values come first in ascending order, then DOM order
+    const ordered = tabbable
+        .map((el, position) => ({el, position}))
+        .sort((a, b) => {
+            const ta = a.el.tabIndex > 0 ? a.el.tabIndex : Infinity;
+            const tb = b.el.tabIndex > 0 ? b.el.tabIndex : Infinity;
+            return ta === tb ? a.position - b.position : ta - tb;
+        })
+        .map(item => item.el);
+    const tabbableSet = new Set(tabbable);
+    const positions = new Map(ordered.map((el, index) => [el, index]));
+
+    const previousFocus = document.activeElement;
+    const order = [];
+    const reached = new Set();
+    ordered.forEach((el, index) => {
+        const record = Object.assign({index: index, selector: selectorOf(el), tabindex: el.tabIndex,
+                                      reachable: true, trap: false, redirect: null}, describeElement(el));
+        el.focus({preventScroll: true});
+        const active = document.activeElement;
+        if (active !== el && !el.contains(active)) {
+            record.reachable = false;
+            record.redirect = active && active !== document.body ? selectorOf(active) : null;
+        } else {
+            reached.add(el);
+            const tab = new KeyboardEvent('keydown', {key: 'Tab', code: 'Tab', bubbles: true, cancelable: true});
+            const allowed = active.dispatchEvent(tab);
+            const after = document.activeElement;
+            if (after !== active) {
+                record.redirect = after && after !== document.body ? selectorOf(after) : null;
+                // Moving focus back to an earlier stop keeps the user from getting past this one
+                const target = positions.get(after);
+                record.trap = target !== undefined && target <= index;
+            } else if (!allowed) {
+                record.trap = true;
+            }
+        }
+        order.push(record);
+    });
+    if (previousFocus && previousFocus.focus) {
+        previousFocus.focus({preventScroll: true});
+    } else if (document.activeElement && document.activeElement.blur) {
+        document.activeElement.blur();
+    }
+
+    // Interactive elements a keyboard user can never land on
+    const unreachable = [];
+    for (const el of document.querySelectorAll(FOCUSABLE_SELECTOR + ', [role], [onclick]')) {
+        if (reached.has(el) || isDisabled(el) || !isRendered(el) || isSkippedRadio(el)) continue;
+        const role = roleOf(el);
+        if (!INTERACTIVE_ROLES.has(role) && !el.hasAttribute('onclick')) continue;
+        if (tabbableSet.has(el)) continue;
+        let reason = 'not focusable';
+        if (el.hasAttribute('tabindex') && el.tabIndex < 0) reason = 'tabindex=' + el.getAttribute('tabindex');
+        unreachable.push(Object.assign({index: null, selector: selectorOf(el), tabindex: el.tabIndex,
+                                        reachable: false, trap: false, redirect: null, reason: reason},
+                                       describeElement(el)));
+    }
+    return {order: order, unreachable: unreachable};
+}"""
+
+def _browser():
+    return BuiltIn().get_library_instance("Browser")
+
+
+def describe_with_browser(selector, script=DESCRIBE_MATCH_SCRIPT):
+    """
+    Resolves a selector with the Browser library and describes the first matching element.
+
+    Supports every selector the Browser library does (`text=`, `>>` chains,
+    element references from `Get Element`, ...). Does not wait for the
+    element to appear.
+
+    Returns:
+        The descriptor, or None if no element matches
+    """
+    return _browser().evaluate_javascript(selector, script, all_elements=True)
+
+
+def flatten_selectors(selectors):
+    """
+    Flattens selectors passed as separate arguments and/or lists into one list.
+    """
+    flat = []
+    for selector in selectors:
+        if isinstance(selector, (list, tuple)):
+            flat.extend(selector)
+        else:
+            flat.append(selector)
+    return flat
+
+
+def speech_for_descriptor(descriptor, profile=None):
+    """
+    Builds simulated screen reader speech for an element descriptor.
+
+    Args:
+        descriptor: Dictionary with role, name, states, level and text
+        profile: Speech profile name or file (default: the profile selected
+            with `Set Speech Profile`)
+
+    Returns:
+        Simulated speech text, or an empty string for missing elements
+    """
+    if not descriptor or not descriptor.get("found", True):
+        return ""
+    return speech_rules.get_engine(profile).speak(descriptor)
+
+
+def get_element_descriptors(*selectors):
+    """
+    Returns role, accessible name, states and text for many elements at once.
+
+    Plain CSS, XPath and `id=` selectors are resolved in a single in-page
+    evaluation. Other selectors, and ones that match nothing there, are
+    resolved by the Browser library, so every Browser selector works.
+
+    Args:
+        selectors: Selectors as separate arguments or as one list
+
+    Returns:
+        A list of descriptor dictionaries in the same order as the selectors
+    """
+    selectors = flatten_selectors(selectors)
+    if not selectors:
+        return []
+    descriptors = _browser().evaluate_javascript(None, ELEMENT_DESCRIPTORS_SCRIPT, arg=selectors)
+    for index, descriptor in enumerate(descriptors):
+        if not descriptor["found"]:
+            described = describe_with_browser(descriptor["selector"])
+            if described:
+                descriptors[index] = dict(described, selector=descriptor["selector"], found=True)
+    return descriptors
+
+
+def get_speech_for_elements(*selectors):
+    """
+    Returns simulated screen reader speech for many elements in one page round trip.
+
+    Args:
+        selectors: Selectors as separate arguments or as one list
+
+    Returns:
+        A list of speech strings in the same order as the selectors. Elements
+        that could not be found get an empty string.
+    """
+    descriptors = get_element_descriptors(*selectors)
+    speech = []
+    for descriptor in descriptors:
+        if not descriptor.get("found"):
+            logger.warn(f"Element not found: {descriptor.get('selector')}")
+        speech.append(speech_for_descriptor(descriptor))
+        logger.info(f"Element: {descriptor.get('selector')}, Speech: {speech[-1]}")
+    return speech
+
+
+def traverse_focus_order(fail_on_issues=False):
+    """
+    Walks every focus stop of the current page in Tab order and returns what a screen reader would say.
+
+    The whole traversal runs in a single in-page evaluation: the sequential
+    focus navigation order is computed (positive tabindex first, then DOM
+    order, one stop per radio group), every stop is focused once to check
+    it can take focus, and a cancelable Tab keydown is sent to it to detect
+    focus traps. Interactive elements that are never in the Tab order, such
+    as `div role=button` without tabindex, are reported as unreachable.
+
+    Args:
+        fail_on_issues: Fail the keyword if focus traps or unreachable elements are found
+
+    Returns:
+        A list of records in focus order, each with selector, role, name, states,
+        speech, tabindex, reachable, trap and redirect (where focus went instead).
+        Unreachable interactive elements follow with `reachable` False, `index`
+        None and a `reason`.
+    """
+    result = _browser().evaluate_javascript(None, FOCUS_ORDER_SCRIPT)
+    records = result["order"] + result["unreachable"]
+    issues = []
+    for record in records:
+        record["speech"] = speech_for_descriptor(record)
+        if record["index"] is not None:
+            logger.info(f"Focus {record['index'] + 1}: {record['selector']}, Speech: {record['speech']}")
+        if record["trap"]:
+            issues.append(f"Focus trap at {record['selector']} ({record['speech']})")
+        elif not record["reachable"]:
+            reason = record.get("reason") or f"focus went to {record['redirect'] or 'nothing'}"
+            issues.append(f"Unreachable by keyboard: {record['selector']} ({record['speech']}): {reason}")
+    for issue in issues:
+        logger.warn(issue)
+    logger.info(f"{len(result['order'])} focus stops, {len(issues)} issues")
+    if issues and fail_on_issues:
+        raise AssertionError("Keyboard navigation issues found:\n" + "\n".join(issues))
+    return records
@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import platform
+import importlib.util
+from robot.api import logger
+import cache_paths
+
+DEFAULT_PATH = os.path.join(cache_paths.CACHE_DIR, "environment.json")
+
+# Bump when the probed fields change so old cache files are ignored
+PROBE_VERSION = 1
+
+NVDA_PATHS = (
+    os.path.join(os.environ.get("ProgramFiles(x86)", r"C:\Program Files (x86)"), "NVDA", "nvda.exe"),
+    os.path.join(os.environ.get("ProgramFiles", r"C:\Program Files"), "NVDA", "nvda.exe"),
+)
+VOICEOVER_PATH = "/System/Library/CoreServices/VoiceOver.app"
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _browser_dirs():
+    """
+    Returns the Browser library wrapper directory and the Playwright browsers directory.
+
+    Uses find_spec so the Browser library is located without importing it.
+    """
+    spec = importlib.util.find_spec("Browser")
+    if spec is None or spec.origin is None:
+        return None, None
+    wrapper_dir = os.path.join(os.path.dirname(spec.origin), "wrapper")
+    browsers_path = os.environ.get("PLAYWRIGHT_BROWSERS_PATH", "").strip()
+    if not browsers_path or browsers_path == "0":
+        browsers_path = os.path.join(wrapper_dir, "node_modules", "playwright-core", ".local-browsers")
+    return wrapper_dir, browsers_path
+
+
+def _cache_key():
+    """
+    Returns the values that invalidate the cached probe when they change.
+
+    Only environment variables and file modification times are read, so
+    computing the key takes well under a millisecond.
+    """
+    wrapper_dir, browsers_dir = _browser_dirs()
+    return {
+        "version": PROBE_VERSION,
+        "platform": sys.platform,
+        "host": platform.node(),
+        "python": sys.executable,
+        "python_version": list(sys.version_info[:3]),
+        "browser_library": _mtime(wrapper_dir) if wrapper_dir else None,
+        "node_modules": _mtime(os.path.join(wrapper_dir, "node_modules")) if wrapper_dir else None,
+        "browsers": [browsers_dir, _mtime(browsers_dir)] if browsers_dir else None,
+        "screen_readers": [_mtime(path) for path in NVDA_PATHS + (VOICEOVER_PATH,)],
+    }
+
+
+def _package_version(name):
+    import importlib.metadata
+    try:
+        return importlib.metadata.version(name)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def _probe():
+    system = platform.system()
+    wrapper_dir, browsers_dir = _browser_dirs()
+    playwright_version = None
+    if wrapper_dir:
+        try:
+            with open(os.path.join(wrapper_dir, "node_modules", "playwright-core", "package.json")) as f:
+                playwright_version = json.load(f).get("version")
+        except (OSError, ValueError):
+            pass
+    browsers = sorted(os.listdir(browsers_dir)) if browsers_dir and os.path.isdir(browsers_dir) else []
+
+    nvda_path = next((path for path in NVDA_PATHS if os.path.exists(path)), None) if system == "Windows" else None
+    screen_readers = {
+        "nvda": {
+            "installed": nvda_path is not None,
+            "path": nvda_path,
+            "automation": importlib.util.find_spec("nvda_automation") is not None,
+        },
+        "voiceover": {
+            "installed": system == "Darwin" and os.path.exists(VOICEOVER_PATH),
+        },
+    }
+    if screen_readers["nvda"]["installed"] and screen_readers["nvda"]["automation"]:
+        default_backend = "nvda"
+    elif screen_readers["voiceover"]["installed"]:
+        default_backend = "voiceover"
+    else:
+        default_backend = "simulator"
+
+    return {
+        "os": system,
+        "os_release": platform.release(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "robotframework": _package_version("robotframework"),
+        "browser_library": _package_version("robotframework-browser"),
+        "playwright": playwright_version,
+        "browsers": browsers,
+        "screen_readers": screen_readers,
+        "default_backend": default_backend,
+    }
+
+
+def _read_cache(path, key):
+    try:
+        with open(path, encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("key") != key:
+        return None
+    return cached.get("environment")
+
+
+def _write_cache(path, key, environment):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "environment": environment}, f, indent=1, sort_keys=True)
+        os.replace(temporary, path)
+    except OSError as e:
+        logger.debug(f"Could not write environment cache {path}: {e}")
+
+
+_environment = None
+
+
+def probe_environment(refresh=False, path=DEFAULT_PATH):
+    """
+    Returns the operating system, browser and screen reader capabilities of this machine.
+
+    The result is cached in memory and in environment.json in A11Y_CACHE_DIR.
+    The file is reused until the platform, Python, Browser library
+    installation, downloaded browsers or screen reader installations change,
+    so later runs skip reading package metadata and browser directories.
+
+    Args:
+        refresh: Probe again even when a cached result is valid
+        path: Cache file
+
+    Returns:
+        Dictionary with os, os_release, machine, python, robotframework,
+        browser_library, playwright, browsers, screen_readers and default_backend
+    """
+    global _environment
+    if _environment is not None and not refresh:
+        return _environment
+    key = _cache_key()
+    environment = None if refresh else _read_cache(path, key)
+    if environment is None:
+        environment = _probe()
+        _write_cache(path, key, environment)
+        logger.info(f"Probed environment: {environment['os']}, backend {environment['default_backend']}, "
+                    f"browsers {', '.join(environment['browsers']) or 'none'}")
+    _environment = environment
+    return environment
@@ -0,0 +1,137 @@
+import os
+import json
+import time
+import glob
+import itertools
+from robot.api import logger
+from robot.libraries.BuiltIn import BuiltIn
+
+# off: live network, record: save traffic to HAR files, replay: serve it from them
+MODES = ("off", "record", "replay")
+
+# Directory holding the recorded HAR files
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests", "har")
+
+STATS_FILE = "har_cache.json"
+
+_mode = os.environ.get("HAR_MODE", "off").lower()
+_directory = os.environ.get("HAR_DIR") or DEFAULT_DIR
+# Replay without network access, so requests missing from the HAR files fail fast
+_offline = os.environ.get("HAR_OFFLINE", "true").lower() not in ("false", "0", "no")
+_recordings = itertools.count(1)
+
+# Browser library JavaScript extension doing the routing
+EXTENSION = os.path.join(os.path.dirname(os.path.abspath(__file__)), "js", "har_replay.js")
+
+# Browser library instances that have loaded the extension
+_extension_loaded = set()
+
+
+def set_har_cache_mode(mode, directory=None, offline=None):
+    """
+    Sets whether new contexts record traffic to HAR files, replay it or use the network.
+
+    The initial values come from the HAR_MODE, HAR_DIR and HAR_OFFLINE
+    environment variables (run_tests.py --record and --replay set them).
+
+    Args:
+        mode: `off`, `record` or `replay`
+        directory: Directory of the HAR files (default: tests/har)
+        offline: When replaying, abort requests the HAR files cannot answer
+            instead of sending them to the network
+    """
+    global _mode, _directory, _offline
+    mode = mode.lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown HAR cache mode '{mode}'. Choose from: {', '.join(MODES)}")
+    _mode = mode
+    if directory:
+        _directory = directory
+    if offline is not None:
+        _offline = BuiltIn().convert_to_boolean(offline)
+
+
+def get_har_cache_mode():
+    """
+    Returns the HAR cache mode: `off`, `record` or `replay`.
+    """
+    return _mode
+
+
+def _call_extension(name, **arguments):
+    """
+    Calls a function of the JavaScript extension, loading it into the Browser library on first use.
+
+    Loading it here instead of with the Browser `jsextension` import option
+    keeps the extension out of runs that do not use the HAR cache.
+    """
+    browser = BuiltIn().get_library_instance("Browser")
+    if id(browser) not in _extension_loaded:
+        browser.init_js_extension(EXTENSION)
+        _extension_loaded.add(id(browser))
+    return browser.call_js_keyword(name, **arguments)
+
+
+def _har_files(directory):
+    # Oldest first: the extension routes later files with higher priority
+    return sorted(glob.glob(os.path.join(directory, "*.har")), key=os.path.getmtime)
+
+
+def use_har_cache():
+    """
+    Routes the active browser context according to the HAR cache mode.
+
+    In record mode the context's traffic is written to a new HAR file in the
+    HAR directory when the context closes; each context gets its own file so
+    tests do not overwrite each other. In replay mode requests are answered
+    from the recorded files, newest first. Does nothing when the mode is off
+    or the context was already routed (pooled contexts are reused).
+
+    Returns:
+        True if the context was routed now
+    """
+    if _mode == "off":
+        return False
+    directory = os.path.abspath(_directory)
+    if _mode == "record":
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_recordings)}.har"
+        path = os.path.join(directory, name)
+        return _call_extension("routeContextFromHar", harFiles=[], recordPath=path, offline=False)
+
+    har_files = _har_files(directory)
+    if not har_files:
+        raise AssertionError(f"No HAR files in {directory}. Record them first with run_tests.py --record.")
+    return _call_extension("routeContextFromHar", harFiles=har_files, recordPath="", offline=_offline)
+
+
+def get_har_cache_stats(reset=False):
+    """
+    Returns the HAR routing statistics of this run: mode, contexts, requests, hits, misses, hit_rate and missed URLs.
+    """
+    stats = _call_extension("harRouteStats", reset=BuiltIn().convert_to_boolean(reset))
+    stats["hit_rate"] = round(stats["hits"] / stats["requests"], 4) if stats["requests"] and stats["mode"] == "replay" else None
+    return stats
+
+
+def save_har_cache_stats(path=None):
+    """
+    Logs the HAR routing statistics and writes them to har_cache.json in the output directory.
+
+    Does nothing when the HAR cache is off.
+    """
+    if _mode == "off":
+        return None
+    stats = get_har_cache_stats()
+    path = path or os.path.join(BuiltIn().get_variable_value("${OUTPUT DIR}"), STATS_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2)
+    if stats["mode"] == "replay":
+        rate = f"{stats['hit_rate'] * 100:.1f}%" if stats["hit_rate"] is not None else "n/a"
+        logger.info(f"HAR replay: {stats['hits']}/{stats['requests']} requests served from HAR files ({rate}), "
+                    f"{stats['misses']} misses")
+        for url in stats["missed"]:
+            logger.info(f"Not in HAR files: {url}")
+    else:
+        logger.info(f"HAR recording: {stats['requests']} requests in {stats['contexts']} contexts")
+    return stats
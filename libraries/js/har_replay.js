@@ -0,0 +1,75 @@
+// Browser library JavaScript extension: records page traffic into HAR files
+// and replays it, counting which requests the HAR files could answer.
+// libraries/har_cache.py loads it on first use; it can also be imported with
+// `Library    Browser    jsextension=${CURDIR}/../libraries/js/har_replay.js`.
+
+const stats = { mode: "off", contexts: 0, requests: 0, misses: 0, missed: [] };
+
+// Only the first few missed URLs are kept, enough to see what the HAR lacks
+const MAX_MISSED_URLS = 50;
+
+// Contexts already routed; pooled contexts are reused and must not stack routes
+const routedContexts = new WeakSet();
+
+function recordMiss(url) {
+  stats.misses += 1;
+  if (stats.missed.length < MAX_MISSED_URLS && !stats.missed.includes(url)) {
+    stats.missed.push(url);
+  }
+}
+
+async function routeContextFromHar(harFiles, recordPath, offline, context, logger) {
+  if (!context) {
+    throw new Error("No active context. Create one with New Context before routing it from HAR files.");
+  }
+  if (routedContexts.has(context)) {
+    return false;
+  }
+  routedContexts.add(context);
+  stats.contexts += 1;
+
+  if (recordPath) {
+    // The HAR is written when the context closes
+    stats.mode = "record";
+    await context.routeFromHAR(recordPath, { update: true, updateContent: "embed", updateMode: "minimal" });
+    await context.route("**/*", (route) => {
+      stats.requests += 1;
+      return route.fallback();
+    });
+    logger(`Recording traffic to ${recordPath}`);
+    return true;
+  }
+
+  // Routes run in reverse registration order: the counter sees every request
+  // first, each HAR file falls back to the next one (newest first) when it has
+  // no match, and the miss handler at the bottom sees what none could answer.
+  stats.mode = "replay";
+  await context.route("**/*", (route) => {
+    recordMiss(route.request().url());
+    return offline ? route.abort("internetdisconnected") : route.continue();
+  });
+  for (const harFile of harFiles) {
+    await context.routeFromHAR(harFile, { notFound: "fallback" });
+  }
+  await context.route("**/*", (route) => {
+    stats.requests += 1;
+    return route.fallback();
+  });
+  logger(`Replaying ${harFiles.length} HAR file(s)${offline ? " without network access" : ""}`);
+  return true;
+}
+routeContextFromHar.rfdoc = "Routes the active context from HAR files (harFiles, newest last) or, when "
+  + "recordPath is set, records its traffic into that HAR file. Contexts are routed only once.";
+
+async function harRouteStats(reset) {
+  const current = { ...stats, hits: stats.mode === "replay" ? stats.requests - stats.misses : 0, missed: [...stats.missed] };
+  if (reset) {
+    Object.assign(stats, { contexts: 0, requests: 0, misses: 0, missed: [] });
+  }
+  return current;
+}
+harRouteStats.rfdoc = "Returns request, hit and miss counts of HAR routing in this Playwright process.";
+
+exports.__esModule = true;
+exports.routeContextFromHar = routeContextFromHar;
+exports.harRouteStats = harRouteStats;
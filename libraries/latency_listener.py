@@ -0,0 +1,103 @@
+import os
+import re
+import sys
+import json
+from robot.libraries.BuiltIn import BuiltIn
+
+# Keywords whose time counts as waiting rather than useful work. The speech
+# waits include the screen reader backend ones, e.g. Get Screen Reader Speech Since.
+DEFAULT_WAIT_PATTERN = (r"^(Sleep|Wait\b.*|Promise To Wait.*"
+                        r"|Get Last (Screen Reader )?Speech|Get (Screen Reader )?Speech Since)$")
+
+
+class latency_listener:
+    """
+    Robot Framework listener that reports, per test, how much time went to
+    waiting and how much to useful work.
+
+    Waiting is the time spent in keywords matching the wait pattern
+    (Sleep, Wait ..., speech waits). Keywords nested inside a wait are not
+    counted twice. Every Sleep is listed with its argument so remaining
+    fixed sleeps are easy to find.
+
+    Usage:
+        robot --listener libraries/latency_listener.py tests/
+        robot --listener "libraries/latency_listener.py:budget.json" tests/
+    """
+
+    ROBOT_LISTENER_API_VERSION = 2
+
+    def __init__(self, report_file="latency_budget.json", wait_pattern=DEFAULT_WAIT_PATTERN):
+        # Not `report_file`, which Robot Framework calls as the listener report hook
+        self.budget_file = report_file
+        self.wait_pattern = re.compile(wait_pattern, re.IGNORECASE)
+        self.output_dir = None
+        self.tests = []
+        self._test = None
+        self._wait_depth = 0
+
+    def start_suite(self, name, attrs):
+        if self.output_dir is None:
+            self.output_dir = BuiltIn().get_variable_value("${OUTPUT DIR}")
+
+    def start_test(self, name, attrs):
+        self._test = {"test": attrs["longname"], "waits": {}, "sleeps": [], "waiting": 0.0}
+        self._wait_depth = 0
+
+    def start_keyword(self, name, attrs):
+        if self._test is None:
+            return
+        if self._wait_depth or self.wait_pattern.match(attrs["kwname"]):
+            self._wait_depth += 1
+
+    def end_keyword(self, name, attrs):
+        if self._test is None or not self._wait_depth:
+            return
+        self._wait_depth -= 1
+        seconds = attrs["elapsedtime"] / 1000.0
+        keyword = attrs["kwname"]
+        if keyword == "Sleep":
+            self._test["sleeps"].append({"args": attrs["args"], "seconds": round(seconds, 3)})
+        if self._wait_depth:
+            return
+
+        self._test["waiting"] += seconds
+        self._test["waits"][keyword] = self._test["waits"].get(keyword, 0.0) + seconds
+
+    def end_test(self, name, attrs):
+        if self._test is None:
+            return
+        test, self._test = self._test, None
+        total = attrs["elapsedtime"] / 1000.0
+        test["total"] = round(total, 3)
+        test["waiting"] = round(test["waiting"], 3)
+        test["work"] = round(max(total - test["waiting"], 0.0), 3)
+        test["waits"] = {keyword: round(seconds, 3) for keyword, seconds in test["waits"].items()}
+        test["status"] = attrs["status"]
+        self.tests.append(test)
+
+    def close(self):
+        if not self.tests:
+            return
+        path = self.budget_file
+        if not os.path.isabs(path):
+            path = os.path.join(self.output_dir or os.getcwd(), path)
+        total = sum(test["total"] for test in self.tests)
+        waiting = sum(test["waiting"] for test in self.tests)
+        report = {
+            "total": round(total, 3),
+            "waiting": round(waiting, 3),
+            "work": round(total - waiting, 3),
+            "tests": self.tests,
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+        out = sys.__stdout__
+        out.write("Latency budget (waiting / total per test):\n")
+        for test in sorted(self.tests, key=lambda test: test["waiting"], reverse=True):
+            share = test["waiting"] / test["total"] * 100 if test["total"] else 0.0
+            out.write(f"  {test['waiting']:8.3f}s / {test['total']:8.3f}s ({share:5.1f}%)  {test['test']}\n")
+            for sleep in test["sleeps"]:
+                out.write(f"      Sleep {' '.join(sleep['args'])} took {sleep['seconds']:.3f}s\n")
+        out.write(f"Latency budget written to {path}\n")
@@ -1,18 +1,31 @@
 import os
 import time
 import subprocess
-import tempfile
 from robot.api import logger
-from nvda_automation import NVDAController
+import speech_wait
+import speech_rules
+import speech_session
 
 class NVDAIntegration:
     """
     A Robot Framework library for interacting with NVDA screen reader.
     """
     
-    def __init__(self):
+    def __init__(self, session_id=None):
+        """
+        Args:
+            session_id: Speech session ID; defaults to the worker's session so
+                parallel suites get their own capture file and utterance log
+        """
         self.nvda = None
-        self.speech_capture_file = os.path.join(tempfile.gettempdir(), "nvda_speech.txt")
+        self.session = speech_session.SpeechSession(session_id or speech_session.default_session_id(),
+                                                    prefix="nvda_speech")
+        self.speech_capture_file = os.path.splitext(self.session.log_path)[0] + ".txt"
+        self.utterances = self.session.utterances
+        self.capture_marker = self.utterances.marker()
+        self.last_wait_time = 0.0
+        # Speech written before the library was loaded is not ingested
+        self._capture_offset = os.path.getsize(self.speech_capture_file) if os.path.exists(self.speech_capture_file) else 0
         
     def connect_to_nvda(self):
         """
@@ -21,6 +34,8 @@ class NVDAIntegration:
         Returns True if connection is successful, False otherwise.
         """
         try:
+            # Imported here so the library loads on machines without NVDA
+            from nvda_automation import NVDAController
             self.nvda = NVDAController()
             logger.info("Successfully connected to NVDA")
             return True
@@ -31,11 +46,13 @@ class NVDAIntegration:
     def start_speech_capture(self):
         """
         Starts capturing NVDA speech output to a temporary file.
+        
+        Speech NVDA already wrote stays in the utterance log; only utterances
+        recorded after this call are returned by `Get Last Speech`.
         """
         try:
-            # Clear any previous capture file
-            if os.path.exists(self.speech_capture_file):
-                os.remove(self.speech_capture_file)
+            self._ingest_capture_file()
+            self.capture_marker = self.utterances.marker()
                 
             # Configure NVDA for speech capture
             self.nvda.set_speech_capture_file(self.speech_capture_file)
@@ -58,55 +75,133 @@ class NVDAIntegration:
             logger.error(f"Failed to stop speech capture: {str(e)}")
             return False
     
-    def get_last_speech(self, wait_time=2):
+    def mark_speech(self):
+        """
+        Returns a marker for the current end of the utterance log.
+        
+        Pass the marker to `Get Speech Since` to fetch only the speech
+        produced after this point.
+        """
+        self._ingest_capture_file()
+        return self.utterances.marker()
+    
+    def get_last_speech(self, wait_time=2, quiet_period=speech_wait.DEFAULT_QUIET_PERIOD):
         """
         Gets the last speech output from NVDA.
         
+        Watches the capture file and returns as soon as NVDA has written speech
+        that stayed unchanged for `quiet_period` seconds.
+        
         Args:
-            wait_time: Time to wait for NVDA to process speech (seconds)
+            wait_time: Maximum time to wait for NVDA to finish speaking (seconds)
+            quiet_period: Time the capture file must stay unchanged to count as complete (seconds)
             
         Returns:
             The last speech text from NVDA
         """
-        # Wait for NVDA to process speech
-        time.sleep(wait_time)
-        
         try:
-            if os.path.exists(self.speech_capture_file):
-                with open(self.speech_capture_file, 'r') as f:
-                    speech_text = f.read().strip()
-                return speech_text
-            else:
-                logger.warn("Speech capture file not found")
+            self._wait_for_speech(self.capture_marker, wait_time, quiet_period)
+            record = self.utterances.last_since(self.capture_marker)
+            if record is None:
+                logger.warn("No speech captured")
                 return ""
+            return record["text"]
+        except Exception as e:
+            logger.error(f"Failed to read speech capture: {str(e)}")
+            return ""
+    
+    def get_speech_since(self, marker, wait_time=2, quiet_period=speech_wait.DEFAULT_QUIET_PERIOD):
+        """
+        Gets all NVDA speech produced after a marker returned by `Mark Speech`.
+        
+        Args:
+            marker: Utterance marker returned by `Mark Speech`
+            wait_time: Maximum time to wait for NVDA to finish speaking (seconds)
+            quiet_period: Time the speech must stay unchanged to count as complete (seconds)
+            
+        Returns:
+            The utterances after the marker joined into one string
+        """
+        try:
+            self._wait_for_speech(int(marker), wait_time, quiet_period)
+            return " ".join(record["text"] for record in self.utterances.read_since(marker))
         except Exception as e:
             logger.error(f"Failed to read speech capture: {str(e)}")
             return ""
     
+    def get_utterances_since(self, marker):
+        """
+        Returns the utterance records (seq, t, src, text) logged after a marker, without waiting.
+        """
+        self._ingest_capture_file()
+        return self.utterances.read_since(marker)
+    
+    def _wait_for_speech(self, marker, wait_time, quiet_period):
+        def probe():
+            self._ingest_capture_file()
+            newest = self.utterances.marker()
+            return newest if newest > marker else None
+        
+        def age():
+            record = self.utterances.last_since(marker)
+            return time.monotonic() - record["t"] if record else 0
+        
+        with speech_wait.FileWatcher(self.speech_capture_file) as watcher:
+            settled, self.last_wait_time = speech_wait.wait_until_settled(
+                probe, watcher.wait, float(wait_time), float(quiet_period), age)
+        if settled:
+            logger.info(f"NVDA speech settled after {self.last_wait_time:.3f}s")
+        else:
+            logger.info(f"NVDA speech did not settle within {float(wait_time):.3f}s")
+    
+    def _ingest_capture_file(self):
+        """
+        Moves lines NVDA appended to its capture file into the utterance log.
+        Only the bytes written since the previous call are read.
+        """
+        try:
+            size = os.path.getsize(self.speech_capture_file)
+        except OSError:
+            return
+        if size < self._capture_offset:
+            # NVDA started a new capture file
+            self._capture_offset = 0
+        if size == self._capture_offset:
+            return
+        
+        with open(self.speech_capture_file, 'rb') as f:
+            f.seek(self._capture_offset)
+            data = f.read(size - self._capture_offset)
+        complete = data.rfind(b"\n") + 1
+        for line in data[:complete].decode("utf-8", errors="replace").splitlines():
+            if line.strip():
+                self.utterances.append(line.strip(), source="nvda")
+        self._capture_offset += complete
+    
+    def get_last_speech_wait_time(self):
+        """
+        Returns how long the last `Get Last Speech` call actually waited (seconds).
+        """
+        return self.last_wait_time
+    
     def simulate_nvda_speech(self, element_info):
         """
         For demo purposes, simulates NVDA speech for an element.
         Used when actual NVDA integration is not available.
         
         Args:
-            element_info: Dictionary with element information
+            element_info: Dictionary with element information (role, name, state or states, level)
             
         Returns:
             Simulated speech text
         """
-        # Create simulated speech based on element attributes
-        role = element_info.get('role', 'button')
-        name = element_info.get('name', 'unnamed element')
-        state = element_info.get('state', '')
-        
-        speech = f"{name}, {role}"
-        if state:
-            speech += f", {state}"
+        # Create simulated speech from the NVDA verbosity profile
+        element_info = dict({'role': 'button', 'name': 'unnamed element'}, **element_info)
+        speech = speech_rules.get_engine("nvda").speak(element_info)
             
         logger.info(f"Simulated NVDA speech: {speech}")
         
-        # Write to the capture file for consistency
-        with open(self.speech_capture_file, 'w') as f:
-            f.write(speech)
+        # Record the speech like captured NVDA output
+        self.session.record(speech, source="simulator")
             
         return speech 
\ No newline at end of file
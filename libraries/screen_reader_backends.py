@@ -0,0 +1,517 @@
+import os
+import abc
+import sys
+import json
+import time
+import ctypes
+import tempfile
+import importlib
+import subprocess
+from robot.api import logger
+import environment_probe
+
+# Backend name -> "module:attribute" of its class. Modules are imported
+# only when their backend is used, so NVDA code is never loaded off Windows.
+_registry = {
+    "nvda": "screen_reader_backends:NVDABackend",
+    "voiceover": "screen_reader_backends:VoiceOverBackend",
+    "simulator": "screen_reader_backends:SimulatorBackend",
+    "server": "screen_reader_backends:SpeechServerBackend",
+}
+
+# Names the screen reader launcher (tools/nvda_control.py) uses for the same backends
+_ALIASES = {"fake": "simulator"}
+
+# Loaded backends by (name, speech session), and the key of the selected one
+_backends = {}
+_selected = None
+
+
+class ScreenReaderBackend(abc.ABC):
+    """
+    Base class for screen reader backends.
+
+    A backend has a lifecycle, used by tools/screen_reader_controller.py to
+    start and stop the screen reader, and a speech side, used by the speech
+    keywords of this library once `load` has imported its dependencies.
+    """
+
+    name = None
+    display_name = "Screen reader"
+
+    def load(self):
+        """Import the speech dependencies; raises ImportError when they are missing."""
+
+    @abc.abstractmethod
+    def is_running(self):
+        """Return True if the screen reader process is running."""
+
+    def is_ready(self):
+        """Return True if the screen reader is running and answering requests."""
+        return self.is_running()
+
+    @abc.abstractmethod
+    def launch(self):
+        """Ask the screen reader to start. Must not wait for it to be ready."""
+
+    @abc.abstractmethod
+    def terminate(self):
+        """Ask the screen reader to stop. Must not wait for it to exit."""
+
+    @abc.abstractmethod
+    def connect(self):
+        """Connect to the screen reader; returns True on success."""
+
+    @abc.abstractmethod
+    def start_speech_capture(self):
+        """Start capturing speech; only later utterances are returned."""
+
+    @abc.abstractmethod
+    def stop_speech_capture(self):
+        """Stop capturing speech."""
+
+    @abc.abstractmethod
+    def mark_speech(self):
+        """Return a marker for the current end of the speech log."""
+
+    @abc.abstractmethod
+    def get_last_speech(self, wait_time=2):
+        """Return the speech captured since the capture started."""
+
+    @abc.abstractmethod
+    def get_speech_since(self, marker, wait_time=2):
+        """Return the speech captured after a marker."""
+
+    @abc.abstractmethod
+    def speak(self, descriptor):
+        """Speak an element descriptor if the backend simulates speech; returns the speech."""
+
+
+class SimulatorBackend(ScreenReaderBackend):
+    """
+    Speech backend that produces speech with the rules of a verbosity profile.
+
+    Its lifecycle is a fake screen reader for Linux and CI: the state lives
+    in a small file so separate processes agree on it, and it becomes ready
+    `startup_delay` seconds after launch.
+    """
+
+    name = "simulator"
+    display_name = "Fake screen reader"
+    # Speech profile of this backend; None uses the one selected with `Set Speech Profile`
+    profile = None
+
+    def __init__(self, session=None, startup_delay=None, state_file=None):
+        self.session = session
+        if startup_delay is None:
+            startup_delay = float(os.environ.get("FAKE_SCREEN_READER_DELAY", "0.2"))
+        self.startup_delay = float(startup_delay)
+        self.state_file = state_file or os.path.join(tempfile.gettempdir(), "fake_screen_reader.json")
+        self._speech = None
+
+    def load(self):
+        import screen_reader_integration
+        self._speech = screen_reader_integration
+
+    def _state(self):
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_running(self):
+        return self._state() is not None
+
+    def is_ready(self):
+        state = self._state()
+        return state is not None and time.time() >= state["ready_at"]
+
+    def launch(self):
+        with open(self.state_file, "w") as f:
+            json.dump({"pid": os.getpid(), "ready_at": time.time() + self.startup_delay}, f)
+
+    def terminate(self):
+        try:
+            os.remove(self.state_file)
+        except FileNotFoundError:
+            pass
+
+    def connect(self):
+        return self._speech.connect_to_screen_reader()
+
+    def start_speech_capture(self):
+        return self._speech.start_speech_capture(session=self.session)
+
+    def stop_speech_capture(self):
+        return self._speech.stop_speech_capture(session=self.session)
+
+    def mark_speech(self):
+        return self._speech.mark_speech(session=self.session)
+
+    def get_last_speech(self, wait_time=2):
+        return self._speech.get_last_speech(wait_time, session=self.session)
+
+    def get_speech_since(self, marker, wait_time=2):
+        return self._speech.get_speech_since(marker, wait_time, session=self.session)
+
+    def speak(self, descriptor):
+        import element_speech
+        text = element_speech.speech_for_descriptor(descriptor, profile=self.profile)
+        return self._speech.record_speech(text, source=self.name, session=self.session)
+
+
+class VoiceOverBackend(SimulatorBackend):
+    """
+    VoiceOver on macOS. There is no VoiceOver speech capture yet, so speech
+    is simulated with the VoiceOver verbosity profile.
+    """
+
+    name = "voiceover"
+    display_name = "VoiceOver"
+    profile = "voiceover"
+
+    _TOGGLE = 'tell application "System Events" to keystroke "F5" using {control down, option down}'
+
+    def is_running(self):
+        try:
+            output = subprocess.check_output(
+                ["osascript", "-e", 'tell application "System Events" to set voStatus to UIElementsEnabled'],
+                text=True)
+        except (subprocess.CalledProcessError, OSError):
+            return False
+        return "true" in output.lower()
+
+    def is_ready(self):
+        return self.is_running()
+
+    def launch(self):
+        subprocess.run(["osascript", "-e", self._TOGGLE], check=True)
+
+    def terminate(self):
+        subprocess.run(["osascript", "-e", self._TOGGLE], check=True)
+
+
+class SpeechServerBackend(SimulatorBackend):
+    """
+    Speech backend that reads speech from the in-process speech server.
+
+    Simulated speech is pushed to the server like any other producer, and
+    bridges or tools/fake_speech_producer.py can push to it too. Marks and
+    waits are served from the server's ring buffer, so hovering an element
+    and reading its speech touches no file.
+    """
+
+    name = "server"
+    display_name = "Speech server"
+
+    def load(self):
+        import speech_wait
+        import speech_server
+        self._speech_server = speech_server
+        self._quiet_period = speech_wait.DEFAULT_QUIET_PERIOD
+        self.capture_marker = 0
+
+    def _buffer(self):
+        return self._speech_server.get_speech_server().buffer
+
+    def connect(self):
+        return self._speech_server.start_speech_server() is not None
+
+    def start_speech_capture(self):
+        self.capture_marker = self._buffer().marker()
+        return True
+
+    def stop_speech_capture(self):
+        return True
+
+    def mark_speech(self):
+        return self._buffer().marker()
+
+    def _wait_for_records(self, marker, wait_time):
+        buffer = self._buffer()
+        deadline = time.monotonic() + float(wait_time)
+        records = buffer.wait(marker, float(wait_time))
+        # Keep collecting until the announcement has been quiet for a moment
+        while records and time.monotonic() < deadline:
+            newer = buffer.wait(records[-1]["seq"], min(self._quiet_period, deadline - time.monotonic()))
+            if not newer:
+                break
+            records.extend(newer)
+        return records
+
+    def get_last_speech(self, wait_time=2):
+        records = self._wait_for_records(self.capture_marker, wait_time)
+        return records[-1]["text"] if records else ""
+
+    def get_speech_since(self, marker, wait_time=2):
+        return " ".join(record["text"] for record in self._wait_for_records(int(marker), wait_time))
+
+    def speak(self, descriptor):
+        import element_speech
+        text = element_speech.speech_for_descriptor(descriptor, profile=self.profile)
+        self._buffer().push(text, source=self.name)
+        return text
+
+
+class NVDABackend(ScreenReaderBackend):
+    """
+    NVDA on Windows. Speech is captured from the running NVDA through nvda_automation.
+    """
+
+    name = "nvda"
+    display_name = "NVDA"
+    default_path = "C:\\Program Files (x86)\\NVDA\\nvda.exe"
+
+    def __init__(self, session=None, path=None, config_path=None):
+        self.session = session
+        self.path = path or self.default_path
+        self.config_path = config_path
+        self._controller_client = None
+        self._nvda = None
+
+    def load(self):
+        # Fails here rather than at connect time, so selection can fall back
+        import nvda_automation
+        import nvda_integration
+        self._nvda = nvda_integration.NVDAIntegration(session_id=self.session)
+
+    def is_running(self):
+        try:
+            output = subprocess.check_output(
+                ["tasklist", "/FI", "IMAGENAME eq nvda.exe", "/NH"], text=True)
+        except (subprocess.CalledProcessError, OSError):
+            return False
+        return "nvda.exe" in output.lower()
+
+    def is_ready(self):
+        client = self._load_controller_client()
+        if client is None:
+            return self.is_running()
+        # nvdaController_testIfRunning returns 0 once NVDA answers
+        return client.nvdaController_testIfRunning() == 0
+
+    def launch(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"NVDA executable not found at: {self.path}")
+        cmd = [self.path]
+        if self.config_path:
+            cmd.extend(["--config", self.config_path])
+        subprocess.Popen(cmd)
+
+    def terminate(self):
+        subprocess.call(["taskkill", "/f", "/im", "nvda.exe"],
+                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _load_controller_client(self):
+        """Load the NVDA controller client DLL if it is available."""
+        if self._controller_client is None:
+            bits = "64" if sys.maxsize > 2 ** 32 else "32"
+            candidates = [
+                os.environ.get("NVDA_CONTROLLER_DLL"),
+                os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools",
+                             f"nvdaControllerClient{bits}.dll"),
+                os.path.join(os.path.dirname(self.path), f"nvdaControllerClient{bits}.dll"),
+            ]
+            for candidate in candidates:
+                if candidate and os.path.exists(candidate):
+                    try:
+                        self._controller_client = ctypes.windll.LoadLibrary(candidate)
+                        break
+                    except (OSError, AttributeError):
+                        continue
+            else:
+                self._controller_client = False
+        return self._controller_client or None
+
+    def connect(self):
+        return self._nvda.connect_to_nvda()
+
+    def start_speech_capture(self):
+        return self._nvda.start_speech_capture()
+
+    def stop_speech_capture(self):
+        return self._nvda.stop_speech_capture()
+
+    def mark_speech(self):
+        return self._nvda.mark_speech()
+
+    def get_last_speech(self, wait_time=2):
+        return self._nvda.get_last_speech(wait_time)
+
+    def get_speech_since(self, marker, wait_time=2):
+        return self._nvda.get_speech_since(marker, wait_time)
+
+    def speak(self, descriptor):
+        # NVDA speaks the hovered element itself
+        return ""
+
+
+def _resolve(target):
+    module_name, _, attribute = target.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def _normalize_name(name):
+    name = str(name).lower()
+    return _ALIASES.get(name, name)
+
+
+def register_screen_reader_backend(name, target):
+    """
+    Registers a screen reader backend that is imported only when it is used.
+
+    Args:
+        name: Backend name used with `Select Screen Reader Backend`
+        target: `module:attribute` of a `ScreenReaderBackend` subclass, or
+            of a factory that takes an optional speech session ID and
+            returns one
+    """
+    if ":" not in target:
+        raise ValueError(f"Backend target must be 'module:attribute', got '{target}'")
+    name = _normalize_name(name)
+    _registry[name] = target
+    for key in [key for key in _backends if key[0] == name]:
+        del _backends[key]
+
+
+def get_screen_reader_backends():
+    """
+    Returns the registered backend names without importing any of them.
+    """
+    return sorted(_registry)
+
+
+def default_screen_reader_backend():
+    """
+    Returns the backend from SCREEN_READER_BACKEND, or the one the environment probe found for this machine.
+    """
+    configured = os.environ.get("SCREEN_READER_BACKEND")
+    if configured:
+        return _normalize_name(configured)
+    return environment_probe.probe_environment()["default_backend"]
+
+
+def create_screen_reader_backend(name, session=None, **options):
+    """
+    Returns a new backend object without loading its speech dependencies or selecting it.
+
+    Args:
+        name: Registered backend name (or `fake` for the simulator)
+        session: Speech session ID passed to the backend
+        options: Backend specific options, e.g. `path` and `config_path` for NVDA
+    """
+    name = _normalize_name(name)
+    if name not in _registry:
+        raise ValueError(f"Unknown screen reader backend '{name}'. "
+                         f"Choose from: {', '.join(get_screen_reader_backends())}")
+    return _resolve(_registry[name])(session, **options)
+
+
+def select_screen_reader_backend(name=None, fallback="simulator", session=None):
+    """
+    Imports and selects a screen reader backend.
+
+    Backends are created once per process and speech session, so selecting
+    the same backend with another `session` gets a separate instance. When
+    the backend cannot be imported (for example nvda_automation is missing),
+    the `fallback` backend is selected instead with a warning.
+
+    Args:
+        name: Backend name; defaults to `Default Screen Reader Backend`
+        fallback: Backend to use when `name` cannot be loaded, or empty to fail
+        session: Speech session ID passed to the backend
+
+    Returns:
+        The name of the selected backend
+    """
+    global _selected
+    name = _normalize_name(name or default_screen_reader_backend())
+    key = (name, session)
+    if key not in _backends:
+        try:
+            backend = create_screen_reader_backend(name, session)
+            backend.load()
+            _backends[key] = backend
+        except ImportError as e:
+            if not fallback or _normalize_name(fallback) == name:
+                raise
+            logger.warn(f"Screen reader backend '{name}' is not available ({e}), using '{fallback}'")
+            return select_screen_reader_backend(fallback, fallback=None, session=session)
+    _selected = key
+    logger.info(f"Using screen reader backend {name}")
+    return name
+
+
+def get_screen_reader_backend():
+    """
+    Returns the selected backend object, selecting the default backend first if needed.
+    """
+    if _selected is None:
+        select_screen_reader_backend()
+    return _backends[_selected]
+
+
+def connect_screen_reader_backend():
+    """
+    Connects the selected backend to its screen reader.
+
+    Returns True if connection is successful, False otherwise.
+    """
+    return get_screen_reader_backend().connect()
+
+
+def start_screen_reader_speech_capture():
+    """
+    Starts capturing speech with the selected backend.
+    """
+    return get_screen_reader_backend().start_speech_capture()
+
+
+def stop_screen_reader_speech_capture():
+    """
+    Stops capturing speech with the selected backend, if one was selected.
+    """
+    if _selected is None:
+        return True
+    return _backends[_selected].stop_speech_capture()
+
+
+def mark_screen_reader_speech():
+    """
+    Returns a marker for the current end of the selected backend's speech.
+
+    Pass the marker to `Get Screen Reader Speech Since`.
+    """
+    return get_screen_reader_backend().mark_speech()
+
+
+def get_last_screen_reader_speech(wait_time=2):
+    """
+    Returns the speech the selected backend captured since the capture started.
+    """
+    return get_screen_reader_backend().get_last_speech(wait_time)
+
+
+def get_screen_reader_speech_since(marker, wait_time=2):
+    """
+    Returns the speech the selected backend captured after a marker.
+    """
+    return get_screen_reader_backend().get_speech_since(marker, wait_time)
+
+
+def simulate_screen_reader_speech(descriptor):
+    """
+    Speaks an element descriptor with the selected backend.
+
+    Simulated backends record the speech of the descriptor, using their
+    own speech profile, in their speech session. Real screen readers speak
+    by themselves, so nothing is recorded for them.
+
+    Args:
+        descriptor: Element descriptor, e.g. from `Get Snapshot Node`
+
+    Returns:
+        The simulated speech, or an empty string for real screen readers
+    """
+    return get_screen_reader_backend().speak(descriptor)
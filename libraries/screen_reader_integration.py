@@ -1,12 +1,13 @@
-import os
-import time
 import json
 import platform
-import tempfile
+import functools
 from robot.api import logger
+import speech_wait
+import speech_rules
+import speech_session
 
-# Global variable to store the last simulated speech
-_last_speech = ""
+# Speech sessions keyed by test/worker ID; each owns its own utterance log
+_sessions = speech_session.SessionRegistry("screen_reader_speech")
 
 def connect_to_screen_reader():
     """
@@ -17,88 +18,197 @@ def connect_to_screen_reader():
     logger.info(f"Connected to simulated screen reader on {platform.system()}")
     return True
 
-def start_speech_capture():
+def use_speech_session(session_id):
     """
-    Starts capturing screen reader speech output to a temporary file.
+    Makes `session_id` the default speech session for the calling thread.
+    
+    Keywords without an explicit `session` argument use this session. When
+    no session was selected, the SPEECH_SESSION_ID environment variable,
+    the pabot pool ID or the process ID is used.
+    
+    Returns:
+        The previously selected session ID
+    """
+    previous = _sessions.use(session_id)
+    logger.info(f"Using speech session {_sessions.get().session_id}")
+    return previous
+
+def close_speech_session(session=None):
+    """
+    Closes a speech session. Its utterance log is kept on disk.
     """
-    global _last_speech
-    _last_speech = ""  # Clear previous speech
+    closed = _sessions.close(session)
+    logger.info(f"Closed speech session {closed.session_id}")
+    return True
+
+def start_speech_capture(session=None):
+    """
+    Starts capturing screen reader speech output.
+    
+    Earlier speech stays in the session's utterance log; only utterances
+    recorded after this call are returned by `Get Last Speech`.
     
-    capture_file = os.path.join(tempfile.gettempdir(), "screen_reader_speech.txt")
-    # Clear any previous capture file
-    if os.path.exists(capture_file):
-        os.remove(capture_file)
+    Args:
+        session: Speech session ID (defaults to the current session)
+    """
+    current = _sessions.get(session)
+    marker = current.start_capture()
     
-    logger.info("Started speech capture")
+    logger.info(f"Started speech capture for session {current.session_id} at utterance {marker}")
     return True
 
-def stop_speech_capture():
+def stop_speech_capture(session=None):
     """
     Stops screen reader speech capture.
     """
-    logger.info("Stopped speech capture")
+    logger.info(f"Stopped speech capture for session {_sessions.get(session).session_id}")
     return True
 
-def get_last_speech(wait_time=2):
+def mark_speech(session=None):
+    """
+    Returns a marker for the current end of the session's utterance log.
+    
+    Pass the marker to `Get Speech Since` to fetch only the speech
+    produced after this point.
+    """
+    return _sessions.get(session).utterances.marker()
+
+def _wait_for_speech(current, marker, wait_time, quiet_period):
+    settled = current.wait_for_speech(marker, wait_time, quiet_period)
+    if settled:
+        logger.info(f"Speech settled after {current.last_wait_time:.3f}s")
+    else:
+        logger.info(f"Speech did not settle within {float(wait_time):.3f}s")
+    return settled
+
+def get_last_speech(wait_time=2, quiet_period=speech_wait.DEFAULT_QUIET_PERIOD, session=None):
     """
     Gets the last speech output from the screen reader.
     
+    Returns as soon as speech has been captured and stayed unchanged for
+    `quiet_period` seconds instead of always sleeping for `wait_time`.
+    
     Args:
-        wait_time: Time to wait for screen reader to process speech (seconds)
+        wait_time: Maximum time to wait for the screen reader to finish speaking (seconds)
+        quiet_period: Time the speech must stay unchanged to count as complete (seconds)
+        session: Speech session ID (defaults to the current session)
         
     Returns:
         The last speech text from the screen reader
     """
-    global _last_speech
-    # Wait for screen reader to process speech
-    time.sleep(float(wait_time))
+    current = _sessions.get(session)
+    _wait_for_speech(current, current.capture_marker, wait_time, quiet_period)
     
+    record = current.last_speech()
     # If no speech has been simulated yet, use a default
-    if not _last_speech:
-        _last_speech = "button element"
+    if record is None:
+        return "button element"
+        
+    return record["text"]
+
+def get_speech_since(marker, wait_time=2, quiet_period=speech_wait.DEFAULT_QUIET_PERIOD, session=None):
+    """
+    Gets all speech produced after a marker returned by `Mark Speech`.
+    
+    Args:
+        marker: Utterance marker returned by `Mark Speech`
+        wait_time: Maximum time to wait for the screen reader to finish speaking (seconds)
+        quiet_period: Time the speech must stay unchanged to count as complete (seconds)
+        session: Speech session ID (defaults to the current session)
         
-    return _last_speech
+    Returns:
+        The utterances after the marker joined into one string
+    """
+    current = _sessions.get(session)
+    _wait_for_speech(current, marker, wait_time, quiet_period)
+    return " ".join(record["text"] for record in current.utterances.read_since(marker))
 
-def simulate_speech(element_info_str):
+def wait_for_speech(marker=None, wait_time=2, quiet_period=speech_wait.DEFAULT_QUIET_PERIOD, session=None):
+    """
+    Waits until new speech has been produced and has settled.
+    
+    Args:
+        marker: Only speech after this `Mark Speech` marker counts (defaults to the capture start)
+        wait_time: Maximum time to wait (seconds)
+        quiet_period: Time the speech must stay unchanged to count as complete (seconds)
+        session: Speech session ID (defaults to the current session)
+        
+    Returns:
+        True if speech settled before `wait_time` expired, False otherwise
+    """
+    current = _sessions.get(session)
+    if marker is None or marker == "":
+        marker = current.capture_marker
+    return _wait_for_speech(current, marker, wait_time, quiet_period)
+
+def get_utterances_since(marker, session=None):
+    """
+    Returns the utterance records (seq, t, src, text) logged after a marker, without waiting.
+    """
+    return _sessions.get(session).utterances.read_since(marker)
+
+def get_last_speech_wait_time(session=None):
+    """
+    Returns how long the last speech query of the session actually waited (seconds).
+    """
+    return _sessions.get(session).last_wait_time
+
+def record_speech(text, source="simulator", session=None):
+    """
+    Records speech produced outside this library, e.g. from an accessibility snapshot.
+    
+    Args:
+        text: The spoken text
+        source: Name of the producer of the speech
+        session: Speech session ID (defaults to the current session)
+    """
+    _sessions.get(session).record(text, source=source)
+    return text
+
+def set_speech_profile(profile):
+    """
+    Selects the verbosity profile used for simulated speech.
+    
+    Args:
+        profile: `nvda`, `voiceover` or the path of a profile JSON file
+        
+    Returns:
+        The name of the selected profile
+    """
+    engine = speech_rules.select_profile(profile)
+    logger.info(f"Using speech profile {engine.name}")
+    return engine.name
+
+@functools.lru_cache(maxsize=speech_rules.CACHE_SIZE)
+def _parse_element_info(element_info_str):
+    return json.loads(element_info_str)
+
+def simulate_speech(element_info_str, session=None):
     """
     Simulates screen reader speech for an element.
     Used when actual screen reader integration is not available.
     
+    The speech is produced by the rules of the selected speech profile
+    (see `Set Speech Profile`).
+    
     Args:
-        element_info_str: JSON string with element information
+        element_info_str: JSON string with element information (role, name, states, level)
+        session: Speech session ID (defaults to the current session)
         
     Returns:
         Simulated speech text
     """
-    global _last_speech
-    
     try:
-        element_info = json.loads(element_info_str)
+        element_info = _parse_element_info(element_info_str)
     except Exception as e:
         logger.error(f"Error parsing element info: {e}")
         element_info = {"role": "button", "name": "unnamed"}
     
-    # Create simulated speech based on element attributes
-    role = element_info.get('role', 'element')
-    name = element_info.get('name', 'unnamed element')
-    
-    # Get the element name in lowercase for easier matching
-    name_lower = name.lower()
-    
-    # Determine appropriate speech based on context
-    if "bbc accessibility help" in name_lower:
-        speech = "heading BBC Accessibility Help"
-    elif "all audiences" in name_lower:
-        speech = "text All audiences are important to the BBC"
-    elif "bbc shows and tours" in name_lower:
-        speech = "link BBC Shows and Tours, booking assistance"
-    else:
-        # Default VoiceOver style
-        speech = f"{role} {name}"
+    speech = speech_rules.get_engine().speak(element_info)
     
-    logger.info(f"Simulated speech for '{name}': {speech}")
+    logger.info(f"Simulated speech for '{element_info.get('name', 'unnamed element')}': {speech}")
     
     # Store the speech for later retrieval
-    _last_speech = speech
+    _sessions.get(session).record(speech, source="simulator")
     
-    return speech 
\ No newline at end of file
+    return speech
\ No newline at end of file
@@ -0,0 +1,218 @@
+import io
+import os
+import zlib
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from robot.api import logger
+from robot.libraries.BuiltIn import BuiltIn
+
+# on-failure: failed tests only, always: every test, sampled: failures plus a
+# share of the other tests, never: no screenshots
+POLICIES = ("on-failure", "always", "sampled", "never")
+
+DEFAULT_POLICY = "on-failure"
+DEFAULT_SAMPLE_RATE = 0.1
+
+# Directory below the output directory holding the screenshots
+SCREENSHOT_DIR = "screenshots"
+
+
+class ScreenshotWriter:
+    """
+    Writes screenshots on a background thread, one file per distinct image.
+
+    Files are named after the SHA-256 of the PNG bytes, so identical pages
+    are stored once and later captures only link to the existing file.
+    Downscaling with Pillow, when a maximum width is set, happens on the
+    worker thread too.
+    """
+
+    def __init__(self, max_width=0):
+        self.max_width = max_width
+        self._executor = None
+        self._futures = []
+        self._written = set()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self.stats = {"captured": 0, "skipped": 0, "duplicates": 0, "written": 0, "bytes": 0, "errors": 0}
+
+    def submit(self, png, directory):
+        """
+        Queues a screenshot and returns the path it will be written to.
+        """
+        digest = hashlib.sha256(png).hexdigest()
+        path = os.path.join(directory, digest[:20] + ".png")
+        self.stats["captured"] += 1
+        with self._lock:
+            if path in self._written or path in self._queued or os.path.exists(path):
+                self.stats["duplicates"] += 1
+                return path
+            self._queued.add(path)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screenshot-writer")
+        self._futures.append(self._executor.submit(self._write, png, path, self.max_width))
+        return path
+
+    def _write(self, png, path, max_width):
+        try:
+            png = _downscale(png, max_width) if max_width else png
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Workers share the directory, so the temporary name is unique per process
+            temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(png)
+            os.replace(temporary, path)
+        finally:
+            with self._lock:
+                self._queued.discard(path)
+        # Only a written file is a duplicate for later captures; a failed one is retried
+        with self._lock:
+            self._written.add(path)
+            self.stats["written"] += 1
+            self.stats["bytes"] += len(png)
+
+    def flush(self, timeout=None):
+        """
+        Waits for the queued screenshots and returns the errors of failed writes.
+        """
+        futures, self._futures = self._futures, []
+        errors = []
+        for future in futures:
+            error = future.exception(timeout)
+            if error is not None:
+                errors.append(error)
+        self.stats["errors"] += len(errors)
+        return errors
+
+
+_pillow_missing = False
+
+
+def _downscale(png, max_width):
+    global _pillow_missing
+    try:
+        from PIL import Image
+    except ImportError:
+        _pillow_missing = True
+        return png
+    with Image.open(io.BytesIO(png)) as image:
+        if image.width <= max_width:
+            return png
+        height = max(1, round(image.height * max_width / image.width))
+        resized = image.resize((max_width, height), Image.LANCZOS)
+    output = io.BytesIO()
+    resized.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+_policy = os.environ.get("SCREENSHOT_POLICY", DEFAULT_POLICY).lower()
+_sample_rate = _env_float("SCREENSHOT_SAMPLE_RATE", DEFAULT_SAMPLE_RATE)
+_writer = ScreenshotWriter(max_width=int(_env_float("SCREENSHOT_MAX_WIDTH", 0)))
+
+
+def set_screenshot_policy(policy, sample_rate=None, max_width=None):
+    """
+    Sets when `Capture Test Screenshot` takes a screenshot.
+
+    The initial values come from the SCREENSHOT_POLICY, SCREENSHOT_SAMPLE_RATE
+    and SCREENSHOT_MAX_WIDTH environment variables (run_tests.py --screenshots
+    and --screenshot-max-width set them).
+
+    Args:
+        policy: `on-failure` (default), `always`, `sampled` or `never`
+        sample_rate: Share of passed tests captured with `sampled`, e.g. 0.1
+        max_width: Downscale wider screenshots to this many pixels (needs
+            Pillow); 0 keeps the original size
+    """
+    global _policy, _sample_rate
+    policy = policy.lower()
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown screenshot policy '{policy}'. Choose from: {', '.join(POLICIES)}")
+    _policy = policy
+    if sample_rate is not None:
+        _sample_rate = float(sample_rate)
+    if max_width is not None:
+        _writer.max_width = int(max_width)
+
+
+def _should_capture(status, test_name):
+    if _policy == "always":
+        return True
+    if _policy == "never":
+        return False
+    if status == "FAIL":
+        return True
+    if _policy == "sampled":
+        # Hash of the test name, so the same tests are sampled on every run
+        return zlib.crc32(test_name.encode("utf-8")) % 10000 < _sample_rate * 10000
+    return False
+
+
+def capture_test_screenshot(status=None, selector=None):
+    """
+    Takes a screenshot in test teardown when the screenshot policy asks for one.
+
+    The PNG is taken in memory and handed to a background thread, so the
+    teardown only waits for the browser. Identical screenshots are stored
+    once in the `screenshots` directory of SCREENSHOT_OUTPUT_DIR (default:
+    ${OUTPUT DIR}) and linked relative to that directory, so the links of
+    parallel workers also work in the merged log.
+
+    Args:
+        status: Test status; defaults to ${TEST STATUS}
+        selector: Only capture this element instead of the viewport
+
+    Returns:
+        The path of the screenshot, or None when it was skipped
+    """
+    builtin = BuiltIn()
+    status = status or builtin.get_variable_value("${TEST STATUS}", "PASS")
+    test_name = builtin.get_variable_value("${TEST NAME}", "")
+    if not _should_capture(status, test_name):
+        _writer.stats["skipped"] += 1
+        logger.debug(f"Screenshot skipped by the {_policy} policy ({status})")
+        return None
+
+    arguments = ["filename=None", "log_screenshot=False", "return_as=bytes"]
+    if selector:
+        arguments.append(f"selector={selector}")
+    png = builtin.run_keyword("Take Screenshot", *arguments)
+    # run_tests.py sets it to the directory of the merged log
+    output_dir = os.environ.get("SCREENSHOT_OUTPUT_DIR") or builtin.get_variable_value("${OUTPUT DIR}")
+    path = _writer.submit(png, os.path.join(output_dir, SCREENSHOT_DIR))
+    link = os.path.relpath(path, output_dir).replace(os.sep, "/")
+    logger.info(f'<a href="{link}"><img src="{link}" width="800px"></a>', html=True)
+    return path
+
+
+def wait_for_screenshots(timeout=60):
+    """
+    Waits until all queued screenshots are written, e.g. in suite teardown.
+
+    Returns:
+        Screenshot statistics: captured, skipped, duplicates, written, bytes and errors
+    """
+    errors = _writer.flush(float(timeout))
+    for error in errors:
+        logger.warn(f"Writing a screenshot failed: {error}")
+    if _pillow_missing:
+        logger.warn("Screenshots were not downscaled because Pillow is not installed")
+    stats = dict(_writer.stats)
+    logger.info(f"Screenshots: {stats['captured']} captured, {stats['skipped']} skipped, "
+                f"{stats['duplicates']} duplicates, {stats['written']} written ({stats['bytes']} bytes)")
+    return stats
+
+
+def get_screenshot_stats():
+    """
+    Returns the screenshot statistics without waiting for queued writes.
+    """
+    return dict(_writer.stats)
@@ -0,0 +1,220 @@
+import re
+import csv
+import json
+import functools
+import collections
+from robot.api import logger
+import element_speech
+
+# Expectation columns holding phrases
+PHRASE_COLUMNS = ("required", "any", "forbidden")
+
+# Target that checks the whole transcript instead of one element
+ANY_TARGET = "*"
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _normalize(text):
+    """
+    Casefolds text and reduces it to words separated by single spaces.
+
+    The result is padded with spaces so phrases only match whole words.
+    """
+    return " " + " ".join(_NON_WORD.sub(" ", str(text).casefold()).split()) + " "
+
+
+class PhraseMatcher:
+    """
+    Aho-Corasick automaton over normalized phrases.
+
+    All phrases are compiled into one automaton, so a text is scanned once
+    no matter how many phrases are looked for.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = list(phrases)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [set()]
+        for index, phrase in enumerate(self.phrases):
+            self._add(_normalize(phrase), index)
+        self._build()
+
+    def _add(self, pattern, index):
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(set())
+            state = next_state
+        self._output[state].add(index)
+
+    def _build(self):
+        queue = collections.deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                candidate = self._goto[fail].get(char, 0)
+                self._fail[next_state] = candidate if candidate != next_state else 0
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def find(self, text):
+        """
+        Returns the indexes of all phrases found in `text`.
+        """
+        found = set()
+        state = 0
+        for char in _normalize(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                found |= self._output[state]
+        return found
+
+
+@functools.lru_cache(maxsize=32)
+def _compile(phrases):
+    return PhraseMatcher(phrases)
+
+
+def _phrases(value):
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [phrase.strip() for phrase in value.split("|") if phrase.strip()]
+    return [str(phrase) for phrase in value]
+
+
+def load_expectations(expectations):
+    """
+    Returns expectations as a list of dictionaries with target, required, any and forbidden phrase lists.
+
+    Args:
+        expectations: A list of dictionaries, or the path of a JSON file
+            (list of objects) or CSV file (columns target, required, any,
+            forbidden). Multiple phrases in one cell are separated with `|`.
+    """
+    if isinstance(expectations, str):
+        with open(expectations, encoding="utf-8", newline="") as f:
+            if expectations.lower().endswith(".csv"):
+                expectations = list(csv.DictReader(f))
+            else:
+                expectations = json.load(f)
+    table = []
+    for row in expectations:
+        entry = {"target": str(row.get("target") or ANY_TARGET)}
+        for column in PHRASE_COLUMNS:
+            entry[column] = _phrases(row.get(column))
+        table.append(entry)
+    return table
+
+
+def _as_utterances(transcript):
+    """
+    Returns the transcript as (target, speech) pairs.
+
+    Accepts a dictionary of target to speech, records with selector and
+    speech (as returned by Traverse Focus Order), or a plain list of
+    utterances, which are targeted by their position starting from 1.
+    """
+    if isinstance(transcript, dict):
+        return [(str(target), speech) for target, speech in transcript.items()]
+    if isinstance(transcript, str):
+        transcript = transcript.splitlines()
+    pairs = []
+    for position, item in enumerate(transcript, start=1):
+        if isinstance(item, dict):
+            pairs.append((str(item.get("selector", position)), item.get("speech", "")))
+        else:
+            pairs.append((str(position), item))
+    return pairs
+
+
+def check_speech_expectations(transcript, expectations):
+    """
+    Checks a whole speech transcript against a table of expectations in one pass.
+
+    Every phrase of the table is compiled into a single case-insensitive
+    matcher that matches whole words and ignores punctuation. Each utterance
+    is scanned once, then every expectation is evaluated against the phrases
+    found for its target:
+
+    - `required`: all phrases must be spoken
+    - `any`: at least one phrase must be spoken (like `Should Contain Any`)
+    - `forbidden`: none of the phrases may be spoken
+
+    A target is a selector (or utterance position for plain lists); `*`
+    checks the whole transcript. All failures are reported together.
+
+    Args:
+        transcript: Dictionary of target to speech, records with selector and
+            speech, or a list of utterances
+        expectations: Expectation table, see `load_expectations`
+
+    Returns:
+        The number of expectations checked
+    """
+    table = load_expectations(expectations)
+    phrases = tuple(sorted({phrase for entry in table for column in PHRASE_COLUMNS for phrase in entry[column]}))
+    matcher = _compile(phrases)
+
+    found_by_target = {}
+    spoken = {}
+    for target, speech in _as_utterances(transcript):
+        found = matcher.find(speech or "")
+        found_by_target.setdefault(target, set()).update(found)
+        spoken[target] = speech
+    everything = set().union(*found_by_target.values()) if found_by_target else set()
+    index = {phrase: position for position, phrase in enumerate(phrases)}
+
+    failures = []
+    for entry in table:
+        target = entry["target"]
+        if target == ANY_TARGET:
+            found, context = everything, "transcript"
+        elif target in found_by_target:
+            found, context = found_by_target[target], f"{target} ('{spoken[target]}')"
+        else:
+            failures.append(f"{target}: no speech for this target")
+            continue
+        missing = [phrase for phrase in entry["required"] if index[phrase] not in found]
+        if missing:
+            failures.append(f"{context}: missing required {', '.join(repr(p) for p in missing)}")
+        if entry["any"] and not any(index[phrase] in found for phrase in entry["any"]):
+            failures.append(f"{context}: none of {', '.join(repr(p) for p in entry['any'])}")
+        present = [phrase for phrase in entry["forbidden"] if index[phrase] in found]
+        if present:
+            failures.append(f"{context}: forbidden {', '.join(repr(p) for p in present)}")
+
+    logger.info(f"Checked {len(table)} expectations with {len(phrases)} phrases against "
+                f"{len(spoken)} utterances, {len(failures)} failures")
+    if failures:
+        raise AssertionError(f"{len(failures)} speech expectation(s) failed:\n" + "\n".join(failures))
+    return len(table)
+
+
+def verify_element_speech(expectations):
+    """
+    Gets the speech of every element in the expectation table in one page round trip and checks it.
+
+    Args:
+        expectations: Expectation table whose targets are selectors, see `load_expectations`
+
+    Returns:
+        The number of expectations checked
+    """
+    table = load_expectations(expectations)
+    selectors = list(dict.fromkeys(entry["target"] for entry in table if entry["target"] != ANY_TARGET))
+    speech = element_speech.get_speech_for_elements(selectors) if selectors else []
+    transcript = {selector: text for selector, text in zip(selectors, speech) if text}
+    return check_speech_expectations(transcript, table)
@@ -0,0 +1,198 @@
+import os
+import re
+import json
+import hashlib
+import platform
+import functools
+
+# Directory holding the bundled verbosity profiles
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources", "speech_profiles")
+
+# Number of distinct element descriptors remembered per profile
+CACHE_SIZE = 65536
+
+_FIELD = re.compile(r"\{(\w+)\}")
+
+
+def default_profile_name():
+    """
+    Returns the profile matching the platform's screen reader unless SPEECH_PROFILE overrides it.
+    """
+    return os.environ.get("SPEECH_PROFILE") or ("nvda" if platform.system() == "Windows" else "voiceover")
+
+
+class _Rule:
+    """
+    A compiled rule: state and property requirements plus an utterance template.
+    """
+
+    def __init__(self, spec):
+        self.states = frozenset(spec.get("states", ()))
+        self.has = tuple(spec.get("has", ()))
+        pattern = spec.get("name_pattern")
+        self.name_pattern = re.compile(pattern, re.IGNORECASE) if pattern else None
+        self.template = spec["template"]
+        # Literal text and field names alternate, starting and ending with literal text
+        self.parts = _FIELD.split(self.template)
+        self.fields = frozenset(self.parts[1::2])
+        self.includes_states = "states" in self.fields
+
+    def matches(self, states, properties, name):
+        if not self.states <= states:
+            return False
+        if any(properties.get(key) in (None, "") for key in self.has):
+            return False
+        return self.name_pattern is None or self.name_pattern.search(name) is not None
+
+
+class SpeechRuleEngine:
+    """
+    Turns element descriptors into utterances using a verbosity profile.
+
+    Rules are compiled once into a dispatch table keyed by role, and the
+    output for identical descriptors is memoized, so large runs neither
+    re-read the profile nor re-evaluate the rules for repeated elements.
+    """
+
+    def __init__(self, profile):
+        self.name = profile.get("name", "custom")
+        # Identifies the rules themselves, so caches notice edited profiles
+        self.fingerprint = hashlib.sha256(json.dumps(profile, sort_keys=True).encode("utf-8")).hexdigest()
+        self.state_separator = profile.get("state_separator", ", ")
+        self.role_names = profile.get("role_names", {})
+        self._dispatch = {}
+        self._fallback = []
+        for spec in profile["rules"]:
+            rule = _Rule(spec)
+            roles = spec.get("role", "*")
+            for role in ([roles] if isinstance(roles, str) else roles):
+                if role == "*":
+                    self._fallback.append(rule)
+                else:
+                    self._dispatch.setdefault(role.lower(), []).append(rule)
+        # Wildcard rules apply after the role specific ones, in file order
+        for role, rules in self._dispatch.items():
+            rules.extend(self._fallback)
+        self._speak = functools.lru_cache(maxsize=CACHE_SIZE)(self._render)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def speak(self, descriptor):
+        """
+        Returns the utterance for an element descriptor.
+
+        Args:
+            descriptor: Dictionary with role, name, states (list or single state),
+                level and text. Missing names fall back to the element text.
+        """
+        states = descriptor.get("states")
+        if states is None:
+            states = (descriptor["state"],) if descriptor.get("state") else ()
+        elif isinstance(states, str):
+            states = (states,)
+        else:
+            states = tuple(states)
+        return self._speak(
+            descriptor.get("role") or "generic",
+            descriptor.get("name") or descriptor.get("text") or "",
+            states,
+            descriptor.get("level"),
+        )
+
+    def cache_info(self):
+        return self._speak.cache_info()
+
+    def _render(self, role, name, states, level):
+        role_key = role.lower()
+        state_set = frozenset(states)
+        properties = {"level": level}
+        for rule in self._dispatch.get(role_key, self._fallback):
+            if rule.matches(state_set, properties, name):
+                break
+        else:
+            return f"{role} {name}".strip()
+
+        # States named by the rule itself are already spoken by its template
+        remaining = [state for state in states if state not in rule.states]
+        values = {
+            "role": self.role_names.get(role_key, role),
+            "name": name,
+            "level": "" if level is None else level,
+            "states": self.state_separator.join(remaining),
+        }
+        parts = rule.parts
+        if remaining and not rule.includes_states:
+            parts = parts[:-1] + [parts[-1] + self.state_separator, "states", ""]
+        return _fill(parts, values, self.state_separator)
+
+
+def _fill(parts, values, separator):
+    """
+    Fills a template split into literal text and field names.
+
+    Empty fields are left out, and only the literal text joining the fields
+    is tidied: the gaps and doubled separators left by empty fields are
+    removed, while values such as an accessible name with commas are kept
+    as they are.
+    """
+    stripped = separator.strip()
+    pieces = []
+    glue = ""
+    for index, part in enumerate(parts):
+        if index % 2 == 0:
+            glue += part
+            continue
+        value = str(values[part])
+        if value:
+            pieces.extend((_tidy(glue, stripped), value))
+            glue = ""
+    pieces.append(_tidy(glue, stripped))
+    pieces[0] = pieces[0].lstrip(stripped + " ")
+    pieces[-1] = pieces[-1].rstrip(stripped + " ")
+    return "".join(pieces)
+
+
+def _tidy(glue, separator):
+    """
+    Collapses the whitespace and repeated separators in literal template text.
+    """
+    glue = re.sub(r"\s+", " ", glue)
+    if separator:
+        glue = re.sub(rf"\s*{re.escape(separator)}(\s*{re.escape(separator)})*", separator, glue)
+    return glue
+
+
+# Profile chosen with select_profile; None means the platform default
+_selected_profile = None
+
+
+def select_profile(profile):
+    """
+    Makes `profile` (a profile name or JSON file path) the default for get_engine.
+
+    Returns:
+        The compiled engine for the profile
+    """
+    global _selected_profile
+    engine = get_engine(profile)
+    _selected_profile = profile
+    return engine
+
+
+def get_engine(profile=None):
+    """
+    Returns the compiled engine for a profile name or JSON file path.
+
+    Without a profile the selected one, then the platform default, is used.
+    Engines are cached, so each profile file is parsed and compiled once per process.
+    """
+    return _load_engine(profile or _selected_profile or default_profile_name())
+
+
+@functools.lru_cache(maxsize=None)
+def _load_engine(profile):
+    path = profile if profile.endswith(".json") else os.path.join(PROFILE_DIR, f"{profile}.json")
+    return SpeechRuleEngine.from_file(path)
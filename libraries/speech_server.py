@@ -0,0 +1,432 @@
+import os
+import json
+import time
+import socket
+import select
+import threading
+import itertools
+import collections
+import socketserver
+from robot.api import logger
+
+# Default number of utterances kept in the ring buffer
+DEFAULT_CAPACITY = 1024
+
+# Environment variable producers read to find the running server
+ADDRESS_VARIABLE = "SPEECH_SERVER_ADDRESS"
+
+_SEPARATORS = (",", ":")
+
+
+class SpeechBuffer:
+    """
+    Bounded in-memory ring buffer of utterances.
+
+    Every utterance gets an increasing sequence number, so consumers keep a
+    marker and ask for everything after it. When the buffer is full the
+    oldest utterances are dropped; `dropped` counts them.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self._records = collections.deque(maxlen=int(capacity))
+        self._condition = threading.Condition()
+        self._seq = 0
+        self._closed = False
+        self.dropped = 0
+
+    def push(self, text, source="simulator"):
+        """
+        Adds an utterance and wakes up all waiters.
+
+        Returns:
+            The utterance record
+        """
+        with self._condition:
+            self._seq += 1
+            record = {"seq": self._seq, "t": round(time.monotonic(), 6), "src": source, "text": text}
+            if len(self._records) == self._records.maxlen:
+                self.dropped += 1
+            self._records.append(record)
+            self._condition.notify_all()
+            return record
+
+    def marker(self):
+        """
+        Returns the sequence number of the newest utterance, or 0 if there is none.
+        """
+        with self._condition:
+            return self._seq
+
+    def since(self, marker=0):
+        """
+        Returns the buffered utterances with a sequence number greater than `marker`.
+        """
+        with self._condition:
+            return self._since(int(marker))
+
+    def wait(self, marker=0, timeout=None):
+        """
+        Waits until an utterance newer than `marker` arrives.
+
+        Returns:
+            The new utterance records, or an empty list on timeout
+        """
+        marker = int(marker)
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > marker or self._closed, timeout)
+            return self._since(marker)
+
+    def close(self):
+        """
+        Wakes up all waiters so they can return.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _since(self, marker):
+        if marker >= self._seq:
+            return []
+        # Sequence numbers are contiguous, so the start index follows from the first one
+        first = self._records[0]["seq"] if self._records else self._seq + 1
+        start = max(marker + 1 - first, 0)
+        return list(itertools.islice(self._records, start, None))
+
+
+def _parse_address(address):
+    """
+    Parses `tcp://host:port`, `host:port` or `unix:/path` into a socket family and address.
+    """
+    address = str(address)
+    if address.startswith("unix:"):
+        path = address[len("unix:"):]
+        return socket.AF_UNIX, path[2:] if path.startswith("//") else path
+    if address.startswith("tcp://"):
+        address = address[len("tcp://"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port or 0))
+
+
+def _format_address(family, address):
+    if family == socket.AF_UNIX:
+        return f"unix:{address}"
+    return f"tcp://{address[0]}:{address[1]}"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """
+    Serves newline-delimited JSON requests on one connection.
+
+    Requests: {"op": "push", "text": ..., "src": ...}, {"op": "marker"},
+    {"op": "since", "marker": n}, {"op": "wait", "marker": n, "timeout": s}
+    and {"op": "subscribe", "marker": n}, which streams every new utterance
+    as its own line until the client disconnects.
+    """
+
+    def handle(self):
+        try:
+            self._serve(self.server.buffer)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; end its requests or subscription
+            pass
+
+    def _serve(self, buffer):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                op = request.get("op")
+                if op == "push":
+                    record = buffer.push(request["text"], request.get("src", "producer"))
+                    self._send({"ok": True, "seq": record["seq"]})
+                elif op == "marker":
+                    self._send({"ok": True, "marker": buffer.marker()})
+                elif op == "since":
+                    self._send({"ok": True, "records": buffer.since(request.get("marker", 0))})
+                elif op == "wait":
+                    records = buffer.wait(request.get("marker", 0), request.get("timeout"))
+                    self._send({"ok": True, "records": records})
+                elif op == "subscribe":
+                    self._subscribe(buffer, int(request.get("marker", buffer.marker())))
+                    return
+                else:
+                    self._send({"ok": False, "error": f"Unknown op: {op}"})
+            except (ValueError, KeyError, TypeError) as e:
+                self._send({"ok": False, "error": str(e)})
+
+    def _subscribe(self, buffer, marker):
+        self._send({"ok": True, "marker": marker})
+        while not self.server.stopping and not self._disconnected():
+            for record in buffer.wait(marker, timeout=0.5):
+                self._send(record)
+                marker = record["seq"]
+
+    def _disconnected(self):
+        """
+        Returns True if the client closed the connection; a quiet subscription never writes to notice it.
+        """
+        readable, _, _ = select.select([self.connection], [], [], 0)
+        if not readable:
+            return False
+        try:
+            return not self.connection.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return True
+
+    def _send(self, message):
+        self.wfile.write((json.dumps(message, separators=_SEPARATORS) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:
+    _UnixServer = None
+
+
+class SpeechServer:
+    """
+    Local speech sink that producers push utterances to over a socket.
+
+    Producers (an NVDA add-on, a VoiceOver bridge, the simulator or
+    tools/fake_speech_producer.py) connect over localhost TCP or a Unix
+    socket. Utterances are kept in a bounded ring buffer in memory, so
+    consumers never touch the disk and any number of them can wait on or
+    subscribe to new speech.
+    """
+
+    def __init__(self, address="tcp://127.0.0.1:0", capacity=DEFAULT_CAPACITY):
+        self.buffer = SpeechBuffer(capacity)
+        family, bind_address = _parse_address(address)
+        if family == socket.AF_UNIX:
+            if _UnixServer is None:
+                raise ValueError("Unix sockets are not supported on this platform")
+            if os.path.exists(bind_address):
+                os.remove(bind_address)
+            self._server = _UnixServer(bind_address, _Handler)
+        else:
+            self._server = _TCPServer(bind_address, _Handler)
+        self._server.buffer = self.buffer
+        self._server.stopping = False
+        self.family = family
+        self.address = _format_address(family, self._server.server_address)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="speech-server", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.stopping = True
+        self.buffer.close()
+        self._server.shutdown()
+        self._server.server_close()
+        if self.family == socket.AF_UNIX and os.path.exists(self._server.server_address):
+            os.remove(self._server.server_address)
+
+
+class SpeechClient:
+    """
+    Client for a speech server, used by producers and out-of-process consumers.
+    """
+
+    def __init__(self, address=None, timeout=10):
+        address = address or os.environ.get(ADDRESS_VARIABLE)
+        if not address:
+            raise ValueError(f"No speech server address given and {ADDRESS_VARIABLE} is not set")
+        family, connect_address = _parse_address(address)
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(connect_address)
+        self._file = self._socket.makefile("rwb")
+
+    def _request(self, **request):
+        self._file.write((json.dumps(request, separators=_SEPARATORS) + "\n").encode("utf-8"))
+        self._file.flush()
+        response = json.loads(self._file.readline())
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "Speech server request failed"))
+        return response
+
+    def push(self, text, source="producer"):
+        return self._request(op="push", text=text, src=source)["seq"]
+
+    def marker(self):
+        return self._request(op="marker")["marker"]
+
+    def since(self, marker=0):
+        return self._request(op="since", marker=int(marker))["records"]
+
+    def wait(self, marker=0, timeout=2):
+        return self._request(op="wait", marker=int(marker), timeout=float(timeout))["records"]
+
+    def subscribe(self, marker=None):
+        """
+        Yields utterance records as they arrive. The connection is used up by the subscription.
+
+        The subscription ends when the server closes the connection or
+        `close` is called, also from another thread.
+        """
+        request = {"op": "subscribe"}
+        if marker is not None:
+            request["marker"] = int(marker)
+        self._request(**request)
+        self._socket.settimeout(None)
+        while True:
+            try:
+                line = self._file.readline()
+            except (ValueError, OSError):
+                # The file was closed by close() between two reads
+                return
+            if not line:
+                return
+            yield json.loads(line)
+
+    def close(self):
+        # Wakes up a subscription blocked reading in another thread; closing
+        # the file first would wait for that read to release the buffer lock
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+# Server owned by this robot process, started with Start Speech Server
+_server = None
+
+# Subscription cursors by name
+_subscriptions = {}
+
+
+def _require_server():
+    if _server is None:
+        raise RuntimeError("Speech server is not running. Use 'Start Speech Server' first.")
+    return _server
+
+
+def start_speech_server(address="tcp://127.0.0.1:0", capacity=DEFAULT_CAPACITY):
+    """
+    Starts the local speech server if it is not running yet.
+
+    The address is also exported as SPEECH_SERVER_ADDRESS so producers
+    started from the test can find the server.
+
+    Args:
+        address: `tcp://host:port` (port 0 picks a free port) or `unix:/path/to/socket`
+        capacity: Number of utterances kept in the ring buffer
+
+    Returns:
+        The address producers should connect to
+    """
+    global _server
+    if _server is None:
+        _server = SpeechServer(address, int(capacity))
+        os.environ[ADDRESS_VARIABLE] = _server.address
+        logger.info(f"Speech server listening on {_server.address}")
+    return _server.address
+
+
+def stop_speech_server():
+    """
+    Stops the speech server and forgets its utterances.
+    """
+    global _server
+    if _server is not None:
+        _server.stop()
+        _server = None
+        _subscriptions.clear()
+        os.environ.pop(ADDRESS_VARIABLE, None)
+
+
+def get_speech_server():
+    """
+    Returns the speech server object of this process, starting it first if needed.
+    """
+    start_speech_server()
+    return _server
+
+
+def push_speech(text, source="simulator"):
+    """
+    Pushes an utterance to the speech server without going through the socket.
+
+    Returns:
+        The sequence number of the utterance
+    """
+    return _require_server().buffer.push(text, source)["seq"]
+
+
+def get_speech_server_marker():
+    """
+    Returns the sequence number of the newest utterance on the speech server.
+    """
+    return _require_server().buffer.marker()
+
+
+def get_server_speech_since(marker=0):
+    """
+    Returns the texts of the buffered utterances newer than `marker`.
+    """
+    return [record["text"] for record in _require_server().buffer.since(marker)]
+
+
+def wait_for_server_speech(marker=None, timeout=2):
+    """
+    Waits until the speech server receives an utterance newer than `marker`.
+
+    Args:
+        marker: Sequence number from `Get Speech Server Marker`; defaults to now
+        timeout: Maximum time to wait in seconds
+
+    Returns:
+        The texts of the new utterances, or an empty list on timeout
+    """
+    buffer = _require_server().buffer
+    if marker is None or marker == "":
+        marker = buffer.marker()
+    start = time.monotonic()
+    records = buffer.wait(marker, float(timeout))
+    logger.info(f"Waited {time.monotonic() - start:.3f}s for {len(records)} utterance(s)")
+    return [record["text"] for record in records]
+
+
+def subscribe_to_speech(name="default"):
+    """
+    Creates a named subscription that starts at the newest utterance.
+
+    Each `Get Subscribed Speech` call returns what arrived since the
+    previous call, so several subscriptions can consume the same speech
+    independently.
+    """
+    _subscriptions[name] = _require_server().buffer.marker()
+    return name
+
+
+def get_subscribed_speech(name="default", timeout=0):
+    """
+    Returns the utterances that arrived since the subscription was last read.
+
+    Args:
+        name: Subscription name from `Subscribe To Speech`
+        timeout: Seconds to wait when nothing new has arrived yet
+    """
+    if name not in _subscriptions:
+        raise ValueError(f"No speech subscription named '{name}'")
+    buffer = _require_server().buffer
+    timeout = float(timeout)
+    records = buffer.wait(_subscriptions[name], timeout) if timeout > 0 else buffer.since(_subscriptions[name])
+    if records:
+        _subscriptions[name] = records[-1]["seq"]
+    return [record["text"] for record in records]
@@ -0,0 +1,134 @@
+import os
+import re
+import tempfile
+import threading
+import speech_wait
+import utterance_log
+
+# Environment variables that identify the current worker, in priority order
+SESSION_ID_VARIABLES = ("SPEECH_SESSION_ID", "PABOTEXECUTIONPOOLID")
+
+
+def default_session_id():
+    """
+    Returns the session ID for the current process.
+
+    Uses SPEECH_SESSION_ID when set (run_tests.py sets it per worker), the
+    pabot pool ID when running under pabot, and the process ID otherwise.
+    """
+    for variable in SESSION_ID_VARIABLES:
+        value = os.environ.get(variable)
+        if value:
+            return value
+    return f"pid{os.getpid()}"
+
+
+def _safe_name(session_id):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(session_id))
+
+
+class SpeechSession:
+    """
+    Speech channel owned by a single test, worker or thread.
+
+    Each session has its own utterance log and in-memory signal, so
+    concurrent sessions never see each other's speech.
+    """
+
+    def __init__(self, session_id, prefix="screen_reader_speech", directory=None):
+        self.session_id = str(session_id)
+        directory = directory or tempfile.gettempdir()
+        self.log_path = os.path.join(directory, f"{prefix}-{_safe_name(session_id)}.log")
+        self.utterances = utterance_log.UtteranceLog(self.log_path)
+        # A session ID is reused by later runs (e.g. worker-0); only the previous log is kept
+        self.utterances.rotate()
+        self.signal = speech_wait.SpeechSignal(version=self.utterances.marker())
+        self.capture_marker = self.utterances.marker()
+        self.last_wait_time = 0.0
+
+    def start_capture(self):
+        """
+        Marks the start of a capture; earlier utterances are ignored by `last_speech`.
+        """
+        self.capture_marker = self.utterances.marker()
+        return self.capture_marker
+
+    def record(self, text, source="simulator"):
+        """
+        Appends an utterance to the session and wakes up waiters.
+        """
+        record = self.utterances.append(text, source=source)
+        self.signal.set(text, version=record["seq"])
+        return record
+
+    def wait_for_speech(self, marker, wait_time, quiet_period=speech_wait.DEFAULT_QUIET_PERIOD):
+        """
+        Waits until speech recorded after `marker` has settled.
+
+        Returns:
+            True if speech settled before `wait_time` expired
+        """
+        settled, self.last_wait_time = speech_wait.wait_for_signal_settle(
+            self.signal, float(wait_time), float(quiet_period), since_version=int(marker))
+        return settled
+
+    def last_speech(self):
+        """
+        Returns the newest utterance record since the capture started, or None.
+        """
+        return self.utterances.last_since(self.capture_marker)
+
+
+class SessionRegistry:
+    """
+    Thread-safe registry of speech sessions keyed by session ID.
+
+    Threads can select their own session with `use`; otherwise the
+    process-wide default session ID is used.
+    """
+
+    def __init__(self, prefix="screen_reader_speech", directory=None):
+        self.prefix = prefix
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._current = threading.local()
+
+    def get(self, session_id=None):
+        """
+        Returns the session for `session_id`, creating it on first use.
+        """
+        if session_id is None or session_id == "":
+            session_id = getattr(self._current, "session_id", None) or default_session_id()
+        session_id = str(session_id)
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = SpeechSession(session_id, self.prefix, self.directory)
+                self._sessions[session_id] = session
+            return session
+
+    def use(self, session_id):
+        """
+        Makes `session_id` the default session for the calling thread.
+
+        Returns:
+            The previously selected session ID, or None
+        """
+        previous = getattr(self._current, "session_id", None)
+        self._current.session_id = str(session_id) if session_id else None
+        return previous
+
+    def close(self, session_id=None):
+        """
+        Forgets a session. Its utterance log stays on disk for later inspection
+        until the next session with the same ID moves it to `<log>.1`.
+        """
+        session = self.get(session_id)
+        with self._lock:
+            self._sessions.pop(session.session_id, None)
+        return session
+
+    def session_ids(self):
+        with self._lock:
+            return sorted(self._sessions)
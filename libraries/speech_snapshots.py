@@ -0,0 +1,248 @@
+import os
+import re
+import json
+import difflib
+import hashlib
+import urllib.parse
+from robot.api import logger
+from robot.libraries.BuiltIn import BuiltIn
+
+# Directory holding the snapshot files, one directory per page
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests", "speech_snapshots")
+
+# verify compares against the snapshot, record (re)writes it
+MODES = ("verify", "record")
+
+PENDING_SUFFIX = ".pending.json"
+
+
+def _file_key(name):
+    """
+    Turns a name into a file name safe key.
+
+    Names that had to be changed get a short hash of the original name, so
+    e.g. `menu open`, `menu_open` and `menu/open` get different files.
+    """
+    key = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("_.") or "index"
+    if key != name or len(key) > 100:
+        key = key[:80] + "-" + hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+    return key
+
+
+def _page_key(page):
+    """
+    Turns a page URL or name into a file name safe key, e.g. www.bbc.co.uk_accessibility-<hash>.
+    """
+    parts = urllib.parse.urlsplit(page)
+    if parts.netloc:
+        page = parts.netloc + parts.path.rstrip("/") + ("?" + parts.query if parts.query else "")
+    return _file_key(page)
+
+
+def _diff_transcripts(expected, actual):
+    """
+    Returns the differences between two transcripts as a list of change dictionaries.
+
+    Each change has an `op` (insert, delete or replace) and the affected
+    utterances and positions on both sides. Identical transcripts are
+    detected with a plain list comparison before any diffing.
+    """
+    if expected == actual:
+        return []
+    matcher = difflib.SequenceMatcher(None, expected, actual, autojunk=False)
+    return [
+        {
+            "op": op,
+            "expected_at": i1,
+            "actual_at": j1,
+            "expected": expected[i1:i2],
+            "actual": actual[j1:j2],
+        }
+        for op, i1, i2, j1, j2 in matcher.get_opcodes()
+        if op != "equal"
+    ]
+
+
+def _format_diff(changes):
+    """
+    Formats changes from _diff_transcripts as lines, `-` for expected and `+` for actual speech.
+    """
+    lines = []
+    for change in changes:
+        lines.append(f"@@ {change['op']} at expected {change['expected_at'] + 1}, actual {change['actual_at'] + 1} @@")
+        lines.extend(f"- {text}" for text in change["expected"])
+        lines.extend(f"+ {text}" for text in change["actual"])
+    return lines
+
+
+class SnapshotStore:
+    """
+    Speech transcript snapshots stored as one JSON file per page and state.
+
+    Files live in `<page>/<state>.json` and are read once and kept in
+    memory, so looking up a page and state is a dictionary access.
+    Mismatches are written next to the snapshot as `<state>.pending.json`
+    for tools/accept_snapshots.py. Every file is written whole and put in
+    place with an atomic rename, so parallel workers recording different
+    states of a page never overwrite each other's results.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = directory
+        self._snapshots = {}
+
+    def path(self, page, state, pending=False):
+        return os.path.join(self.directory, _page_key(page), _file_key(state) + (PENDING_SUFFIX if pending else ".json"))
+
+    def _read(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, path, page, state, transcript):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump({"page": page, "state": state, "transcript": transcript}, f,
+                      indent=1, ensure_ascii=False, sort_keys=True)
+            f.write("\n")
+        os.replace(temporary, path)
+
+    def expected(self, page, state="default"):
+        """
+        Returns the recorded transcript for a page and state, or None.
+        """
+        path = self.path(page, state)
+        if path not in self._snapshots:
+            snapshot = self._read(path)
+            self._snapshots[path] = snapshot["transcript"] if snapshot else None
+        return self._snapshots[path]
+
+    def record(self, page, state, transcript):
+        """
+        Saves a transcript as the snapshot for a page and state, dropping any pending transcript.
+
+        Returns:
+            True if the snapshot file changed
+        """
+        transcript = list(transcript)
+        self.discard_pending(page, state)
+        if self.expected(page, state) == transcript:
+            return False
+        path = self.path(page, state)
+        self._write(path, page, state, transcript)
+        self._snapshots[path] = transcript
+        return True
+
+    def save_pending(self, page, state, transcript):
+        """
+        Stores a transcript that differs from the snapshot for later acceptance.
+        """
+        path = self.path(page, state, pending=True)
+        self._write(path, page, state, list(transcript))
+        return path
+
+    def discard_pending(self, page, state):
+        """
+        Removes the pending transcript of a page and state, e.g. one left by an earlier failed run.
+        """
+        try:
+            os.remove(self.path(page, state, pending=True))
+        except FileNotFoundError:
+            pass
+
+    def verify(self, page, state, transcript):
+        """
+        Compares a transcript with the snapshot.
+
+        Returns:
+            A list of changes (empty when the transcript matches), or None if
+            there is no snapshot for the page and state yet
+        """
+        expected = self.expected(page, state)
+        if expected is None:
+            return None
+        return _diff_transcripts(expected, list(transcript))
+
+
+_store = SnapshotStore(os.environ.get("SPEECH_SNAPSHOT_DIR") or DEFAULT_DIR)
+_mode = os.environ.get("SPEECH_SNAPSHOT_MODE", "verify").lower()
+
+
+def _current_page():
+    return BuiltIn().get_library_instance("Browser").evaluate_javascript(None, "() => location.href")
+
+
+def _transcript(transcript):
+    if isinstance(transcript, str):
+        return transcript.splitlines()
+    return [str(text) for text in transcript]
+
+
+def set_speech_snapshot_mode(mode):
+    """
+    Sets the snapshot mode: `verify` compares transcripts with the snapshots,
+    `record` saves them as the new snapshots.
+
+    The initial mode comes from the SPEECH_SNAPSHOT_MODE environment variable
+    (run_tests.py --update-snapshots sets it to record).
+    """
+    global _mode
+    mode = mode.lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown snapshot mode '{mode}'. Choose from: {', '.join(MODES)}")
+    _mode = mode
+
+
+def set_speech_snapshot_directory(directory):
+    """
+    Uses snapshots from `directory` instead of tests/speech_snapshots.
+    """
+    global _store
+    _store = SnapshotStore(directory)
+
+
+def verify_speech_snapshot(transcript, state="default", page=None):
+    """
+    Compares a speech transcript with the recorded snapshot for the page and state.
+
+    In record mode the transcript is saved as the snapshot instead. When it
+    differs, or no snapshot exists yet, the transcript is saved as pending
+    and the keyword fails with a diff of inserted, removed and changed
+    utterances. Accept pending snapshots with `python3 tools/accept_snapshots.py`.
+
+    Args:
+        transcript: List of utterances, or one string with an utterance per line
+        state: Name of the page state, e.g. `default` or `menu open`
+        page: Page URL or name; defaults to the URL of the current page
+    """
+    transcript = _transcript(transcript)
+    page = page or _current_page()
+
+    if _mode == "record":
+        changed = _store.record(page, state, transcript)
+        logger.info(f"{'Recorded' if changed else 'Unchanged'} snapshot for {page} [{state}] "
+                    f"({len(transcript)} utterances)")
+        return
+
+    changes = _store.verify(page, state, transcript)
+    if changes is None:
+        path = _store.save_pending(page, state, transcript)
+        raise AssertionError(f"No speech snapshot for {page} [{state}]. New transcript saved to {path}")
+    if changes:
+        path = _store.save_pending(page, state, transcript)
+        diff = "\n".join(_format_diff(changes))
+        raise AssertionError(f"Speech for {page} [{state}] differs from the snapshot "
+                             f"({len(changes)} changes, pending transcript saved to {path}):\n{diff}")
+    # A pending transcript from an earlier failed run is stale now
+    _store.discard_pending(page, state)
+    logger.info(f"Speech for {page} [{state}] matches the snapshot ({len(transcript)} utterances)")
+
+
+def diff_speech_transcripts(expected, actual):
+    """
+    Returns the differences between two transcripts as `-`/`+` lines.
+    """
+    return _format_diff(_diff_transcripts(_transcript(expected), _transcript(actual)))
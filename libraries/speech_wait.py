@@ -0,0 +1,261 @@
+import os
+import time
+import errno
+import ctypes
+import ctypes.util
+import select
+import platform
+import threading
+
+# How long speech must stay unchanged before it is considered complete
+DEFAULT_QUIET_PERIOD = 0.15
+
+# Interval used when a file has to be polled instead of watched
+DEFAULT_POLL_INTERVAL = 0.02
+
+# inotify constants from <sys/inotify.h>
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+
+class SpeechSignal:
+    """
+    In-memory speech holder that wakes up waiters whenever the speech changes.
+    """
+
+    def __init__(self, text="", version=0):
+        self._condition = threading.Condition()
+        self._version = version
+        self._text = text
+        self._changed_at = time.monotonic()
+
+    @property
+    def text(self):
+        return self._text
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def changed_at(self):
+        return self._changed_at
+
+    def set(self, text, version=None):
+        """
+        Replaces the current speech and notifies all waiters.
+
+        Args:
+            text: The new speech
+            version: Explicit version for the speech, e.g. an utterance sequence number
+        """
+        with self._condition:
+            self._text = text
+            self._version = self._version + 1 if version is None else version
+            self._changed_at = time.monotonic()
+            self._condition.notify_all()
+
+    def clear(self):
+        """
+        Clears the current speech.
+        """
+        self.set("")
+
+    def wait_for_change(self, version, timeout):
+        """
+        Blocks until the speech version differs from `version` or the timeout expires.
+
+        Returns:
+            True if the speech changed, False on timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._version != version,
+                                            timeout=max(timeout, 0))
+
+
+class FileWatcher:
+    """
+    Waits for changes to a single file.
+
+    Uses inotify on Linux and falls back to polling the file's size and
+    modification time everywhere else.
+    """
+
+    def __init__(self, path, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.path = os.path.abspath(path)
+        self.poll_interval = poll_interval
+        self._fd = None
+        if platform.system() == "Linux":
+            self._fd = _open_inotify(os.path.dirname(self.path))
+
+    @property
+    def uses_inotify(self):
+        return self._fd is not None
+
+    def wait(self, timeout):
+        """
+        Blocks until the watched file may have changed or the timeout expires.
+        Callers must re-check the file themselves; spurious wake-ups are allowed.
+        """
+        timeout = max(timeout, 0)
+        if self._fd is None:
+            time.sleep(min(self.poll_interval, timeout))
+            return
+
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if readable:
+            self._drain()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _drain(self):
+        try:
+            while os.read(self._fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+
+def _open_inotify(directory):
+    """
+    Returns an inotify file descriptor watching `directory`, or None if inotify is unavailable.
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            return None
+        mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+        if libc.inotify_add_watch(fd, os.fsencode(directory), mask) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+
+def _file_state(path):
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return None
+        raise
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def wait_until_settled(probe, wait, timeout, quiet_period=DEFAULT_QUIET_PERIOD, age=None):
+    """
+    Waits until a speech source reports new speech that has stopped changing.
+
+    Args:
+        probe: Callable returning a token for the current speech, or None while there is no new speech
+        wait: Callable that blocks for at most the given seconds or until the speech may have changed
+        timeout: Upper bound for the whole wait (seconds)
+        quiet_period: How long the speech must stay unchanged (seconds)
+        age: Optional callable returning how long ago the speech first seen last changed (seconds)
+
+    Returns:
+        A (settled, waited) tuple where `waited` is the time actually spent
+    """
+    start = time.monotonic()
+    deadline = start + float(timeout)
+    quiet_period = float(quiet_period)
+
+    state = probe()
+    changed_at = start
+    if state is not None and age is not None:
+        # Speech produced before the wait started has already been quiet for a while
+        changed_at -= max(age(), 0)
+
+    while True:
+        now = time.monotonic()
+        if state is not None and now - changed_at >= quiet_period:
+            return True, now - start
+        if now >= deadline:
+            return False, now - start
+
+        if state is not None:
+            wait(min(changed_at + quiet_period, deadline) - now)
+        else:
+            wait(deadline - now)
+
+        new_state = probe()
+        if new_state != state:
+            state = new_state
+            changed_at = time.monotonic()
+
+
+def wait_for_file_settle(path, timeout, quiet_period=DEFAULT_QUIET_PERIOD,
+                         poll_interval=DEFAULT_POLL_INTERVAL, baseline=None):
+    """
+    Waits until a speech file holds new content that has stopped changing.
+
+    Args:
+        path: File the screen reader writes its speech to
+        timeout: Upper bound for the whole wait (seconds)
+        quiet_period: How long the file must stay unchanged (seconds)
+        poll_interval: Poll interval when inotify is not available (seconds)
+        baseline: File state (size, mtime) that does not count as new speech
+
+    Returns:
+        A (settled, waited) tuple where `waited` is the time actually spent
+    """
+    def probe():
+        state = _file_state(path)
+        if state is None or state[0] == 0 or state == baseline:
+            return None
+        return state
+
+    def age():
+        state = _file_state(path)
+        return time.time() - state[1] / 1e9 if state else 0
+
+    with FileWatcher(path, poll_interval) as watcher:
+        return wait_until_settled(probe, watcher.wait, timeout, quiet_period, age)
+
+
+def wait_for_signal_settle(signal, timeout, quiet_period=DEFAULT_QUIET_PERIOD, since_version=None):
+    """
+    Waits until a SpeechSignal holds speech that has stopped changing.
+
+    Args:
+        signal: The SpeechSignal to watch
+        timeout: Upper bound for the whole wait (seconds)
+        quiet_period: How long the speech must stay unchanged (seconds)
+        since_version: Only speech set after this version counts as new
+
+    Returns:
+        A (settled, waited) tuple where `waited` is the time actually spent
+    """
+    seen = [signal.version]
+
+    def probe():
+        seen[0] = signal.version
+        if not signal.text:
+            return None
+        if since_version is not None and seen[0] <= since_version:
+            return None
+        return seen[0]
+
+    def wait(timeout):
+        signal.wait_for_change(seen[0], timeout)
+
+    def age():
+        return time.monotonic() - signal.changed_at
+
+    return wait_until_settled(probe, wait, timeout, quiet_period, age)
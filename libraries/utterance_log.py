@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import threading
+
+# Compact separators keep each record on one short line
+_SEPARATORS = (",", ":")
+
+
+class UtteranceLog:
+    """
+    Append-only log of screen reader utterances.
+
+    Each utterance is stored as one compact JSON line holding a sequence
+    number, a monotonic timestamp, the source that produced it and the
+    spoken text. The log keeps an in-memory index of record offsets so
+    readers can fetch everything after a marker without rereading the
+    whole file. Within a session it is never deleted or truncated to
+    "clear" speech; `rotate` starts a new file when a session starts, so
+    the log (and the index built on first use) only covers one session.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._offsets = []  # Byte offset of record with sequence number i + 1
+        self._indexed_to = 0  # Number of bytes already indexed
+
+    def append(self, text, source="simulator"):
+        """
+        Appends an utterance to the log.
+
+        Args:
+            text: The spoken text
+            source: Name of the producer (simulator, nvda, voiceover, ...)
+
+        Returns:
+            The utterance record that was written
+        """
+        with self._lock:
+            self._sync()
+            record = {
+                "seq": len(self._offsets) + 1,
+                "t": round(time.monotonic(), 6),
+                "src": source,
+                "text": text,
+            }
+            line = (json.dumps(record, separators=_SEPARATORS) + "\n").encode("utf-8")
+            with open(self.path, "ab") as f:
+                f.write(line)
+            self._sync()
+            return record
+
+    def rotate(self):
+        """
+        Moves the existing log to `<path>.1`, replacing the one kept from before, and starts an empty log.
+        """
+        with self._lock:
+            try:
+                os.replace(self.path, self.path + ".1")
+            except FileNotFoundError:
+                pass
+            self._offsets = []
+            self._indexed_to = 0
+
+    def marker(self):
+        """
+        Returns the sequence number of the newest utterance, or 0 for an empty log.
+        """
+        with self._lock:
+            self._sync()
+            return len(self._offsets)
+
+    def read_since(self, marker=0):
+        """
+        Returns all utterance records with a sequence number greater than `marker`.
+        """
+        marker = int(marker)
+        with self._lock:
+            self._sync()
+            if marker >= len(self._offsets):
+                return []
+            start = self._offsets[max(marker, 0)]
+            end = self._indexed_to
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        return [json.loads(line) for line in data.splitlines() if line]
+
+    def last_since(self, marker=0):
+        """
+        Returns the newest utterance record after `marker`, or None if there is none.
+        """
+        marker = int(marker)
+        with self._lock:
+            self._sync()
+            if marker >= len(self._offsets):
+                return None
+            start = self._offsets[-1]
+            end = self._indexed_to
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            return json.loads(f.read(end - start))
+
+    def _sync(self):
+        """
+        Indexes records appended since the last call, including those written by other processes.
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size < self._indexed_to:
+            # The file was replaced underneath us, start indexing from scratch
+            self._offsets = []
+            self._indexed_to = 0
+        if size == self._indexed_to:
+            return
+
+        with open(self.path, "rb") as f:
+            f.seek(self._indexed_to)
+            data = f.read(size - self._indexed_to)
+        offset = self._indexed_to
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # Partially written record, index it on the next call
+            self._offsets.append(offset)
+            offset += len(line)
+        self._indexed_to = offset
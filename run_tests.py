@@ -4,12 +4,23 @@ Script to run accessibility tests with screen reader integration.
 Automatically uses NVDA on Windows and VoiceOver on macOS.
 """
 import os
+import re
 import sys
+import json
+import time
+import heapq
+import hashlib
 import argparse
 import subprocess
 import platform
+import importlib.metadata
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent / "libraries"))
+import cache_paths
+
 def parse_arguments():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description="Run Robot Framework accessibility tests")
@@ -22,14 +33,101 @@ def parse_arguments():
                         help="URL to test")
     parser.add_argument("--use-screen-reader", action="store_true",
                         help="Attempt to use actual screen reader (NVDA on Windows, VoiceOver on macOS)")
+    parser.add_argument("--screen-reader-backend", choices=["nvda", "voiceover", "fake"],
+                        help="Screen reader for --use-screen-reader (default: based on the platform or "
+                             "SCREEN_READER_BACKEND), also used for the tests' speech; the fake one is only used when asked for")
     parser.add_argument("--test", default="tests/accessibility_tests.robot",
                         help="Test file to run")
     parser.add_argument("--output-dir", default="results",
                         help="Directory for test results")
+    parser.add_argument("--force-init", action="store_true",
+                        help="Run 'rfbrowser init' even if the installation has not changed")
+    parser.add_argument("--browser-pool", action="store_true",
+                        help="Keep one browser per worker alive and reuse pooled contexts across tests")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of parallel robot processes to split the tests across")
+    parser.add_argument("--timings-file",
+                        help="JSON file with past test durations used to balance workers "
+                             "(default: <output-dir>/test_timings.json)")
+    parser.add_argument("--update-snapshots", action="store_true",
+                        help="Record speech snapshots instead of verifying them")
+    parser.add_argument("--screenshots", default="on-failure",
+                        choices=["on-failure", "always", "sampled", "never"],
+                        help="When to take a screenshot in test teardown")
+    parser.add_argument("--screenshot-sample-rate", type=float, default=0.1,
+                        help="Share of passed tests captured with --screenshots sampled")
+    parser.add_argument("--screenshot-max-width", type=int, default=0,
+                        help="Downscale screenshots wider than this many pixels (needs Pillow)")
+    har_mode = parser.add_mutually_exclusive_group()
+    har_mode.add_argument("--record", action="store_true",
+                          help="Record page traffic into HAR files in --har-dir")
+    har_mode.add_argument("--replay", action="store_true",
+                          help="Serve page traffic from the HAR files in --har-dir instead of the network")
+    parser.add_argument("--har-dir", default="tests/har",
+                        help="Directory for recorded HAR files")
+    parser.add_argument("--allow-network", action="store_true",
+                        help="With --replay, fetch requests missing from the HAR files from the network "
+                             "instead of failing them")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep the browser warm and re-run the affected tests when test, resource "
+                             "or library files change")
+    parser.add_argument("--watch-interval", type=float, default=0.5,
+                        help="Seconds between checks for changed files in --watch mode")
     return parser.parse_args()
 
-def initialize_browser_library():
-    """Initialize the Robot Framework Browser library."""
+def browser_library_fingerprint():
+    """
+    Fingerprint the Browser library installation.
+    
+    Covers the Browser library and Playwright versions, the installed node
+    dependencies and the downloaded browser binaries. Returns None when the
+    library or its node dependencies are missing, i.e. init is required.
+    """
+    spec = importlib.util.find_spec("Browser")
+    if spec is None or spec.origin is None:
+        return None
+    wrapper_dir = Path(spec.origin).parent / "wrapper"
+    playwright_package = wrapper_dir / "node_modules" / "playwright-core" / "package.json"
+    if not playwright_package.exists():
+        return None
+    
+    browsers_path = os.environ.get("PLAYWRIGHT_BROWSERS_PATH", "").strip()
+    if not browsers_path or browsers_path == "0":
+        browsers_dir = playwright_package.parent / ".local-browsers"
+    else:
+        browsers_dir = Path(browsers_path)
+    browsers = sorted(entry.name for entry in browsers_dir.iterdir()) if browsers_dir.is_dir() else []
+    
+    with open(playwright_package) as f:
+        playwright_version = json.load(f).get("version")
+    fingerprint = {
+        "browser_library": importlib.metadata.version("robotframework-browser"),
+        "playwright": playwright_version,
+        "package_lock": os.path.getmtime(wrapper_dir / "package-lock.json")
+                        if (wrapper_dir / "package-lock.json").exists() else None,
+        "browsers_dir": str(browsers_dir),
+        "browsers": browsers,
+    }
+    return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+
+def initialize_browser_library(force=False):
+    """
+    Initialize the Robot Framework Browser library.
+    
+    'rfbrowser init' is skipped when the installation fingerprint matches
+    the one recorded after the last successful init, unless force is set.
+    """
+    fingerprint_file = Path(cache_paths.CACHE_DIR) / "rfbrowser-init.json"
+    fingerprint = browser_library_fingerprint()
+    if not force and fingerprint is not None:
+        try:
+            with open(fingerprint_file) as f:
+                if json.load(f).get("fingerprint") == fingerprint:
+                    print("Browser library already initialized, skipping 'rfbrowser init'.")
+                    return True
+        except (OSError, ValueError):
+            pass
+    
     print("Initializing Browser library...")
     try:
         result = subprocess.run(["rfbrowser", "init"], 
@@ -38,7 +136,6 @@ def initialize_browser_library():
                                check=True,
                                text=True)
         print("Browser library initialized successfully.")
-        return True
     except subprocess.CalledProcessError as e:
         print(f"Failed to initialize Browser library: {e}")
         print(f"Output: {e.stdout}")
@@ -48,50 +145,103 @@ def initialize_browser_library():
         print("rfbrowser command not found. Make sure Robot Framework Browser library is installed.")
         print("Run: pip install robotframework-browser && rfbrowser init")
         return False
+    
+    fingerprint = browser_library_fingerprint()
+    if fingerprint is not None:
+        fingerprint_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(fingerprint_file, "w") as f:
+            json.dump({"fingerprint": fingerprint}, f)
+    return True
 
-def check_and_start_screen_reader(use_screen_reader):
-    """Check and start the appropriate screen reader based on the OS."""
+def check_and_start_screen_reader(use_screen_reader, backend=None, timeout=30):
+    """Check and start the chosen screen reader, or the one for this OS."""
     if not use_screen_reader:
         print("Screen reader integration disabled, will use simulation mode.")
         return True
     
-    system = platform.system()
     tools_dir = Path(__file__).parent / "tools"
-    screen_reader_control = tools_dir / "nvda_control.py"
-    
-    if not screen_reader_control.exists():
-        print(f"Screen reader control script not found at: {screen_reader_control}")
-        return False
+    if str(tools_dir) not in sys.path:
+        sys.path.insert(0, str(tools_dir))
     
     try:
-        # Check if screen reader is already running
-        status_proc = subprocess.run([sys.executable, str(screen_reader_control), "status"],
-                                    stdout=subprocess.PIPE,
-                                    text=True)
+        from screen_reader_controller import ScreenReaderController, create_backend
+        
+        try:
+            controller = ScreenReaderController(create_backend(backend))
+        except ValueError as e:
+            print(f"WARNING: --use-screen-reader has no effect: {e} Tests will use simulation mode.",
+                  file=sys.stderr)
+            return False
+        if controller.is_ready():
+            print(f"{controller.name} is already running.")
+            return True
         
-        if "not running" in status_proc.stdout:
-            # Start screen reader
-            reader_name = "NVDA" if system == "Windows" else "VoiceOver"
-            print(f"Starting {reader_name}...")
-            start_proc = subprocess.run([sys.executable, str(screen_reader_control), "start"],
-                                       stdout=subprocess.PIPE,
-                                       text=True)
-            if "successfully started" in start_proc.stdout:
-                print(f"{reader_name} started successfully.")
-                return True
-            else:
-                print(f"Failed to start {reader_name}. Will use simulation mode.")
-                return False
-        else:
-            reader_name = "NVDA" if system == "Windows" else "VoiceOver"
-            print(f"{reader_name} is already running.")
+        print(f"Starting {controller.name}...")
+        if controller.start(timeout):
+            print(f"{controller.name} started successfully in {controller.last_wait_time:.2f}s.")
             return True
+        print(f"Failed to start {controller.name}. Will use simulation mode.")
+        return False
     except Exception as e:
         print(f"Error controlling screen reader: {str(e)}")
         return False
 
+def build_robot_command(args, output_dir):
+    """Build the robot command line shared by serial and parallel runs."""
+    latency_listener = Path(__file__).parent / "libraries" / "latency_listener.py"
+    robot_cmd = [
+        "robot",
+        "--outputdir", str(output_dir),
+        "--listener", str(latency_listener),
+    ]
+    for variable in robot_variables(args):
+        robot_cmd.extend(["--variable", variable])
+    return robot_cmd
+
+def robot_variables(args):
+    """Return the NAME:value variables passed to every robot run."""
+    variables = [
+        f"BROWSER:{args.browser}",
+        f"HEADLESS:{str(args.headless).lower()}",
+        f"GOOGLE_URL:{args.url}",
+    ]
+    if args.browser_pool:
+        variables.extend([
+            "BROWSER_POOL:True",
+            "BROWSER_AUTO_CLOSING:MANUAL",
+        ])
+    return variables
+
+def clear_har_cache_stats(output_dir):
+    """Delete the HAR cache statistics of earlier runs, so the report only counts this one."""
+    for stats_file in Path(output_dir).glob("**/har_cache.json"):
+        stats_file.unlink(missing_ok=True)
+
+def report_har_cache(output_dir):
+    """Print the HAR cache statistics the suites wrote to the output directory and its worker directories."""
+    totals = {"requests": 0, "hits": 0, "misses": 0}
+    mode = None
+    for stats_file in sorted(Path(output_dir).glob("**/har_cache.json")):
+        try:
+            with open(stats_file) as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            continue
+        mode = stats.get("mode", mode)
+        for key in totals:
+            totals[key] += stats.get(key, 0)
+    if mode == "replay":
+        rate = totals["hits"] / totals["requests"] * 100 if totals["requests"] else 0.0
+        print(f"HAR replay: {totals['hits']}/{totals['requests']} requests served from HAR files "
+              f"({rate:.1f}% hit rate), {totals['misses']} misses")
+    elif mode == "record":
+        print(f"HAR recording: {totals['requests']} requests recorded")
+
 def run_robot_tests(args):
     """Run Robot Framework tests."""
+    if args.workers > 1:
+        return run_robot_tests_in_parallel(args)
+
     test_path = Path(args.test)
     output_dir = Path(args.output_dir)
     
@@ -99,14 +249,7 @@ def run_robot_tests(args):
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Build robot command
-    robot_cmd = [
-        "robot",
-        "--outputdir", str(output_dir),
-        "--variable", f"BROWSER:{args.browser}",
-        "--variable", f"HEADLESS:{str(args.headless).lower()}",
-        "--variable", f"GOOGLE_URL:{args.url}",
-        str(test_path)
-    ]
+    robot_cmd = build_robot_command(args, output_dir) + [str(test_path)]
     
     print(f"Running tests with command: {' '.join(robot_cmd)}")
     
@@ -119,6 +262,172 @@ def run_robot_tests(args):
         print(f"Test execution failed with exit code: {e.returncode}")
         return False
 
+def run_watch_mode(args):
+    """
+    Run the tests, then re-run the affected ones whenever test, resource or library files change.
+    
+    The tests run in this process against one Playwright process and the
+    browser pool, so the browser and speech sessions stay warm between runs.
+    """
+    tools_dir = Path(__file__).parent / "tools"
+    if str(tools_dir) not in sys.path:
+        sys.path.insert(0, str(tools_dir))
+    from test_watcher import WatchSession
+    
+    if args.workers > 1:
+        print("Watch mode runs the tests in one process, ignoring --workers.")
+    # The warm browser lives in the pool
+    args.browser_pool = True
+    latency_listener = Path(__file__).parent / "libraries" / "latency_listener.py"
+    session = WatchSession(args.test, args.output_dir,
+                           variables=robot_variables(args),
+                           listeners=[str(latency_listener)],
+                           interval=args.watch_interval)
+    try:
+        session.run()
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+    finally:
+        session.close()
+    return True
+
+def _test_name(test):
+    """Return the full name of a test across Robot Framework versions."""
+    return getattr(test, "full_name", None) or test.longname
+
+def _test_seconds(test):
+    """Return the elapsed time of a test result in seconds across Robot Framework versions."""
+    elapsed = getattr(test, "elapsed_time", None)
+    if elapsed is not None:
+        return elapsed.total_seconds()
+    return test.elapsedtime / 1000.0
+
+def collect_tests(test_path):
+    """Return the full names of all tests under the given file or directory."""
+    from robot.api import TestSuiteBuilder
+    suite = TestSuiteBuilder().build(str(test_path))
+    return [_test_name(test) for test in suite.all_tests]
+
+def load_timings(timings_file):
+    """Load past test durations, keyed by test full name."""
+    try:
+        with open(timings_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_timings(timings_file, timings):
+    """Persist test durations for the next run's scheduler."""
+    Path(timings_file).parent.mkdir(parents=True, exist_ok=True)
+    with open(timings_file, "w") as f:
+        json.dump(timings, f, indent=2, sort_keys=True)
+
+def plan_shards(tests, workers, timings):
+    """
+    Split tests into balanced shards using past durations.
+    
+    Longest tests are placed first, each on the currently lightest shard.
+    Tests without history are assumed to take the median known duration.
+    """
+    known = sorted(timings[name] for name in tests if name in timings)
+    default = known[len(known) // 2] if known else 1.0
+    
+    shards = [[] for _ in range(min(workers, len(tests)))]
+    loads = [(0.0, index) for index in range(len(shards))]
+    for name in sorted(tests, key=lambda name: timings.get(name, default), reverse=True):
+        load, index = heapq.heappop(loads)
+        shards[index].append(name)
+        heapq.heappush(loads, (load + timings.get(name, default), index))
+    return shards
+
+def escape_test_pattern(name):
+    """Escape the glob characters of a test name, so --test matches only that test."""
+    return re.sub(r"[\[*?]", lambda match: f"[{match.group()}]", name)
+
+def run_shard(args, index, tests, output_dir):
+    """Run one shard of tests in its own robot process, output directory and speech session."""
+    worker_dir = output_dir / f"worker-{index}"
+    worker_dir.mkdir(parents=True, exist_ok=True)
+    
+    robot_cmd = build_robot_command(args, worker_dir) + [
+        "--output", "output.xml",
+        "--log", "NONE",
+        "--report", "NONE",
+        "--console", "dotted",
+    ]
+    # An argument file keeps long shards under the command line length limit
+    argument_file = worker_dir / "tests.args"
+    argument_file.write_text("".join(f"--test {escape_test_pattern(name)}\n" for name in tests), encoding="utf-8")
+    robot_cmd.extend(["--argumentfile", str(argument_file), str(args.test)])
+    
+    env = dict(os.environ, SPEECH_SESSION_ID=f"worker-{index}")
+    result = subprocess.run(robot_cmd, env=env)
+    return result.returncode, worker_dir / "output.xml"
+
+def record_timings(output_files, timings_file):
+    """Add the durations from the given output.xml files to the timings file."""
+    from robot.api import ExecutionResult
+    timings = load_timings(timings_file)
+    for output_file in output_files:
+        result = ExecutionResult(str(output_file))
+        for test in result.suite.all_tests:
+            timings[_test_name(test)] = round(_test_seconds(test), 3)
+    save_timings(timings_file, timings)
+
+def merge_results(output_files, output_dir, name):
+    """
+    Combine the shard outputs into a single output.xml, log and report.
+
+    The shards ran different tests, so their suites are combined under one
+    root suite called `name`. `rebot --merge` would treat them as re-runs of
+    each other and mark every test of the later shards as added.
+    """
+    rebot_cmd = [
+        "rebot",
+        "--name", name,
+        "--outputdir", str(output_dir),
+        "--output", "output.xml",
+    ] + [str(path) for path in output_files]
+    # rebot exits with the number of failed tests, which is not an error here
+    return subprocess.run(rebot_cmd).returncode < 250
+
+def run_robot_tests_in_parallel(args):
+    """Run Robot Framework tests split across several worker processes."""
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    timings_file = args.timings_file or output_dir / "test_timings.json"
+    
+    tests = collect_tests(args.test)
+    if not tests:
+        print(f"No tests found in {args.test}")
+        return False
+    
+    shards = plan_shards(tests, args.workers, load_timings(timings_file))
+    print(f"Running {len(tests)} tests across {len(shards)} workers")
+    
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        futures = [pool.submit(run_shard, args, index, shard, output_dir)
+                   for index, shard in enumerate(shards)]
+        results = [future.result() for future in futures]
+    
+    output_files = [path for _, path in results if path.exists()]
+    if not output_files:
+        print("No worker produced an output file.")
+        return False
+    
+    record_timings(output_files, timings_file)
+    suite_name = Path(args.test).stem.replace("_", " ").title()
+    if not merge_results(output_files, output_dir, suite_name):
+        print("Failed to merge worker results.")
+        return False
+    
+    failed = [index for index, (returncode, _) in enumerate(results) if returncode != 0]
+    if failed:
+        print(f"Test execution failed in workers: {', '.join(map(str, failed))}")
+        return False
+    print(f"Tests completed. Results available in {output_dir}")
+    return True
+
 def main():
     """Main entry point."""
     args = parse_arguments()
@@ -128,15 +437,37 @@ def main():
     print(f"Operating System: {system}")
     print(f"Using {'NVDA' if system == 'Windows' else 'VoiceOver'} for screen reader accessibility testing")
     
+    if args.update_snapshots:
+        os.environ["SPEECH_SNAPSHOT_MODE"] = "record"
+    if args.screen_reader_backend:
+        # The tests select the same backend for their speech keywords
+        os.environ["SCREEN_READER_BACKEND"] = args.screen_reader_backend
+    os.environ["SCREENSHOT_POLICY"] = args.screenshots
+    os.environ["SCREENSHOT_SAMPLE_RATE"] = str(args.screenshot_sample_rate)
+    os.environ["SCREENSHOT_MAX_WIDTH"] = str(args.screenshot_max_width)
+    # Workers share one screenshot directory, linked relative to the merged log
+    os.environ["SCREENSHOT_OUTPUT_DIR"] = str(Path(args.output_dir).resolve())
+    if args.record or args.replay:
+        os.environ["HAR_MODE"] = "record" if args.record else "replay"
+        os.environ["HAR_DIR"] = str(Path(args.har_dir).resolve())
+        os.environ["HAR_OFFLINE"] = str(not args.allow_network).lower()
+    
+    startup_start = time.monotonic()
+    
     # Initialize Browser library if needed
-    if not initialize_browser_library():
+    if not initialize_browser_library(force=args.force_init):
         return 1
     
     # Check and start screen reader if requested
-    check_and_start_screen_reader(args.use_screen_reader)
+    check_and_start_screen_reader(args.use_screen_reader, args.screen_reader_backend)
+    print(f"Startup phase took {time.monotonic() - startup_start:.2f}s")
     
     # Run the tests
-    success = run_robot_tests(args)
+    if args.record or args.replay:
+        clear_har_cache_stats(args.output_dir)
+    success = run_watch_mode(args) if args.watch else run_robot_tests(args)
+    if args.record or args.replay:
+        report_har_cache(args.output_dir)
     
     return 0 if success else 1
 
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Accept pending speech snapshots written by failed snapshot verifications.
+
+Every `<page>/<state>.pending.json` next to the snapshots holds a transcript
+that differed from (or was missing in) `<page>/<state>.json`. Accepting
+replaces the snapshot with it and removes the pending file.
+"""
+import os
+import sys
+import glob
+import json
+import fnmatch
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "libraries"))
+from speech_snapshots import SnapshotStore, DEFAULT_DIR, PENDING_SUFFIX
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Accept pending speech snapshots")
+    parser.add_argument("--dir", default=os.environ.get("SPEECH_SNAPSHOT_DIR") or DEFAULT_DIR,
+                        help="Snapshot directory (default: tests/speech_snapshots)")
+    parser.add_argument("--page", default="*",
+                        help="Only accept pages whose URL or name matches this glob pattern")
+    parser.add_argument("--state", default="*",
+                        help="Only accept states matching this glob pattern")
+    parser.add_argument("--list", action="store_true",
+                        help="Only show the pending changes, do not accept them")
+    parser.add_argument("--diff", action="store_true",
+                        help="Show the changed utterances")
+    return parser.parse_args()
+
+def describe_changes(changes):
+    """Summarize changes as counts of inserted, removed and changed utterances."""
+    inserted = sum(len(change["actual"]) for change in changes if change["op"] == "insert")
+    removed = sum(len(change["expected"]) for change in changes if change["op"] == "delete")
+    changed = sum(len(change["actual"]) for change in changes if change["op"] == "replace")
+    return f"+{inserted} -{removed} ~{changed}"
+
+def main():
+    """Main entry point."""
+    args = parse_arguments()
+    store = SnapshotStore(args.dir)
+    pending_files = sorted(glob.glob(os.path.join(args.dir, "*", "*" + PENDING_SUFFIX)))
+    if not pending_files:
+        print(f"No pending snapshots in {args.dir}")
+        return 0
+
+    accepted = 0
+    for path in pending_files:
+        with open(path, encoding="utf-8") as f:
+            pending = json.load(f)
+        page, state, transcript = pending["page"], pending["state"], pending["transcript"]
+        if not fnmatch.fnmatch(page, args.page) or not fnmatch.fnmatch(state, args.state):
+            continue
+
+        changes = store.verify(page, state, transcript)
+        summary = "new" if changes is None else describe_changes(changes)
+        print(f"{page} [{state}]: {summary}")
+        if args.diff and changes:
+            for change in changes:
+                for text in change["expected"]:
+                    print(f"    - {text}")
+                for text in change["actual"]:
+                    print(f"    + {text}")
+        if not args.list:
+            # Also removes the pending file, unless it was written under an older key
+            store.record(page, state, transcript)
+            if os.path.exists(path):
+                os.remove(path)
+            accepted += 1
+
+    if not args.list:
+        print(f"Accepted {accepted} snapshot(s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Fake screen reader that pushes utterances to a running speech server.
+
+Lets the speech server and the keywords waiting on it be exercised on
+Linux or CI where neither NVDA nor VoiceOver is available.
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "libraries"))
+from speech_server import SpeechClient, ADDRESS_VARIABLE
+
+DEFAULT_UTTERANCES = [
+    "BBC, link",
+    "Home, link",
+    "News, link",
+    "Sport, link",
+    "Search BBC, search text field",
+]
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Push fake screen reader speech to a speech server")
+    parser.add_argument("--address", help=f"Speech server address (default: ${ADDRESS_VARIABLE})")
+    parser.add_argument("--source", default="fake", help="Producer name stored with each utterance")
+    parser.add_argument("--interval", type=float, default=0.1, help="Seconds between utterances")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of times to send the utterances")
+    parser.add_argument("--stdin", action="store_true", help="Read utterances from standard input, one per line")
+    parser.add_argument("utterances", nargs="*", help="Utterances to send (default: a few sample utterances)")
+    return parser.parse_args()
+
+def main():
+    """Main entry point."""
+    args = parse_arguments()
+    if args.stdin:
+        utterances = [line.rstrip("\n") for line in sys.stdin if line.strip()]
+    else:
+        utterances = args.utterances or DEFAULT_UTTERANCES
+
+    try:
+        client = SpeechClient(args.address)
+    except (OSError, ValueError) as e:
+        print(f"Cannot connect to speech server: {str(e)}")
+        return 1
+
+    sent = 0
+    start = time.monotonic()
+    with client:
+        for _ in range(args.repeat):
+            for text in utterances:
+                client.push(text, args.source)
+                sent += 1
+                if args.interval > 0:
+                    time.sleep(args.interval)
+    print(f"Sent {sent} utterance(s) in {time.monotonic() - start:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
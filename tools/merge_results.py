@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Merge Robot Framework output.xml files and summarize them in one streaming pass.
+
+The files (or directories searched recursively for output.xml, such as the
+results/worker-N directories of run_tests.py --workers) are read with expat,
+so memory use does not grow with their size. The summary holds:
+
+- passed, failed and skipped tests per output file and in total
+- call counts and durations per keyword
+- a per-page speech table built from the "Element: ..., Speech: ..."
+  messages logged by Hover On Element And Get Speech and Get Speech For
+  Elements. The page is the URL opened by the last New Page, Go To or
+  Acquire Pooled Page of the test, or the test name if there is none.
+
+With --output the top-level suites of all files are also copied, byte for
+byte, under one new root suite into a combined output.xml that rebot
+can turn into a log and report. Unlike `rebot --merge` this does not
+replace re-executed tests; it is meant for shards that ran different tests.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import xml.parsers.expat
+from datetime import datetime, timedelta
+from pathlib import Path
+from xml.sax.saxutils import quoteattr
+
+SPEECH_MESSAGE = re.compile(r"Element: (.*?), Speech: (.*)", re.DOTALL)
+URL_PATTERN = re.compile(r"\b(?:https?|file)://[^\s'\"<>]+")
+
+# Keywords whose URL argument (or logged URL) becomes the current page
+NAVIGATION_KEYWORDS = {"New Page", "Go To", "Acquire Pooled Page"}
+
+# Elements whose status is a keyword run; RF 7 logs control structures with their own tags
+KEYWORD_TAGS = {"kw", "setup", "teardown"}
+
+RF6_TIME_FORMAT = "%Y%m%d %H:%M:%S.%f"
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Merge and summarize Robot Framework output.xml files")
+    parser.add_argument("inputs", nargs="+",
+                        help="output.xml files or directories to search for them")
+    parser.add_argument("--output",
+                        help="Write the combined output.xml here")
+    parser.add_argument("--name", default="Merged",
+                        help="Name of the root suite in the combined output")
+    parser.add_argument("--json",
+                        help="Write the summary as JSON to this file (- for standard output)")
+    parser.add_argument("--top", type=int, default=20,
+                        help="Number of keywords to show, slowest total first")
+    parser.add_argument("--no-speech", action="store_true",
+                        help="Do not print the speech table")
+    return parser.parse_args()
+
+def find_outputs(inputs):
+    """Expand directories to the output.xml files below them, in a stable order."""
+    files = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            files.extend(sorted(path.rglob("output.xml")))
+        else:
+            files.append(path)
+    return files
+
+def parse_rf6_time(value):
+    """Return an RF 6 timestamp (20250403 11:42:18.025) as a datetime, or None."""
+    if not value or value == "N/A":
+        return None
+    return datetime.strptime(value, RF6_TIME_FORMAT)
+
+def status_times(attrs):
+    """
+    Return (start, elapsed seconds) of a status element.
+
+    RF 7 writes `start` and `elapsed`, older versions `starttime` and `endtime`.
+    """
+    if "elapsed" in attrs:
+        start = attrs.get("start")
+        return (datetime.fromisoformat(start) if start else None), float(attrs["elapsed"])
+    start = parse_rf6_time(attrs.get("starttime"))
+    end = parse_rf6_time(attrs.get("endtime"))
+    if start and end:
+        return start, (end - start).total_seconds()
+    return start, 0.0
+
+class Summary:
+    """Test counts, keyword durations and the speech table of one or more output files."""
+
+    def __init__(self):
+        self.files = {}
+        self.totals = {"PASS": 0, "FAIL": 0, "SKIP": 0}
+        self.keywords = {}  # name -> [calls, failures, total seconds, max seconds]
+        self.speech = {}  # (page, element, speech) -> [count, first test]
+        self.messages = 0
+
+    def add_test(self, source, status):
+        counts = self.files.setdefault(source, {"PASS": 0, "FAIL": 0, "SKIP": 0})
+        if status in counts:
+            counts[status] += 1
+            self.totals[status] += 1
+
+    def add_keyword(self, name, status, seconds):
+        stats = self.keywords.get(name)
+        if stats is None:
+            stats = self.keywords[name] = [0, 0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += status == "FAIL"
+        stats[2] += seconds
+        stats[3] = max(stats[3], seconds)
+
+    def add_speech(self, page, element, speech, test):
+        entry = self.speech.get((page, element, speech))
+        if entry is None:
+            self.speech[(page, element, speech)] = [1, test]
+        else:
+            entry[0] += 1
+
+    def report(self):
+        keywords = [
+            {"name": name, "calls": calls, "failures": failures, "total_s": round(total, 6),
+             "mean_s": round(total / calls, 6), "max_s": round(longest, 6)}
+            for name, (calls, failures, total, longest) in self.keywords.items()
+        ]
+        keywords.sort(key=lambda keyword: keyword["total_s"], reverse=True)
+        speech = [
+            {"page": page, "element": element, "speech": text, "count": count, "test": test}
+            for (page, element, text), (count, test) in sorted(self.speech.items())
+        ]
+        return {
+            "files": {source: dict(counts) for source, counts in self.files.items()},
+            "tests": dict(self.totals, total=sum(self.totals.values())),
+            "keywords": keywords,
+            "speech": speech,
+        }
+
+class OutputParser:
+    """
+    Summarizes one output.xml with expat and records where its top-level suites are.
+
+    Only the open element path and the text of the current message or
+    argument are kept, so memory use is independent of the file size.
+    """
+
+    def __init__(self, summary, source):
+        self.summary = summary
+        self.source = source
+        self.stack = []  # Open element tags
+        self.keywords = []  # Open keyword frames: name, arguments and logged URLs
+        self.test = None
+        self.page = None
+        self.text = None  # Collected text of the open msg or arg element
+        self.suites = []  # (start, end) byte offsets of the top-level suites
+        self.suite_statuses = []  # Status attributes of the top-level suites
+        self.generator = None
+        self.schema = None
+        self._suite_start = None
+        self._parser = None
+
+    def parse(self):
+        self._parser = xml.parsers.expat.ParserCreate()
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = self.start_element
+        self._parser.EndElementHandler = self.end_element
+        self._parser.CharacterDataHandler = self.characters
+        with open(self.source, "rb") as f:
+            self._parser.ParseFile(f)
+        self._parser = None
+
+    def start_element(self, name, attrs):
+        depth = len(self.stack)
+        self.stack.append(name)
+        if depth == 0:
+            self.generator = attrs.get("generator")
+            self.schema = attrs.get("schemaversion")
+        elif depth == 1 and name == "suite":
+            self._suite_start = self._parser.CurrentByteIndex
+        elif name == "test":
+            self.test = attrs.get("name")
+            self.page = None
+        elif name in KEYWORD_TAGS:
+            self.keywords.append({"name": attrs.get("name", name), "args": [], "urls": []})
+        elif name == "status":
+            self._status(attrs, depth)
+        elif name in ("msg", "arg"):
+            self.text = []
+
+    def _status(self, attrs, depth):
+        owner = self.stack[-2]
+        status = attrs.get("status")
+        if owner == "test":
+            self.summary.add_test(self.source, status)
+        elif owner in KEYWORD_TAGS and self.keywords:
+            self.summary.add_keyword(self.keywords[-1]["name"], status, status_times(attrs)[1])
+        elif owner == "suite" and depth == 2:
+            self.suite_statuses.append(attrs)
+
+    def characters(self, content):
+        if self.text is not None:
+            self.text.append(content)
+
+    def end_element(self, name):
+        self.stack.pop()
+        if name == "msg":
+            self._message("".join(self.text))
+            self.text = None
+        elif name == "arg":
+            if self.keywords and self.stack[-1] in KEYWORD_TAGS:
+                self.keywords[-1]["args"].append("".join(self.text))
+            self.text = None
+        elif name in KEYWORD_TAGS and self.keywords:
+            frame = self.keywords.pop()
+            if frame["name"] in NAVIGATION_KEYWORDS:
+                self._navigated(frame)
+        elif name == "test":
+            self.test = None
+            self.page = None
+        elif name == "suite" and len(self.stack) == 1:
+            # The byte index points at the end tag of the suite
+            self.suites.append((self._suite_start, self._parser.CurrentByteIndex + len("</suite>")))
+
+    def _message(self, text):
+        urls = URL_PATTERN.findall(text)
+        if urls:
+            # Navigation keywords may log their URL from a nested keyword
+            for frame in self.keywords:
+                if frame["name"] in NAVIGATION_KEYWORDS:
+                    frame["urls"].extend(urls)
+        match = SPEECH_MESSAGE.match(text)
+        if match:
+            self.summary.messages += 1
+            page = self.page or self.test or self.source
+            self.summary.add_speech(page, match.group(1), match.group(2), self.test)
+
+    def _navigated(self, frame):
+        # Arguments are logged unresolved (${WEBSITE_URL}), so fall back to URLs the keyword logged
+        for arg in frame["args"]:
+            value = arg.split("=", 1)[1] if arg.startswith("url=") else arg
+            if "${" not in value and URL_PATTERN.match(value):
+                self.page = value
+                return
+        if frame["urls"]:
+            self.page = frame["urls"][0]
+
+class CombinedOutput:
+    """
+    Writes the suites of several output files under one root suite.
+
+    Suites are copied byte for byte from the parsed files instead of being
+    serialized again, so combining costs little more than reading the files.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, path, name):
+        self.file = open(path, "wb")
+        self.name = name
+        self.started = False
+        self.statuses = []
+
+    def _write(self, text):
+        self.file.write(text.encode("utf-8"))
+
+    def _start(self, schema):
+        attrs = {"generator": "merge_results.py", "generated": datetime.now().isoformat(), "rpa": "false"}
+        if schema:
+            attrs["schemaversion"] = schema
+        self._write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self._write(f"<robot{_attributes(attrs)}>\n")
+        self._write(f'<suite{_attributes({"id": "s1", "name": self.name})}>\n')
+        self.started = True
+
+    def add(self, parser):
+        """Copy the top-level suites of a parsed output file."""
+        if not self.started:
+            self._start(parser.schema)
+        self.statuses.extend(parser.suite_statuses)
+        with open(parser.source, "rb") as f:
+            for start, end in parser.suites:
+                f.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    chunk = f.read(min(self.CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    self.file.write(chunk)
+                    remaining -= len(chunk)
+                self.file.write(b"\n")
+
+    def close(self, failed):
+        if not self.started:
+            self._start(None)
+        attrs = {"status": "FAIL" if failed else "PASS"}
+        times = [status_times(status) for status in self.statuses]
+        starts = [start for start, _ in times if start]
+        # Shards run side by side, so the root suite spans from the first start to the last end
+        if self.statuses and "elapsed" in self.statuses[0]:
+            if starts:
+                end = max(start + timedelta(seconds=elapsed) for start, elapsed in times if start)
+                attrs["start"] = min(starts).isoformat()
+                attrs["elapsed"] = f"{(end - min(starts)).total_seconds():.6f}"
+            else:
+                attrs["elapsed"] = f"{max((elapsed for _, elapsed in times), default=0.0):.6f}"
+        elif starts:
+            end = max(start.timestamp() + elapsed for start, elapsed in times if start)
+            attrs["starttime"] = min(starts).strftime(RF6_TIME_FORMAT)[:-3]
+            attrs["endtime"] = datetime.fromtimestamp(end).strftime(RF6_TIME_FORMAT)[:-3]
+        self._write(f"<status{_attributes(attrs)}/>\n</suite>\n<errors>\n</errors>\n</robot>\n")
+        self.file.close()
+
+def _attributes(attrs):
+    return "".join(f" {name}={quoteattr(str(value))}" for name, value in attrs.items())
+
+def summarize(files, combined=None):
+    """
+    Parse the output files one after the other and return their Summary.
+
+    Args:
+        files: Paths of output.xml files
+        combined: Optional CombinedOutput that receives their suites
+    """
+    summary = Summary()
+    for path in files:
+        parser = OutputParser(summary, str(path))
+        parser.parse()
+        if combined is not None:
+            combined.add(parser)
+        print(f"{path}: {sum(summary.files.get(str(path), {}).values())} tests "
+              f"({parser.generator or 'unknown generator'})", file=sys.stderr)
+    return summary
+
+def print_report(report, top, speech=True):
+    """Print test counts, the slowest keywords and the speech table."""
+    tests = report["tests"]
+    print(f"{tests['total']} tests, {tests['PASS']} passed, {tests['FAIL']} failed, {tests['SKIP']} skipped")
+    for source, counts in report["files"].items():
+        print(f"  {source}: {counts['PASS']} passed, {counts['FAIL']} failed, {counts['SKIP']} skipped")
+
+    print(f"\n{'keyword':44} {'calls':>7} {'fail':>5} {'total s':>10} {'mean s':>9} {'max s':>9}")
+    for keyword in report["keywords"][:top]:
+        print(f"{keyword['name'][:44]:44} {keyword['calls']:7} {keyword['failures']:5} "
+              f"{keyword['total_s']:10.3f} {keyword['mean_s']:9.3f} {keyword['max_s']:9.3f}")
+
+    if not speech:
+        return
+    print(f"\nSpeech ({len(report['speech'])} distinct):")
+    page = None
+    for row in report["speech"]:
+        if row["page"] != page:
+            page = row["page"]
+            print(f"  {page}")
+        count = f" (x{row['count']})" if row["count"] > 1 else ""
+        print(f"    {row['element']}: {row['speech']}{count}")
+
+def main():
+    """Main entry point."""
+    args = parse_arguments()
+    files = find_outputs(args.inputs)
+    missing = [str(path) for path in files if not path.is_file()]
+    if missing or not files:
+        print(f"No output file found: {', '.join(missing) or ', '.join(args.inputs)}", file=sys.stderr)
+        return 1
+
+    combined = None
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        combined = CombinedOutput(args.output, args.name)
+    try:
+        summary = summarize(files, combined)
+    except (OSError, xml.parsers.expat.ExpatError) as e:
+        print(f"Cannot read output: {str(e)}", file=sys.stderr)
+        return 1
+    report = summary.report()
+    if combined is not None:
+        combined.close(failed=report["tests"]["FAIL"] > 0)
+        print(f"Combined output written to {args.output}", file=sys.stderr)
+
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+        return 0
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Summary written to {args.json}", file=sys.stderr)
+    print_report(report, args.top, speech=not args.no_speech)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
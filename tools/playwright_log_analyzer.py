@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Analyze Browser library (Playwright wrapper) logs to see where browser time goes.
+
+Reads pino NDJSON logs line by line, pairs "Start of node method X" and
+"End of node method X" per process, and reports latency percentiles, total
+time and the slowest calls per node method. Locators from "Strict mode is
+enabled, find Locator with ..." lines are attached to the call they belong
+to. Memory stays constant: latencies go into log-scale histograms and only
+the slowest calls are kept.
+"""
+import sys
+import gzip
+import json
+import math
+import heapq
+import argparse
+import itertools
+import collections
+from datetime import datetime
+
+START_PREFIX = "Start of node method "
+END_PREFIX = "End of node method "
+LOCATOR_PREFIX = "Strict mode is enabled, find Locator with "
+
+# Relative width of the histogram buckets; percentiles are accurate to about this much
+BUCKET_GROWTH = 1.02
+_LOG_GROWTH = math.log(BUCKET_GROWTH)
+
+def parse_arguments():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="Report Playwright node method latencies from Browser library logs")
+    parser.add_argument("logs", nargs="*", default=["playwright-log.txt"],
+                        help="Log files (.gz supported, - for standard input; default: playwright-log.txt)")
+    parser.add_argument("--top", type=int, default=5,
+                        help="Number of slowest calls to show per method")
+    parser.add_argument("--method", action="append",
+                        help="Only report these node methods (can be repeated)")
+    parser.add_argument("--json", action="store_true",
+                        help="Print the report as JSON")
+    return parser.parse_args()
+
+class LatencyHistogram:
+    """
+    Log-scale latency histogram with constant memory per distinct magnitude.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, ms):
+        bucket = math.floor(math.log(ms) / _LOG_GROWTH) if ms > 0 else -math.inf
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += ms
+        self.min = min(self.min, ms)
+        self.max = max(self.max, ms)
+
+    def percentile(self, fraction):
+        """Return the latency below which `fraction` of the calls fall (upper bucket bound, capped at max)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                if bucket == -math.inf:
+                    return 0.0
+                return min(BUCKET_GROWTH ** (bucket + 1), self.max)
+        return self.max
+
+class MethodStats:
+    """Latency statistics and slowest calls of one node method."""
+
+    def __init__(self, top):
+        self.histogram = LatencyHistogram()
+        self.top = top
+        self.slowest = []  # Min-heap of (ms, sequence, call)
+
+    def add(self, ms, sequence, call):
+        self.histogram.add(ms)
+        entry = (ms, sequence, call)
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, entry)
+        elif ms > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def summary(self):
+        histogram = self.histogram
+        return {
+            "count": histogram.count,
+            "total_ms": round(histogram.total, 3),
+            "mean_ms": round(histogram.total / histogram.count, 3) if histogram.count else 0.0,
+            "min_ms": round(histogram.min, 3) if histogram.count else 0.0,
+            "p50_ms": round(histogram.percentile(0.50), 3),
+            "p90_ms": round(histogram.percentile(0.90), 3),
+            "p99_ms": round(histogram.percentile(0.99), 3),
+            "max_ms": round(histogram.max, 3),
+            "slowest": [dict(call, ms=round(ms, 3)) for ms, _, call in sorted(self.slowest, reverse=True)],
+        }
+
+def parse_time(value):
+    """Return a pino time (epoch milliseconds or ISO 8601 string) in milliseconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000
+
+def open_log(path):
+    """Open a log file as text, transparently handling gzip and standard input."""
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+class LogAnalyzer:
+    """
+    Pairs start and end events per process and aggregates latencies per node method.
+
+    Calls of the same method on one process are paired first in, first out.
+    Locator lines are attached to the most recently started open call of
+    the process that logged them.
+    """
+
+    def __init__(self, top=5, methods=None):
+        self.top = top
+        self.methods = set(methods) if methods else None
+        self.stats = {}
+        self.open_calls = {}  # (pid, method) -> deque of open calls, oldest first
+        self.last_call = {}  # pid -> most recently started open call
+        self.sequence = itertools.count()
+        self.lines = 0
+        self.skipped = 0
+        self.unmatched_ends = 0
+
+    def feed(self, line):
+        self.lines += 1
+        # Cheap substring checks first; most lines are never parsed as JSON
+        if "node method " not in line and LOCATOR_PREFIX not in line:
+            return
+        try:
+            event = json.loads(line)
+            message = event["msg"]
+        except (ValueError, KeyError, TypeError):
+            self.skipped += 1
+            return
+        pid = event.get("pid")
+
+        if message.startswith(START_PREFIX):
+            method = message[len(START_PREFIX):].strip()
+            if self.methods and method not in self.methods:
+                return
+            call = {"method": method, "pid": pid, "start": event.get("time"),
+                    "start_ms": parse_time(event["time"]), "locators": []}
+            self.open_calls.setdefault((pid, method), collections.deque()).append(call)
+            self.last_call[pid] = call
+        elif message.startswith(END_PREFIX):
+            method = message[len(END_PREFIX):].strip()
+            if self.methods and method not in self.methods:
+                return
+            calls = self.open_calls.get((pid, method))
+            if not calls:
+                self.unmatched_ends += 1
+                return
+            call = calls.popleft()
+            if not calls:
+                del self.open_calls[(pid, method)]
+            if self.last_call.get(pid) is call:
+                del self.last_call[pid]
+            ms = max(parse_time(event["time"]) - call.pop("start_ms"), 0.0)
+            if method not in self.stats:
+                self.stats[method] = MethodStats(self.top)
+            self.stats[method].add(ms, next(self.sequence), call)
+        elif message.startswith(LOCATOR_PREFIX):
+            call = self.last_call.get(pid)
+            if call is not None:
+                locator = message[len(LOCATOR_PREFIX):]
+                if locator.endswith(" in page."):
+                    locator = locator[:-len(" in page.")]
+                call["locators"].append(locator)
+
+    def report(self):
+        methods = {method: stats.summary() for method, stats in self.stats.items()}
+        return {
+            "lines": self.lines,
+            "skipped_json_lines": self.skipped,
+            "unmatched_ends": self.unmatched_ends,
+            "open_calls": sum(len(calls) for calls in self.open_calls.values()),
+            "total_ms": round(sum(summary["total_ms"] for summary in methods.values()), 3),
+            "methods": dict(sorted(methods.items(), key=lambda item: item[1]["total_ms"], reverse=True)),
+        }
+
+def print_report(report):
+    """Print the report as tables, methods ordered by total time."""
+    print(f"{report['lines']} lines, {report['unmatched_ends']} unmatched end events, "
+          f"{report['open_calls']} calls without end")
+    print(f"{'method':28} {'calls':>6} {'total ms':>11} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    for method, summary in report["methods"].items():
+        print(f"{method:28} {summary['count']:6} {summary['total_ms']:11.1f} {summary['p50_ms']:9.1f} "
+              f"{summary['p90_ms']:9.1f} {summary['p99_ms']:9.1f} {summary['max_ms']:9.1f}")
+    print(f"{'total':28} {'':6} {report['total_ms']:11.1f}")
+
+    print("\nSlowest calls:")
+    for method, summary in report["methods"].items():
+        for call in summary["slowest"]:
+            locators = f"  [{', '.join(call['locators'])}]" if call["locators"] else ""
+            print(f"  {call['ms']:9.1f} ms  {method:24} pid {call['pid']} at {call['start']}{locators}")
+
+def main():
+    """Main entry point."""
+    args = parse_arguments()
+    analyzer = LogAnalyzer(top=args.top, methods=args.method)
+    for path in args.logs:
+        try:
+            with open_log(path) as log:
+                for line in log:
+                    analyzer.feed(line)
+        except OSError as e:
+            print(f"Cannot read {path}: {str(e)}", file=sys.stderr)
+            return 1
+
+    report = analyzer.report()
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
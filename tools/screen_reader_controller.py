@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Importable screen reader controller for the backends in libraries/screen_reader_backends.py.
+
+The controller starts and stops a screen reader in-process and polls the
+backend's readiness probe with exponential backoff, so it returns as soon
+as the screen reader answers instead of sleeping for a fixed time.
+"""
+import os
+import sys
+import time
+import platform
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "libraries"))
+# The backends are shared with the speech keywords of the test libraries
+from screen_reader_backends import ScreenReaderBackend, create_screen_reader_backend, get_screen_reader_backends
+
+# Backend names accepted by create_backend; "fake" is the launcher's name for the simulator
+BACKEND_NAMES = sorted(get_screen_reader_backends() + ["fake"])
+
+
+def default_backend_name():
+    """
+    Return the backend for this platform unless SCREEN_READER_BACKEND overrides it.
+
+    Returns None on platforms without a supported screen reader; the fake
+    one has to be asked for explicitly.
+    """
+    configured = os.environ.get("SCREEN_READER_BACKEND")
+    if configured:
+        return configured
+    return {"Windows": "nvda", "Darwin": "voiceover"}.get(platform.system())
+
+
+def create_backend(name=None, **options):
+    """Create a backend by name (nvda, voiceover or fake)."""
+    name = name or default_backend_name()
+    if name is None:
+        raise ValueError(f"No supported screen reader on {platform.system()}. "
+                         "Choose the fake screen reader explicitly (backend 'fake' or SCREEN_READER_BACKEND=fake).")
+    return create_screen_reader_backend(name, **options)
+
+
+class ScreenReaderController:
+    """
+    Starts and stops a screen reader through a backend.
+
+    Readiness is polled with exponential backoff, starting at
+    `poll_interval` and growing by `backoff` up to `max_interval`.
+    """
+
+    def __init__(self, backend=None, poll_interval=0.05, max_interval=0.5, backoff=1.5):
+        self.backend = backend or create_backend()
+        self.poll_interval = poll_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.last_wait_time = 0.0
+
+    @property
+    def name(self):
+        return self.backend.display_name
+
+    def wait_until(self, condition, timeout):
+        """
+        Poll `condition` with backoff until it returns True or the timeout expires.
+
+        Returns:
+            True if the condition was met
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+        interval = self.poll_interval
+        try:
+            while True:
+                if condition():
+                    return True
+                now = time.monotonic()
+                if now >= deadline:
+                    return False
+                time.sleep(min(interval, deadline - now))
+                interval = min(interval * self.backoff, self.max_interval)
+        finally:
+            self.last_wait_time = time.monotonic() - start
+
+    def is_running(self):
+        return self.backend.is_running()
+
+    def is_ready(self):
+        return self.backend.is_ready()
+
+    def start(self, timeout=30):
+        """
+        Start the screen reader and wait until it answers.
+
+        Returns:
+            True if the screen reader is ready
+        """
+        if self.backend.is_ready():
+            self.last_wait_time = 0.0
+            return True
+        if not self.backend.is_running():
+            self.backend.launch()
+        return self.wait_until(self.backend.is_ready, timeout)
+
+    def stop(self, timeout=10):
+        """
+        Stop the screen reader and wait until its process is gone.
+
+        Returns:
+            True if the screen reader stopped
+        """
+        if not self.backend.is_running():
+            self.last_wait_time = 0.0
+            return True
+        self.backend.terminate()
+        return self.wait_until(lambda: not self.backend.is_running(), timeout)
+
+    def restart(self, timeout=30):
+        """Stop and start the screen reader."""
+        return self.stop(timeout) and self.start(timeout)
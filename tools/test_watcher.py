@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Importable watch loop that re-runs the affected accessibility tests on change.
+
+One long-lived process keeps the Playwright node process, the pooled
+browser and the speech sessions warm: every iteration runs robot in-process
+against the same node process, so it only pays for the tests themselves.
+Test, resource and library files are polled for changes, and only the
+tests whose own body changed, or that call a changed keyword directly or
+through other keywords, are run again.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+LIBRARIES_DIR = ROOT / "libraries"
+
+# Seconds between polls of the watched files
+DEFAULT_INTERVAL = 0.5
+
+# Robot data is re-analyzed; changes to code loaded into the process need a reload
+DATA_SUFFIXES = {".robot", ".resource"}
+CODE_SUFFIXES = {".py", ".js"}
+
+
+def _normalize(name):
+    """Normalize a keyword name the way Robot Framework matches them."""
+    return name.lower().replace(" ", "").replace("_", "")
+
+
+def _without_lines(data):
+    if isinstance(data, dict):
+        return {key: _without_lines(value) for key, value in data.items() if key != "lineno"}
+    if isinstance(data, (list, tuple)):
+        return [_without_lines(item) for item in data]
+    return data
+
+
+def _fingerprint(data):
+    """Hash a test or keyword; line numbers are left out so moving code is not a change."""
+    text = json.dumps(_without_lines(data), sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _body_calls(items, names):
+    """Collect the normalized names of the keywords the items may call."""
+    for item in items:
+        if "type" not in item and "name" in item:
+            # Arguments are included because Run Keyword variants take keyword names
+            for value in (item["name"], *item.get("args", ())):
+                if isinstance(value, str):
+                    names.add(_normalize(value))
+                    names.add(_normalize(value.rsplit(".", 1)[-1]))
+        _body_calls(item.get("body", ()), names)
+    return names
+
+
+def _calls(data):
+    """Return the names a test or keyword may call, including its setup and teardown."""
+    items = list(data.get("body", ()))
+    items.extend(data[fixture] for fixture in ("setup", "teardown") if fixture in data)
+    return _body_calls(items, set())
+
+
+class SuiteSnapshot:
+    """
+    Fingerprints of the tests, user keywords and settings of a suite and the
+    resource files it imports, with the keyword call graph between them.
+    """
+
+    def __init__(self, test_path):
+        from robot.running import TestSuite
+        self.tests = {}
+        self.test_calls = {}
+        self.keywords = {}
+        self.keyword_calls = {}
+        self.settings = {}
+        self.sources = set()
+        self._add_suite(TestSuite.from_file_system(str(test_path)), [])
+
+    def _add_suite(self, suite, fixtures):
+        fixtures = fixtures + [fixture.to_dict() for fixture, used in
+                               ((suite.setup, suite.has_setup), (suite.teardown, suite.has_teardown)) if used]
+        self._add_resource(suite.resource, suite.source, fixtures)
+        for test in suite.tests:
+            data = test.to_dict()
+            self.tests[test.full_name] = _fingerprint(data)
+            self.test_calls[test.full_name] = _calls(data) | _body_calls(fixtures, set())
+        for child in suite.suites:
+            self._add_suite(child, fixtures)
+
+    def _add_resource(self, resource, source, fixtures=()):
+        source = Path(source).resolve() if source else None
+        if source is None or source in self.sources:
+            return
+        if source.is_file():
+            self.sources.add(source)
+        self.settings[str(source)] = _fingerprint({
+            "imports": [item.to_dict() for item in resource.imports],
+            "variables": [variable.to_dict() for variable in resource.variables],
+            "fixtures": list(fixtures),
+        })
+        for keyword in resource.keywords:
+            data = keyword.to_dict()
+            name = _normalize(keyword.name)
+            self.keywords.setdefault(name, []).append(_fingerprint(data))
+            self.keyword_calls.setdefault(name, set()).update(_calls(data))
+        for item in resource.imports:
+            if item.type != "RESOURCE" or "${" in item.name:
+                continue
+            path = Path(item.directory or ".", item.name)
+            if path.is_file():
+                from robot.running.builder import ResourceFileBuilder
+                self._add_resource(ResourceFileBuilder().build(str(path)), path)
+
+    def _uses(self, test, keywords):
+        seen = set()
+        pending = list(self.test_calls[test])
+        while pending:
+            name = pending.pop()
+            if name in keywords:
+                return True
+            if name not in seen:
+                seen.add(name)
+                pending.extend(self.keyword_calls.get(name, ()))
+        return False
+
+    def affected_tests(self, previous):
+        """
+        Return the tests that are new, changed or call a changed keyword.
+
+        Changed imports, variables or suite setups and teardowns, and changed
+        keywords with embedded arguments, affect every test.
+        """
+        if self.settings != previous.settings:
+            return sorted(self.tests)
+        changed = {name for name in self.keywords.keys() | previous.keywords.keys()
+                   if self.keywords.get(name) != previous.keywords.get(name)}
+        if any("${" in name for name in changed):
+            return sorted(self.tests)
+        return sorted(test for test, fingerprint in self.tests.items()
+                      if previous.tests.get(test) != fingerprint or self._uses(test, changed))
+
+
+class FileWatcher:
+    """Polls files for changes of their modification time or size."""
+
+    def __init__(self, paths, suffixes=DATA_SUFFIXES | CODE_SUFFIXES):
+        self.suffixes = suffixes
+        self.watch(paths)
+
+    def watch(self, paths):
+        """Replace the watched files and directories and take their current state."""
+        self.paths = [Path(path) for path in paths]
+        self.state = self.scan()
+
+    def scan(self):
+        """Return the (mtime, size) of every watched file."""
+        state = {}
+        for path in self.paths:
+            files = path.rglob("*") if path.is_dir() else [path]
+            for file in files:
+                if file.suffix not in self.suffixes or "__pycache__" in file.parts:
+                    continue
+                try:
+                    stat = file.stat()
+                except OSError:
+                    continue
+                state[file.resolve()] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def changes(self):
+        """Return the files added, removed or modified since the last scan."""
+        current = self.scan()
+        changed = {path for path in current.keys() | self.state.keys() if current.get(path) != self.state.get(path)}
+        self.state = current
+        return changed
+
+    def wait(self, interval=DEFAULT_INTERVAL):
+        """Block until files have changed and then stayed unchanged for one interval."""
+        changed = set()
+        while True:
+            time.sleep(interval)
+            latest = self.changes()
+            if latest:
+                changed |= latest
+            elif changed:
+                return changed
+
+
+class WarmPlaywright:
+    """Playwright node process shared by the Browser library of every iteration."""
+
+    def __init__(self, log_file):
+        self.log_file = Path(log_file)
+        self.process = None
+
+    def start(self):
+        from Browser.utils import spawn_node_process
+        start = time.monotonic()
+        self.log_file.parent.mkdir(parents=True, exist_ok=True)
+        self.process, port = spawn_node_process(self.log_file)
+        os.environ["ROBOT_FRAMEWORK_BROWSER_NODE_PORT"] = port
+        print(f"Started Playwright process on port {port} in {time.monotonic() - start:.2f}s")
+
+    def stop(self):
+        if self.process is not None:
+            from Browser.utils import close_process_tree
+            close_process_tree(self.process)
+            self.process = None
+        os.environ.pop("ROBOT_FRAMEWORK_BROWSER_NODE_PORT", None)
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+
+class TimingListener:
+    """Collects the status and duration of every test of an iteration."""
+
+    ROBOT_LISTENER_API_VERSION = 2
+
+    def __init__(self):
+        self.results = []
+
+    def end_test(self, name, attrs):
+        self.results.append((attrs["longname"], attrs["status"], attrs["elapsedtime"] / 1000.0))
+
+
+class WatchSession:
+    """
+    Runs the tests once, then re-runs the affected ones whenever watched files change.
+
+    Resource and test file changes keep everything warm. Library changes
+    reload the library modules and restart the Playwright process, since the
+    pooled browser and JavaScript extensions live there.
+    """
+
+    def __init__(self, test_path, output_dir, variables=(), listeners=(), interval=DEFAULT_INTERVAL,
+                 library_dirs=(LIBRARIES_DIR,)):
+        self.test_path = Path(test_path)
+        self.output_dir = Path(output_dir)
+        self.variables = list(variables)
+        self.listeners = list(listeners)
+        self.interval = interval
+        self.library_dirs = [Path(directory).resolve() for directory in library_dirs]
+        self.playwright = WarmPlaywright(self.output_dir / "playwright-log.txt")
+        self.snapshot = None
+        self.watcher = None
+        self.iteration = 0
+
+    def _watched_paths(self):
+        return [self.test_path, *self.snapshot.sources, *self.library_dirs]
+
+    def _reload_libraries(self):
+        """Drop the library modules so robot imports the changed code on the next run."""
+        for name, module in list(sys.modules.items()):
+            source = getattr(module, "__file__", None)
+            if source and any(Path(source).resolve().is_relative_to(directory) for directory in self.library_dirs):
+                del sys.modules[name]
+        self.playwright.restart()
+
+    def plan(self, changed):
+        """Return the tests to run for the changed files."""
+        from robot.errors import DataError
+        try:
+            snapshot = SuiteSnapshot(self.test_path)
+        except DataError as error:
+            print(f"Cannot parse {self.test_path}: {error}")
+            return []
+        previous, self.snapshot = self.snapshot, snapshot
+        self.watcher.watch(self._watched_paths())
+        if any(path.suffix in CODE_SUFFIXES for path in changed):
+            self._reload_libraries()
+            return sorted(snapshot.tests)
+        return snapshot.affected_tests(previous)
+
+    def run_tests(self, tests, analysis_time=0.0):
+        """Run the tests in-process and print the iteration's timing."""
+        import robot
+        if str(ROOT) not in sys.path:
+            sys.path.insert(0, str(ROOT))
+        from run_tests import escape_test_pattern
+        self.iteration += 1
+        timing = TimingListener()
+        start = time.monotonic()
+        # Test names are patterns for --test, so names with glob characters must be escaped
+        patterns = [escape_test_pattern(name) for name in tests]
+        robot.run(str(self.test_path), test=patterns, outputdir=str(self.output_dir),
+                  listener=self.listeners + [timing], variable=self.variables)
+        elapsed = time.monotonic() - start
+
+        failed = sum(1 for _, status, _ in timing.results if status == "FAIL")
+        print(f"Iteration {self.iteration}: {len(timing.results) - failed} passed, {failed} failed "
+              f"in {analysis_time + elapsed:.2f}s (analysis {analysis_time:.2f}s, robot {elapsed:.2f}s)")
+        for name, status, seconds in sorted(timing.results, key=lambda result: result[2], reverse=True):
+            print(f"  {seconds:7.2f}s  {status}  {name}")
+        return failed == 0
+
+    def run(self):
+        """Watch until interrupted."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.playwright.start()
+        self.snapshot = SuiteSnapshot(self.test_path)
+        self.watcher = FileWatcher(self._watched_paths())
+        self.run_tests(sorted(self.snapshot.tests))
+        while True:
+            print("Watching for changes (Ctrl+C to stop)...")
+            changed = self.watcher.wait(self.interval)
+            start = time.monotonic()
+            names = ", ".join(sorted(path.name for path in changed))
+            tests = self.plan(changed)
+            if not tests:
+                print(f"Changed: {names}; no tests affected")
+                continue
+            print(f"Changed: {names}; running {len(tests)} of {len(self.snapshot.tests)} tests")
+            self.run_tests(tests, time.monotonic() - start)
+
+    def close(self):
+        self.playwright.stop()